@@ -0,0 +1,66 @@
+"""Measure the memory allocated per risk analysis request with tracemalloc.
+
+Run from the repository root:
+    $ python -m benchmarks.bench_allocations --size 5000
+"""
+import argparse
+import datetime
+import timeit
+import tracemalloc
+
+from src.risk_analysis.risk_calculator import RiskCalculator
+from src.risk_analysis.risk_analysis_clock import current_year
+from src.risk_analysis.risk_analysys_service import RiskAnalysisService
+from src.risk_analysis.risk_analysis_controller import get_risk_analysis_service
+from benchmarks.subjects import random_subjects
+
+
+def peak_bytes_per_call(function, subjects) -> float:
+    """Average high-water mark of the memory allocated by one call, results being dropped as a response would."""
+    total = 0
+    tracemalloc.start()
+    for subject in subjects:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        function(subject)
+        _, peak = tracemalloc.get_traced_memory()
+        total += peak - before
+    tracemalloc.stop()
+    return total / len(subjects)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=5000)
+    args = parser.parse_args()
+
+    subjects = random_subjects(args.size)
+
+    def new_service_per_request(subject):
+        RiskAnalysisService()
+        return RiskCalculator(subject).calculate_subject_score()
+
+    def risk_calculator(subject):
+        return RiskCalculator(subject).calculate_subject_score()
+
+    def injected_service(subject):
+        return get_risk_analysis_service().run_risk_analysis(subject)
+
+    print("allocated per request (peak bytes):")
+    for name, function in [
+        ("new service + RiskCalculator", new_service_per_request),
+        ("RiskCalculator", risk_calculator),
+        ("injected service", injected_service),
+    ]:
+        print(f"  {name:30} {peak_bytes_per_call(function, subjects):8.0f} B")
+
+    repeat = 100000
+    today_time = min(timeit.repeat(lambda: datetime.date.today().year, number=repeat, repeat=5)) / repeat
+    cached_time = min(timeit.repeat(current_year, number=repeat, repeat=5)) / repeat
+    print("current year:")
+    print(f"  {'datetime.date.today().year':30} {today_time * 1e9:8.1f} ns")
+    print(f"  {'cached daily clock':30} {cached_time * 1e9:8.1f} ns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Measure the throughput of scoring a Parquet file of nested subjects through the Arrow adapters.
+
+--rows subjects shaped like the API requests are generated --chunk-rows at a time into a Parquet file, one row group
+per chunk, then scored into a Parquet file of dictionary-encoded risk profiles. The Arrow path is compared with
+reading the same rows as Python dicts validated by PersonalInformationSchema, on a sample of --schema-rows rows.
+Run from the repository root:
+    $ poetry run python -m benchmarks.bench_arrow --rows 10000000 --chunk-rows 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.risk_analysis.risk_arrow_scoring import score_parquet_file
+from src.risk_analysis.risk_batch_calculator import BatchRiskCalculator
+from src.risk_analysis.schemas.personal_information_schema import PersonalInformationSchema
+from benchmarks.subjects import CURRENT_YEAR
+
+
+def random_batch(rng: np.random.Generator, size: int) -> pa.RecordBatch:
+    has_house = rng.random(size) < 0.6
+    has_vehicle = rng.random(size) < 0.7
+    return pa.RecordBatch.from_arrays([
+        pa.array(rng.integers(16, 86, size)),
+        pa.array(rng.integers(0, 4, size)),
+        pa.array(rng.integers(0, 400000, size)),
+        pa.DictionaryArray.from_arrays(pa.array(rng.integers(0, 2, size, dtype=np.int8)),
+                                       pa.array(["single", "married"])).cast(pa.string()),
+        pa.StructArray.from_arrays(
+            [pa.DictionaryArray.from_arrays(pa.array(rng.integers(0, 2, size, dtype=np.int8)),
+                                            pa.array(["owned", "mortgaged"])).cast(pa.string())],
+            names=["ownership_status"], mask=pa.array(~has_house),
+        ),
+        pa.StructArray.from_arrays([pa.array(rng.integers(CURRENT_YEAR - 20, CURRENT_YEAR, size))],
+                                   names=["year"], mask=pa.array(~has_vehicle)),
+        pa.ListArray.from_arrays(pa.array(np.arange(0, 3 * size + 1, 3, dtype=np.int32)),
+                                 pa.array(rng.integers(0, 2, 3 * size).astype(bool))),
+    ], names=["age", "dependents", "income", "marital_status", "house", "vehicle", "risk_questions"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    parser.add_argument("--schema-rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "subjects.parquet")
+        output_path = os.path.join(directory, "profiles.parquet")
+        with pq.ParquetWriter(path, random_batch(rng, 1).schema) as writer:
+            for start in range(0, args.rows, args.chunk_rows):
+                writer.write_batch(random_batch(rng, min(args.chunk_rows, args.rows - start)))
+
+        stats = score_parquet_file(path, output_path, batch_rows=args.chunk_rows)
+        input_size, output_size = os.path.getsize(path), os.path.getsize(output_path)
+
+        sample = pq.ParquetFile(path).iter_batches(batch_size=args.schema_rows)
+        start = time.perf_counter()
+        rows = next(sample).to_pylist()
+        BatchRiskCalculator.from_subjects([PersonalInformationSchema.parse_obj(row) for row in rows])
+        per_row = (time.perf_counter() - start) / len(rows)
+
+    rows = stats["rows"]
+    print(f"rows:                  {rows}, {args.chunk_rows} per batch, {stats['rejected']} rejected")
+    print(f"files:                 {input_size / 2 ** 20:.1f} MiB in, {output_size / 2 ** 20:.1f} MiB out")
+    for name in ("read", "score", "write", "total"):
+        print(f"{name + ':':22} {stats[name]:8.2f} s   {rows / stats[name]:12,.0f} rows/sec")
+    print(f"dicts and schema:      {per_row * 1e9:8.1f} ns/row   {1 / per_row:12,.0f} rows/sec "
+          f"({args.schema_rows} rows, to_pylist and PersonalInformationSchema)")
+    print(f"speedup:               {per_row * rows / stats['total']:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
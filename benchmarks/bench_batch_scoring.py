@@ -0,0 +1,68 @@
+"""Compare per-subject RiskCalculator scoring with the vectorized BatchRiskCalculator.
+
+Run from the repository root:
+    $ python -m benchmarks.bench_batch_scoring --size 100000
+"""
+import argparse
+import json
+import time
+
+from src.risk_analysis.risk_calculator import RiskCalculator
+from src.risk_analysis.risk_batch_calculator import BatchRiskCalculator
+from src.risk_analysis.risk_rule_engine import RuleEngine
+from src.risk_analysis.risk_lookup_table import RiskLookupTable
+from src.risk_analysis.risk_analysis_rules import DEFAULT_RULE_SET
+from src.risk_analysis.risk_analysis_fast_codec import decode_subjects, encode_risk_profiles
+from src.risk_analysis.schemas.personal_information_schema import PersonalInformationSchema
+from benchmarks.subjects import random_subjects
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100000)
+    args = parser.parse_args()
+
+    subjects = random_subjects(args.size)
+    lookup_table = RiskLookupTable(RuleEngine(DEFAULT_RULE_SET))
+
+    start = time.perf_counter()
+    expected = [RiskCalculator(subject).calculate_subject_score() for subject in subjects]
+    per_row = time.perf_counter() - start
+
+    start = time.perf_counter()
+    calculator = BatchRiskCalculator.from_subjects(subjects)
+    columns = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = calculator.calculate_subject_scores(lookup_table)
+    batch = time.perf_counter() - start
+
+    assert [dict(profile) for profile in expected] == results
+
+    # From request bytes to response bytes, as POST /risk-analysis and POST /risk-analysis/batch
+    bodies = [subject.json() for subject in subjects]
+    batch_body = ("[" + ",".join(bodies) + "]").encode()
+    start = time.perf_counter()
+    for body in bodies:
+        json.dumps(RiskCalculator(PersonalInformationSchema.parse_raw(body)).calculate_subject_score())
+    per_request = time.perf_counter() - start
+
+    start = time.perf_counter()
+    encode_risk_profiles(BatchRiskCalculator.from_subjects(decode_subjects(batch_body)).calculate_subject_scores(
+        lookup_table
+    ))
+    batch_request = time.perf_counter() - start
+
+    print(f"subjects:              {args.size}")
+    print(f"RiskCalculator:        {per_row / args.size * 1e9:10.1f} ns/subject")
+    print(f"columns extraction:    {columns / args.size * 1e9:10.1f} ns/subject")
+    print(f"BatchRiskCalculator:   {batch / args.size * 1e9:10.1f} ns/subject")
+    print(f"speedup from columns:  {per_row / batch:10.1f}x  (BatchRiskCalculator built from columns)")
+    print(f"speedup from models:   {per_row / (columns + batch):10.1f}x  (from_subjects of pydantic models)")
+    print(f"per request body:      {per_request / args.size * 1e9:10.1f} ns/subject  (pydantic, RiskCalculator, json)")
+    print(f"batch request body:    {batch_request / args.size * 1e9:10.1f} ns/subject  (as POST /risk-analysis/batch)")
+    print(f"speedup from bodies:   {per_request / batch_request:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
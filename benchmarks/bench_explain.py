@@ -0,0 +1,121 @@
+"""Show that the explain mode of POST /risk-analysis costs nothing to the requests that do not ask for it.
+
+The route is compared with a copy of it without the explain parameter, as it was before the mode existed, on the
+same subjects and service, then called with ?explain=false and ?explain=true. Both routes are called directly,
+without the routing of the app in front of them. Besides the time, which varies from run to run, the Python and C
+function calls and the memory allocated per request are counted, which do not. Run from the repository root:
+    $ PYTHONPATH=.:src poetry run python -m benchmarks.bench_explain --size 300 --rounds 40
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+import tracemalloc
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import Response
+
+from risk_analysis.schemas.personal_information_schema import PersonalInformationSchema
+from risk_analysis.schemas.risk_score import RiskProfile
+from risk_analysis.risk_analysys_service import RiskAnalysisService
+from risk_analysis.risk_analysis_metrics import instrumented_route_class
+from risk_analysis.risk_analysis_controller import RULE_SET_VERSION_HEADER, get_risk_analysis_service, \
+    risk_analysis_metrics, router
+from benchmarks.bench_fast_codec import post
+from benchmarks.subjects import random_subjects
+
+baseline_router = APIRouter(route_class=instrumented_route_class(risk_analysis_metrics), prefix="/risk-analysis")
+
+
+@baseline_router.post("", response_model=RiskProfile)
+async def run_risk_analysis(subject: PersonalInformationSchema, response: Response,
+                            service: RiskAnalysisService = Depends(get_risk_analysis_service)):
+    """POST /risk-analysis without the explain parameter"""
+    lookup_table = service.lookup_table
+    response.headers[RULE_SET_VERSION_HEADER] = lookup_table.version
+    return service.run_risk_analysis(subject, lookup_table)
+
+
+def route_app(api_router: APIRouter):
+    """ASGI app of the POST /risk-analysis route of a router"""
+    return next(route.app for route in api_router.routes if route.path == "/risk-analysis")
+
+
+def calls_per_request(asgi_app, query: bytes, bodies) -> float:
+    calls = 0
+
+    def count(frame, event, arg):
+        nonlocal calls
+        if event == "call" or event == "c_call":
+            calls += 1
+
+    async def run():
+        sys.setprofile(count)
+        try:
+            for body in bodies:
+                await post("/risk-analysis", body, asgi_app, query=query)
+        finally:
+            sys.setprofile(None)
+    asyncio.run(run())
+    return calls / len(bodies)
+
+
+def bytes_per_request(asgi_app, query: bytes, bodies) -> float:
+    """Average high-water mark of the memory allocated by one request"""
+    async def run():
+        total = 0
+        for body in bodies:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            await post("/risk-analysis", body, asgi_app, query=query)
+            _, peak = tracemalloc.get_traced_memory()
+            total += peak - before
+        return total / len(bodies)
+    tracemalloc.start()
+    try:
+        return asyncio.run(run())
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=40)
+    args = parser.parse_args()
+
+    bodies = [subject.json().encode() for subject in random_subjects(args.size)]
+    cases = {
+        "route without explain": (route_app(baseline_router), b""),
+        "POST /risk-analysis": (route_app(router), b""),
+        "POST /risk-analysis?explain=false": (route_app(router), b"explain=false"),
+        "POST /risk-analysis?explain=true": (route_app(router), b"explain=true"),
+    }
+
+    async def run(asgi_app, query):
+        for body in bodies:
+            await post("/risk-analysis", body, asgi_app, query=query)
+
+    # Short rounds in a random order, the best of each case is compared, so that a drift of the machine or the
+    # order of the cases does not favor any of them
+    loop = asyncio.new_event_loop()
+    timings = {name: [] for name in cases}
+    for _ in range(args.rounds):
+        names = list(cases)
+        random.shuffle(names)
+        for name in names:
+            start = time.perf_counter()
+            loop.run_until_complete(run(*cases[name]))
+            timings[name].append((time.perf_counter() - start) / args.size)
+    loop.close()
+
+    print(f"subjects: {args.size}, best of {args.rounds} rounds")
+    print(f"{'':34} {'time':>11} {'calls':>8} {'allocated':>11}")
+    for name, (asgi_app, query) in cases.items():
+        print(f"{name:34} {min(timings[name]) * 1e6:8.2f} µs {calls_per_request(asgi_app, query, bodies):8.1f} "
+              f"{bytes_per_request(asgi_app, query, bodies):9.0f} B")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Compare POST /risk-analysis with the orjson fast path POST /risk-analysis/fast, end to end through the ASGI app.
+
+Run from the repository root:
+    $ poetry run python -m benchmarks.bench_fast_codec --size 2000 --repeat 5
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Sequence, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from src.main import app
+from src.risk_analysis.schemas.personal_information_schema import PersonalInformationSchema
+from src.risk_analysis.schemas.risk_score import RiskProfile
+from src.risk_analysis.risk_analysis_fast_codec import decode_subject, encode_risk_profile
+from benchmarks.subjects import random_subjects
+
+
+async def post(path: str, body: bytes, asgi_app=app, client: str = "testclient", query: bytes = b"",
+               content_type: bytes = b"application/json", headers: Sequence[Tuple[bytes, bytes]] = ()) -> bytes:
+    """Send one request to the ASGI app, without any network or test client in between."""
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    response = []
+
+    async def receive():
+        return messages.pop() if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            response.append(message["body"])
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query,
+        "headers": [(b"content-type", content_type), (b"content-length", str(len(body)).encode()), *headers],
+        "server": ("testserver", 80),
+        "client": (client, 50000),
+    }
+    await asgi_app(scope, receive, send)
+    return b"".join(response)
+
+
+def best_of(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    bodies = [subject.json().encode() for subject in random_subjects(args.size)]
+
+    async def run(path):
+        for body in bodies:
+            await post(path, body)
+
+    def endpoint(path):
+        return best_of(lambda: asyncio.run(run(path)), args.repeat) / args.size
+
+    for body in bodies:
+        assert json.loads(asyncio.run(post("/risk-analysis/fast", body))) == \
+               json.loads(asyncio.run(post("/risk-analysis", body)))
+
+    profile = {"auto": "regular", "disability": "ineligible", "home": "economic", "life": "regular"}
+    pydantic_decode = best_of(lambda: [PersonalInformationSchema.parse_raw(body) for body in bodies], args.repeat)
+    fast_decode = best_of(lambda: [decode_subject(body) for body in bodies], args.repeat)
+    pydantic_encode = best_of(
+        lambda: [json.dumps(jsonable_encoder(RiskProfile(**profile)), separators=(",", ":")).encode()
+                 for _ in bodies],
+        args.repeat,
+    )
+    fast_encode = best_of(lambda: [encode_risk_profile(profile) for _ in bodies], args.repeat)
+
+    pydantic_endpoint = endpoint("/risk-analysis")
+    fast_endpoint = endpoint("/risk-analysis/fast")
+
+    print(f"requests:                 {args.size}")
+    print(f"decode   pydantic:        {pydantic_decode / args.size * 1e6:8.2f} µs")
+    print(f"decode   orjson struct:   {fast_decode / args.size * 1e6:8.2f} µs")
+    print(f"encode   RiskProfile:     {pydantic_encode / args.size * 1e6:8.2f} µs")
+    print(f"encode   orjson bytes:    {fast_encode / args.size * 1e6:8.2f} µs")
+    print(f"POST /risk-analysis:      {pydantic_endpoint * 1e6:8.2f} µs")
+    print(f"POST /risk-analysis/fast: {fast_endpoint * 1e6:8.2f} µs")
+    print(f"speedup end to end:       {pydantic_endpoint / fast_endpoint:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
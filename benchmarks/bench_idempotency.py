@@ -0,0 +1,85 @@
+"""Show that a retry answered from the idempotency cache skips the parsing and the scoring of the request.
+
+POST /risk-analysis is sent through the IdempotencyMiddleware in front of the app, in this process: without an
+Idempotency-Key, with a new key every time (looked up, scored, then stored) and with a key already stored (a retry).
+Besides the best time of --repeat runs, the Python and C function calls per request are counted, which do not vary
+from run to run, along with the requests that reached the app. The lookups and stores of the shared table are also
+timed on their own. Run from the repository root:
+    $ PYTHONPATH=.:src poetry run python -m benchmarks.bench_idempotency --size 2000 --repeat 5
+"""
+import argparse
+import asyncio
+import sys
+
+from src.main import app
+from src.risk_analysis.risk_analysis_idempotency import IdempotencyMiddleware, SharedResponseCache, key_digest
+from src.risk_analysis.risk_analysis_controller import IDEMPOTENT_PATHS, RULE_SET_VERSION_HEADER
+from src.risk_analysis.risk_analysis_constants import IDEMPOTENCY_VALUE_SIZE
+from benchmarks.bench_fast_codec import best_of, post
+from benchmarks.subjects import random_subjects
+
+
+class CountingApp:
+    def __init__(self, asgi_app):
+        self.app = asgi_app
+        self.calls = 0
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        await self.app(scope, receive, send)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    bodies = [subject.json().encode() for subject in random_subjects(args.size)]
+    counting_app = CountingApp(app)
+    cache = SharedResponseCache(args.size * 4 * (args.repeat + 2), IDEMPOTENCY_VALUE_SIZE, 3600)
+    asgi_app = IdempotencyMiddleware(counting_app, cache, IDEMPOTENT_PATHS, [RULE_SET_VERSION_HEADER])
+    runs = iter(range(sys.maxsize))
+
+    def send(case: str):
+        async def run():
+            # Each miss run uses keys never seen before, each retry run the keys stored by the first miss run
+            run_keys = str(next(runs)).encode() if case == "new key" else b"0"
+            for index, body in enumerate(bodies):
+                headers = [] if case == "no key" else [(b"idempotency-key", b"%s-%d" % (run_keys, index))]
+                await post("/risk-analysis", body, asgi_app, headers=headers)
+        asyncio.run(run())
+
+    def calls_per_request(case: str) -> float:
+        calls = 0
+
+        def count(frame, event, arg):
+            nonlocal calls
+            if event == "call" or event == "c_call":
+                calls += 1
+        sys.setprofile(count)
+        try:
+            send(case)
+        finally:
+            sys.setprofile(None)
+        return calls / args.size
+
+    print(f"requests: {args.size}, best of {args.repeat} runs")
+    print(f"{'POST /risk-analysis':32} {'time':>11} {'calls':>8} {'app calls':>10}")
+    for case in ["no key", "new key", "retry"]:
+        counting_app.calls = 0
+        timing = best_of(lambda: send(case), args.repeat) / args.size
+        app_calls = counting_app.calls / args.repeat / args.size
+        print(f"{case:32} {timing * 1e6:8.2f} µs {calls_per_request(case):8.1f} {app_calls:10.2f}")
+
+    keys = [key_digest(b"table", str(index).encode()) for index in range(args.size)]
+    fingerprint = key_digest(bodies[0])
+    value = bytes(200)
+    put = best_of(lambda: [cache.put(key, fingerprint, value) for key in keys], args.repeat) / args.size
+    get = best_of(lambda: [cache.get(key, fingerprint) for key in keys], args.repeat) / args.size
+    print(f"\nshared table put: {put * 1e6:.2f} µs, get: {get * 1e6:.2f} µs, {cache.slots} slots of "
+          f"{cache.slot_size} bytes")
+
+
+if __name__ == "__main__":
+    main()
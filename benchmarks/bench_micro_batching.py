@@ -0,0 +1,73 @@
+"""Load test POST /risk-analysis with and without micro-batching, for several numbers of concurrent clients.
+
+Every client is a coroutine sending --requests requests one after the other through the ASGI app in this process,
+all the clients starting together, so that --clients requests are in flight at once. The throughput and the
+latency percentiles are reported for scoring each request alone, then for every --window/--max-size pair of the
+batcher, with the mean number of subjects of its batches. Run from the repository root:
+    $ PYTHONPATH=.:src poetry run python -m benchmarks.bench_micro_batching --clients 1000 10000 50000 \\
+        --window 1 5 --max-size 256
+"""
+import argparse
+import asyncio
+import time
+from typing import List, Optional, Tuple
+
+from src.main import app
+# The app imports the package as `risk_analysis`, the controller of that copy serves the requests
+from risk_analysis import risk_analysis_controller
+from risk_analysis.risk_analysis_batcher import RiskAnalysisBatcher
+from benchmarks.bench_fast_codec import post
+from benchmarks.bench_msgpack import percentile
+from benchmarks.subjects import random_subjects
+
+
+def load(path: str, bodies: List[bytes], clients: int, requests: int) -> Tuple[float, List[float]]:
+    """Wall time of the load and latency of every request"""
+    async def client(first: int) -> List[float]:
+        latencies = []
+        for index in range(first, first + requests):
+            start = time.perf_counter()
+            await post(path, bodies[index % len(bodies)])
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    async def run():
+        start = time.perf_counter()
+        results = await asyncio.gather(*(client(i * requests) for i in range(clients)))
+        return time.perf_counter() - start, [latency for latencies in results for latency in latencies]
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--requests", type=int, default=1, help="requests sent by each client")
+    parser.add_argument("--window", type=float, nargs="+", default=[1], help="batching windows in milliseconds")
+    parser.add_argument("--max-size", type=int, nargs="+", default=[256])
+    parser.add_argument("--path", default="/risk-analysis")
+    args = parser.parse_args()
+
+    bodies = [subject.json().encode() for subject in random_subjects(10000)]
+    service = risk_analysis_controller.risk_analysis_service
+    batchers: List[Tuple[str, Optional[RiskAnalysisBatcher]]] = [("alone", None)] + [
+        (f"{window:g} ms / {max_size}", RiskAnalysisBatcher(service, window / 1e3, max_size))
+        for window in args.window for max_size in args.max_size
+    ]
+    load(args.path, bodies, 100, 10)
+
+    print(f"POST {args.path}, {args.requests} requests per client")
+    print(f"{'clients':>8} {'batching':>16} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'batch':>7}")
+    for clients in args.clients:
+        for name, batcher in batchers:
+            risk_analysis_controller.risk_analysis_batcher = batcher
+            if batcher is not None:
+                batcher.batches = batcher.subjects = 0
+            elapsed, latencies = load(args.path, bodies, clients, args.requests)
+            batch = f"{batcher.subjects / batcher.batches:7.1f}" if batcher is not None else f"{1:7}"
+            print(f"{clients:8} {name:>16} {len(latencies) / elapsed:9.0f} {percentile(latencies, 0.5) * 1e3:9.1f} "
+                  f"{percentile(latencies, 0.99) * 1e3:9.1f} {max(latencies) * 1e3:9.1f} {batch}")
+    risk_analysis_controller.risk_analysis_batcher = None
+
+
+if __name__ == "__main__":
+    main()
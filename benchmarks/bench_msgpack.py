@@ -0,0 +1,123 @@
+"""Compare the msgpack transport with the JSON endpoints: payload size, serialization CPU and latency.
+
+Single subjects go to POST /risk-analysis, POST /risk-analysis/fast and POST /risk-analysis/msgpack, batches to
+POST /risk-analysis/batch and POST /risk-analysis/msgpack/stream, all through the ASGI app in this process, without
+any network in between. The serialization costs are the ones of both sides: the client encoding a subject and
+decoding a profile, the server decoding a subject and encoding a profile. Run from the repository root:
+    $ PYTHONPATH=.:src poetry run python -m benchmarks.bench_msgpack --size 2000 --batch 1000 --repeat 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import msgpack
+import orjson
+
+from src.risk_analysis.risk_analysis_fast_codec import decode_subject, encode_risk_profile
+from src.risk_analysis.risk_analysis_msgpack import MSGPACK_MEDIA_TYPE, decode_subject as decode_msgpack_subject, \
+    encode_risk_profile as encode_msgpack_risk_profile
+from src.risk_analysis.risk_analysys_service import DEFAULT_LOOKUP_TABLE
+from benchmarks.bench_fast_codec import best_of, post
+from benchmarks.subjects import random_subjects
+
+MSGPACK = MSGPACK_MEDIA_TYPE.encode()
+
+
+def latencies(path: str, bodies, content_type: bytes = b"application/json"):
+    """Latency in seconds of every request, sent one after the other"""
+    async def run():
+        timings = []
+        for body in bodies:
+            start = time.perf_counter()
+            await post(path, body, content_type=content_type)
+            timings.append(time.perf_counter() - start)
+        return timings
+    return asyncio.run(run())
+
+
+def percentile(timings, fraction: float) -> float:
+    return sorted(timings)[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=1000, help="number of subjects of a batch request")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    values = [orjson.loads(subject.json()) for subject in random_subjects(args.size)]
+    json_bodies = [orjson.dumps(value) for value in values]
+    msgpack_bodies = [msgpack.packb(value) for value in values]
+    profiles = [DEFAULT_LOOKUP_TABLE.calculate_subject_score(decode_subject(body)) for body in json_bodies]
+    json_profiles = [encode_risk_profile(profile) for profile in profiles]
+    msgpack_profiles = [encode_msgpack_risk_profile(profile) for profile in profiles]
+
+    for json_body, msgpack_body in zip(json_bodies, msgpack_bodies):
+        assert orjson.loads(asyncio.run(post("/risk-analysis/fast", json_body))) == \
+               msgpack.unpackb(asyncio.run(post("/risk-analysis/msgpack", msgpack_body, content_type=MSGPACK)))
+
+    def per_subject(function):
+        return best_of(function, args.repeat) / args.size * 1e6
+
+    cpu = {
+        "JSON": (
+            per_subject(lambda: [orjson.dumps(value) for value in values]),
+            per_subject(lambda: [decode_subject(body) for body in json_bodies]),
+            per_subject(lambda: [encode_risk_profile(profile) for profile in profiles]),
+            per_subject(lambda: [orjson.loads(body) for body in json_profiles]),
+        ),
+        "msgpack": (
+            per_subject(lambda: [msgpack.packb(value) for value in values]),
+            per_subject(lambda: [decode_msgpack_subject(body) for body in msgpack_bodies]),
+            per_subject(lambda: [encode_msgpack_risk_profile(profile) for profile in profiles]),
+            per_subject(lambda: [msgpack.unpackb(body) for body in msgpack_profiles]),
+        ),
+    }
+
+    print(f"subjects: {args.size}, batches of {args.batch}, best of {args.repeat} runs")
+    print(f"\n{'payload bytes':36} {'request':>9} {'response':>9}")
+    print(f"{'JSON':36} {statistics.mean(map(len, json_bodies)):9.1f} {statistics.mean(map(len, json_profiles)):9.1f}")
+    print(f"{'msgpack':36} {statistics.mean(map(len, msgpack_bodies)):9.1f} "
+          f"{statistics.mean(map(len, msgpack_profiles)):9.1f}")
+
+    print(f"\n{'serialization µs':36} {'client':>9} {'server':>9} {'server':>9} {'client':>9} {'total':>9}")
+    print(f"{'':36} {'encode':>9} {'decode':>9} {'encode':>9} {'decode':>9}")
+    for name, timings in cpu.items():
+        print(f"{name:36} " + " ".join(f"{timing:9.2f}" for timing in timings) + f" {sum(timings):9.2f}")
+
+    print(f"\n{'latency µs':36} {'p50':>9} {'p99':>9}")
+    for name, path, bodies, content_type in [
+        ("POST /risk-analysis", "/risk-analysis", json_bodies, b"application/json"),
+        ("POST /risk-analysis/fast", "/risk-analysis/fast", json_bodies, b"application/json"),
+        ("POST /risk-analysis/msgpack", "/risk-analysis/msgpack", msgpack_bodies, MSGPACK),
+    ]:
+        # The best run of each percentile, as for the other timings
+        runs = [latencies(path, bodies, content_type) for _ in range(args.repeat)]
+        p50 = min(percentile(timings, 0.5) for timings in runs)
+        p99 = min(percentile(timings, 0.99) for timings in runs)
+        print(f"{name:36} {p50 * 1e6:9.1f} {p99 * 1e6:9.1f}")
+
+    batches = len(values) // args.batch
+    json_batches = [orjson.dumps(values[i * args.batch:(i + 1) * args.batch]) for i in range(batches)]
+    msgpack_batches = [b"".join(msgpack_bodies[i * args.batch:(i + 1) * args.batch]) for i in range(batches)]
+    json_answers = [asyncio.run(post("/risk-analysis/batch", body)) for body in json_batches]
+    msgpack_answers = [asyncio.run(post("/risk-analysis/msgpack/stream", body, content_type=MSGPACK))
+                       for body in msgpack_batches]
+    print(f"\n{'batch, per subject':36} {'request':>9} {'response':>9} {'latency':>9}")
+    for name, path, bodies, answers, content_type in [
+        ("POST /risk-analysis/batch", "/risk-analysis/batch", json_batches, json_answers, b"application/json"),
+        ("POST /risk-analysis/msgpack/stream", "/risk-analysis/msgpack/stream", msgpack_batches, msgpack_answers,
+         MSGPACK),
+    ]:
+        if not bodies:
+            break
+        subjects = batches * args.batch
+        latency = best_of(lambda: latencies(path, bodies, content_type), args.repeat) / subjects
+        print(f"{name:36} {sum(map(len, bodies)) / subjects:9.1f} {sum(map(len, answers)) / subjects:9.1f} "
+              f"{latency * 1e6:7.2f}µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Compare the latency of POST /risk-analysis with and without the write-behind SQLite store.
+
+Requests are sent in waves of --concurrency concurrent requests, so the writer competes with them.
+Run from the repository root:
+    $ poetry run python -m benchmarks.bench_persistence --size 20000 --concurrency 32
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from typing import List, Optional
+
+from src.main import app
+from risk_analysis.risk_analysis_controller import get_risk_analysis_service
+from risk_analysis.risk_analysys_service import RiskAnalysisService
+from risk_analysis.risk_analysis_store import RiskAnalysisStore
+from benchmarks.bench_fast_codec import post
+from benchmarks.subjects import random_subjects
+
+
+async def timed_post(body: bytes) -> float:
+    start = time.perf_counter()
+    await post("/risk-analysis", body)
+    return time.perf_counter() - start
+
+
+async def request_latencies(bodies: List[bytes], concurrency: int,
+                            store: Optional[RiskAnalysisStore]) -> List[float]:
+    service = RiskAnalysisService(store=store)
+    app.dependency_overrides[get_risk_analysis_service] = lambda: service
+    if store is not None:
+        await store.start()
+    latencies = []
+    try:
+        for start in range(0, len(bodies), concurrency):
+            latencies.extend(await asyncio.gather(*map(timed_post, bodies[start:start + concurrency])))
+    finally:
+        app.dependency_overrides.clear()
+        if store is not None:
+            await store.close()
+    return latencies
+
+
+def percentile(values: List[float], rank: float) -> float:
+    return statistics.quantiles(values, n=100)[rank - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--max-pending", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--flush-interval", type=float, default=0.1)
+    args = parser.parse_args()
+
+    bodies = [subject.json().encode() for subject in random_subjects(args.size)]
+    asyncio.run(request_latencies(bodies[:1000], args.concurrency, None))  # Warm up
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = RiskAnalysisStore(os.path.join(directory, "risk_analysis.db"), args.max_pending, args.batch_size,
+                                  args.flush_interval)
+        without_store = asyncio.run(request_latencies(bodies, args.concurrency, None))
+        with_store = asyncio.run(request_latencies(bodies, args.concurrency, store))
+
+    print(f"requests:              {args.size}, {args.concurrency} concurrent")
+    for name, latencies in (("without store", without_store), ("with store", with_store)):
+        print(f"{name + ':':22} p50 {percentile(latencies, 50) * 1e6:8.2f} µs   "
+              f"p99 {percentile(latencies, 99) * 1e6:8.2f} µs")
+    print(f"records written:       {store.written} in {store.batches} transactions, {store.rejected} rejected")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Measure the portfolio analytics throughput and memory against scoring each subject with RiskCalculator.
+
+--rows subjects are generated and counted --chunk-rows at a time, the peak memory traced during the counting
+stays the one of a single chunk. Run from the repository root:
+    $ poetry run python -m benchmarks.bench_portfolio_analytics --rows 100000000 --chunk-rows 1000000
+"""
+import argparse
+import collections
+import time
+import tracemalloc
+
+import numpy as np
+
+from src.risk_analysis.risk_batch_calculator import BatchRiskCalculator
+from src.risk_analysis.risk_calculator import RiskCalculator
+from src.risk_analysis.risk_portfolio_analytics import PortfolioAnalytics, analyze_columns
+from benchmarks.subjects import CURRENT_YEAR, random_subjects, subject_columns_json
+
+
+def random_chunk(rng: np.random.Generator, size: int) -> BatchRiskCalculator:
+    return BatchRiskCalculator(
+        rng.integers(16, 86, size),
+        rng.integers(0, 4, size),
+        rng.integers(0, 400000, size),
+        rng.integers(0, 3, size),
+        rng.integers(0, 2, size).astype(bool),
+        np.where(rng.random(size) < 0.3, 0, rng.integers(CURRENT_YEAR - 20, CURRENT_YEAR, size)),
+        rng.integers(0, 4, size),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    parser.add_argument("--json-rows", type=int, default=200_000)
+    parser.add_argument("--calculator-rows", type=int, default=20_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    analytics = PortfolioAnalytics()
+    counting = 0.0
+    tracemalloc.start()
+    for start in range(0, args.rows, args.chunk_rows):
+        chunk = random_chunk(rng, min(args.chunk_rows, args.rows - start))
+        started = time.perf_counter()
+        analytics.add(chunk)
+        counting += time.perf_counter() - started
+        del chunk
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    started = time.perf_counter()
+    analytics.histograms()
+    report = time.perf_counter() - started
+
+    subjects = random_subjects(args.calculator_rows)
+    started = time.perf_counter()
+    counts = collections.Counter()
+    for subject in subjects:
+        for line, score in RiskCalculator(subject).calculate_subject_score().items():
+            counts[line, score] += 1
+    calculator = (time.perf_counter() - started) / args.calculator_rows
+
+    columns = subject_columns_json(random_subjects(args.json_rows))
+    started = time.perf_counter()
+    analyze_columns(PortfolioAnalytics(), columns)
+    json_columns = (time.perf_counter() - started) / args.json_rows
+
+    print(f"rows:                       {args.rows} in chunks of {args.chunk_rows}")
+    print(f"vectorized counting:        {counting:8.2f} s   {args.rows / counting:12.0f} rows/s")
+    print(f"peak memory while counting: {peak / 2 ** 20:8.1f} MiB (chunk generation included)")
+    print(f"report:                     {report * 1e3:8.2f} ms")
+    print(f"JSON columns, validated:    {json_columns * 1e9:8.1f} ns/row")
+    print(f"RiskCalculator per subject: {calculator * 1e9:8.1f} ns/row, "
+          f"{calculator * args.rows:.0f} s for {args.rows} rows")
+
+
+if __name__ == "__main__":
+    main()
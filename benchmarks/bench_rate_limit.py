@@ -0,0 +1,88 @@
+"""Measure the cost of the per-client token bucket, alone and in front of POST /risk-analysis.
+
+The check alone is timed over --clients distinct clients, with the store capped at --max-clients buckets.
+The load test sends waves of --concurrency concurrent requests from 10000 clients, through the ASGI app with and
+without RateLimitMiddleware in turn, with a rate high enough that no request is refused.
+Run from the repository root:
+    $ PYTHONPATH=.:src poetry run python -m benchmarks.bench_rate_limit --clients 1000000 --size 20000
+"""
+import argparse
+import asyncio
+import gc
+import random
+import statistics
+import time
+from typing import List, Tuple
+
+from src.main import app
+from risk_analysis.risk_analysis_rate_limit import RateLimitMiddleware, TokenBucketLimiter
+from benchmarks.bench_fast_codec import post
+from benchmarks.subjects import random_subjects
+
+
+def check_seconds(keys: List[str], max_clients: int) -> Tuple[float, TokenBucketLimiter]:
+    limiter = TokenBucketLimiter(rate=10, burst=20, max_keys=max_clients)
+    acquire = limiter.acquire
+    start = time.perf_counter()
+    for key in keys:
+        acquire(key)
+    return (time.perf_counter() - start) / len(keys), limiter
+
+
+async def request_latencies(asgi_apps: list, bodies: List[bytes], clients: List[str],
+                            concurrency: int) -> List[List[float]]:
+    """Latencies of each app, sending each wave to every app in turn so they share the same noise."""
+    async def timed_post(asgi_app, body: bytes, client: str) -> float:
+        start = time.perf_counter()
+        await post("/risk-analysis", body, asgi_app, client)
+        return time.perf_counter() - start
+
+    latencies = [[] for _ in asgi_apps]
+    for start in range(0, len(bodies), concurrency):
+        end = start + concurrency
+        for asgi_app, app_latencies in zip(asgi_apps, latencies):
+            app_latencies.extend(await asyncio.gather(
+                *(timed_post(asgi_app, body, client) for body, client in zip(bodies[start:end], clients[start:end]))
+            ))
+    return latencies
+
+
+def percentile(values: List[float], rank: int) -> float:
+    return statistics.quantiles(values, n=100)[rank - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=1000000)
+    parser.add_argument("--max-clients", type=int, default=100000)
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    keys = [f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}" for _ in range(args.clients)]
+    new_keys, limiter = check_seconds(keys, args.max_clients)
+    # Known clients coming back, the common case of a busy API
+    known_keys = [rng.choice(keys[-args.max_clients // 2:]) for _ in range(args.clients)]
+    known = min(check_seconds(known_keys, args.max_clients)[0] for _ in range(3))
+
+    bodies = [subject.json().encode() for subject in random_subjects(args.size)]
+    clients = [rng.choice(keys[:10000]) for _ in bodies]
+    limited_app = RateLimitMiddleware(app, TokenBucketLimiter(rate=1e6, burst=1e6), "/risk-analysis")
+    # Keep the collector from scanning the million keys above in the middle of the requests
+    gc.collect()
+    gc.freeze()
+    asyncio.run(request_latencies([app, limited_app], bodies[:1000], clients, args.concurrency))  # Warm up
+    without_limit, with_limit = asyncio.run(request_latencies([app, limited_app], bodies, clients, args.concurrency))
+
+    print(f"check, new client:     {new_keys * 1e6:8.2f} µs   ({args.clients} clients)")
+    print(f"check, known client:   {known * 1e6:8.2f} µs")
+    print(f"buckets kept:          {len(limiter)} of at most {args.max_clients}, {limiter.evictions} evicted")
+    print(f"requests:              {args.size}, {args.concurrency} concurrent")
+    for name, latencies in (("without rate limit", without_limit), ("with rate limit", with_limit)):
+        print(f"{name + ':':22} mean {statistics.fmean(latencies) * 1e6:8.2f} µs   "
+              f"p50 {percentile(latencies, 50) * 1e6:8.2f} µs   p99 {percentile(latencies, 99) * 1e6:8.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
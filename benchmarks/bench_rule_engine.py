@@ -0,0 +1,51 @@
+"""Compare the compiled RuleEngine and the RiskLookupTable with the hand-written RiskCalculator.
+
+Run from the repository root:
+    $ python -m benchmarks.bench_rule_engine --size 20000 --repeat 5
+"""
+import argparse
+import timeit
+
+from src.risk_analysis.risk_calculator import RiskCalculator
+from src.risk_analysis.risk_rule_engine import RuleEngine
+from src.risk_analysis.risk_lookup_table import RiskLookupTable
+from src.risk_analysis.risk_analysis_rules import DEFAULT_RULE_SET
+from benchmarks.subjects import random_subjects
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    subjects = random_subjects(args.size)
+    engine = RuleEngine(DEFAULT_RULE_SET)
+    calculate_subject_score = engine.calculate_subject_score
+    lookup_subject_score = RiskLookupTable(engine).calculate_subject_score
+
+    def hand_written():
+        for subject in subjects:
+            RiskCalculator(subject).calculate_subject_score()
+
+    def compiled():
+        for subject in subjects:
+            calculate_subject_score(subject)
+
+    def lookup():
+        for subject in subjects:
+            lookup_subject_score(subject)
+
+    hand_written_time = min(timeit.repeat(hand_written, number=1, repeat=args.repeat)) / args.size
+    compiled_time = min(timeit.repeat(compiled, number=1, repeat=args.repeat)) / args.size
+    lookup_time = min(timeit.repeat(lookup, number=1, repeat=args.repeat)) / args.size
+
+    print(f"RiskCalculator:  {hand_written_time * 1e9:10.1f} ns/subject")
+    print(f"RuleEngine:      {compiled_time * 1e9:10.1f} ns/subject")
+    print(f"RiskLookupTable: {lookup_time * 1e9:10.1f} ns/subject")
+    print(f"speedup (engine):{hand_written_time / compiled_time:10.1f}x")
+    print(f"speedup (table): {hand_written_time / lookup_time:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
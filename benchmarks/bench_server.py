@@ -0,0 +1,118 @@
+"""Load test the production server, `poetry run serve`, for each number of workers.
+
+For each worker count, a server is started on a free port, then --client-processes load generators keep
+--connections keep-alive connections busy with POST /risk-analysis for --duration seconds, each connection sending
+its next request as soon as it gets the previous response. The requests per second and the latency percentiles
+are reported per worker count. Run from the repository root:
+    $ PYTHONPATH=.:src poetry run python -m benchmarks.bench_server --workers 1 2 4 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+
+from benchmarks.subjects import random_subjects
+
+SERVE = "from src.main import serve; serve()"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([".", "src"])}
+    server = subprocess.Popen(
+        [sys.executable, "-c", SERVE, "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)],
+        env=env, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1) as sock:
+                sock.sendall(b"GET /health HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n")
+                if sock.recv(12).startswith(b"HTTP/1.1 200"):
+                    return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError(f"server with {workers} workers did not start")
+
+
+def request(body: bytes) -> bytes:
+    return (b"POST /risk-analysis HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+            b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+
+
+async def keep_busy(port: int, requests: List[bytes], until: float) -> List[float]:
+    """Send the requests one after the other on one keep-alive connection until the deadline."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    latencies = []
+    index = 0
+    while time.perf_counter() < until:
+        start = time.perf_counter()
+        writer.write(requests[index % len(requests)])
+        headers = await reader.readuntil(b"\r\n\r\n")
+        length = int(headers.lower().split(b"content-length:", 1)[1].split(b"\r\n", 1)[0])
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - start)
+        index += 1
+    writer.close()
+    return latencies
+
+
+def generate_load(port: int, connections: int, duration: float, seed: int) -> List[float]:
+    requests = [request(subject.json().encode()) for subject in random_subjects(1000, seed=seed)]
+
+    async def run():
+        until = time.perf_counter() + duration
+        results = await asyncio.gather(*(keep_busy(port, requests[i:], until) for i in range(connections)))
+        return [latency for latencies in results for latency in latencies]
+    return asyncio.run(run())
+
+
+def load_test(workers: int, connections: int, client_processes: int, duration: float) -> Tuple[float, List[float]]:
+    port = free_port()
+    server = start_server(port, workers)
+    try:
+        generate_load(port, connections, 1, seed=0)  # Warm up
+        with ProcessPoolExecutor(client_processes) as executor:
+            results = list(executor.map(
+                generate_load, [port] * client_processes, [connections] * client_processes,
+                [duration] * client_processes, range(client_processes),
+            ))
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(60)
+    latencies = [latency for result in results for latency in result]
+    return len(latencies) / duration, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--connections", type=int, default=32, help="connections per load generator")
+    parser.add_argument("--client-processes", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"cores: {os.cpu_count()}, {args.client_processes} x {args.connections} connections, {args.duration} s")
+    print("workers      req/s    p50 ms    p99 ms  p99.9 ms")
+    for workers in args.workers:
+        throughput, latencies = load_test(workers, args.connections, args.client_processes, args.duration)
+        percentiles = statistics.quantiles(latencies, n=1000)
+        print(f"{workers:7} {throughput:10.0f} {percentiles[499] * 1e3:9.2f} {percentiles[989] * 1e3:9.2f} "
+              f"{percentiles[998] * 1e3:9.2f}")
+
+
+if __name__ == "__main__":
+    main()
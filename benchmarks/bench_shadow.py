@@ -0,0 +1,87 @@
+"""Compare the latency of POST /risk-analysis with and without shadow scoring by a candidate rule set.
+
+Requests are sent in waves of --concurrency concurrent requests, so the comparisons compete with them. The cost of
+queueing a subject on the request path and the time a batch of comparisons holds the event loop are timed on
+their own. Run from the repository root:
+    $ poetry run python -m benchmarks.bench_shadow --size 20000 --concurrency 32
+"""
+import argparse
+import asyncio
+import time
+from typing import List, Optional
+
+from src.main import app
+from risk_analysis.risk_analysis_controller import get_risk_analysis_service
+from risk_analysis.risk_analysis_rules import DEFAULT_RULE_SET
+from risk_analysis.risk_analysis_shadow import ShadowScorer
+from risk_analysis.risk_analysys_service import DEFAULT_LOOKUP_TABLE, RiskAnalysisService
+from risk_analysis.risk_lookup_table import RiskLookupTable
+from risk_analysis.risk_rule_engine import RuleEngine
+from benchmarks.bench_fast_codec import best_of
+from benchmarks.bench_persistence import percentile, timed_post
+from benchmarks.subjects import random_subjects
+
+# The default rule set with the income threshold lowered from 200000 to 100000
+CANDIDATE_RULE_SET = DEFAULT_RULE_SET.copy(deep=True)
+CANDIDATE_RULE_SET.version = "candidate"
+CANDIDATE_RULE_SET.rules[1].conditions[0].value = 100000
+
+
+async def request_latencies(bodies: List[bytes], concurrency: int, shadow: Optional[ShadowScorer]) -> List[float]:
+    service = RiskAnalysisService(shadow=shadow)
+    app.dependency_overrides[get_risk_analysis_service] = lambda: service
+    if shadow is not None:
+        await shadow.start()
+    latencies = []
+    try:
+        for start in range(0, len(bodies), concurrency):
+            latencies.extend(await asyncio.gather(*map(timed_post, bodies[start:start + concurrency])))
+    finally:
+        app.dependency_overrides.clear()
+        if shadow is not None:
+            await shadow.close()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--max-pending", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    candidate = RiskLookupTable(RuleEngine(CANDIDATE_RULE_SET))
+    subjects = random_subjects(args.size)
+    bodies = [subject.json().encode() for subject in subjects]
+    asyncio.run(request_latencies(bodies[:1000], args.concurrency, None))  # Warm up
+
+    shadow = ShadowScorer(candidate, args.max_pending, args.batch_size)
+    without_shadow = asyncio.run(request_latencies(bodies, args.concurrency, None))
+    with_shadow = asyncio.run(request_latencies(bodies, args.concurrency, shadow))
+
+    print(f"requests:              {args.size}, {args.concurrency} concurrent")
+    for name, latencies in (("without shadow", without_shadow), ("with shadow", with_shadow)):
+        print(f"{name + ':':22} p50 {percentile(latencies, 50) * 1e6:8.2f} µs   "
+              f"p99 {percentile(latencies, 99) * 1e6:8.2f} µs   max {max(latencies) * 1e6:8.2f} µs")
+    print(f"subjects compared:     {shadow.compared}, {shadow.dropped} dropped, {shadow.divergent} divergent")
+
+    async def submit_all():
+        queued = ShadowScorer(candidate, len(subjects))
+        await queued.start()
+        start = time.perf_counter()
+        for subject in subjects:
+            queued.submit(subject, DEFAULT_LOOKUP_TABLE)
+        elapsed = time.perf_counter() - start
+        queued.worker.cancel()
+        return elapsed
+    submit = min(asyncio.run(submit_all()) for _ in range(args.repeat)) / len(subjects)
+    items = [(subject, DEFAULT_LOOKUP_TABLE) for subject in subjects[:args.batch_size]]
+    batch = best_of(lambda: ShadowScorer(candidate).compare(items), args.repeat)
+    print(f"request path:          {submit * 1e6:.2f} µs to queue a subject")
+    print(f"event loop held:       {batch * 1e6:.2f} µs per batch of {args.batch_size} comparisons")
+
+
+if __name__ == "__main__":
+    main()
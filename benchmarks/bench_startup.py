@@ -0,0 +1,132 @@
+"""Measure the cold start of the API: the import cost of every module, then the time until a worker is ready.
+
+`python -X importtime` is run --repeat times on the app module, and the median self and cumulative import times
+of each module are reported, the slowest first, then summed per top-level package. Save a run with --output and
+compare later runs with --compare to track the cost of each module. Unless --imports-only is given, a one-worker
+`serve` is then started --repeat times, with the generated and with the static OpenAPI document, and the time from
+the process start to the first 200 of /health/ready is reported. Run from the repository root:
+    $ PYTHONPATH=.:src poetry run python -m benchmarks.bench_startup --repeat 5 --output imports.json
+    $ PYTHONPATH=.:src poetry run python -m benchmarks.bench_startup --compare imports.json --imports-only
+"""
+import argparse
+import collections
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.bench_server import free_port
+
+SOURCE_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def import_times(module: str) -> Dict[str, Tuple[int, int]]:
+    """Self and cumulative import time in microseconds of every module imported by a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SOURCE_ROOT, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_time, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(self_time), int(cumulative)
+    return times
+
+
+def median_import_times(module: str, repeat: int) -> Dict[str, Tuple[float, float]]:
+    runs = [import_times(module) for _ in range(repeat)]
+    return {
+        name: (statistics.median(run[name][0] for run in runs if name in run),
+               statistics.median(run[name][1] for run in runs if name in run))
+        for name in runs[0]
+    }
+
+
+def time_to_ready(openapi_path: Optional[str]) -> float:
+    """Seconds from the start of a one-worker server to its first ready answer"""
+    port = free_port()
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([".", "src"])}
+    if openapi_path:
+        env["RISK_ANALYSIS_OPENAPI_PATH"] = openapi_path
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-c", "from src.main import serve; serve()", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", "1"],
+        env=env, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < 60:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=1) as sock:
+                    sock.sendall(b"GET /health/ready HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n")
+                    if sock.recv(12).startswith(b"HTTP/1.1 200"):
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.005)
+        raise RuntimeError("server did not become ready")
+    finally:
+        server.terminate()
+        server.wait(60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="main", help="module imported, from the src directory")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20, help="number of modules listed")
+    parser.add_argument("--output", help="save the median import times of every module to this JSON file")
+    parser.add_argument("--compare", help="JSON file of a previous run to compare the import times with")
+    parser.add_argument("--imports-only", action="store_true", help="skip the time to ready")
+    args = parser.parse_args()
+
+    times = median_import_times(args.module, args.repeat)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = {name: tuple(value) for name, value in json.load(file).items()}
+
+    print(f"import {args.module}: {times[args.module][1] / 1e3:.1f} ms, {len(times)} modules, "
+          f"median of {args.repeat} runs")
+    print(f"{'module':50} {'self ms':>8} {'cumul ms':>9}" + (f" {'baseline':>9}" if baseline else ""))
+    for name, (self_time, cumulative) in sorted(times.items(), key=lambda item: -item[1][0])[:args.top]:
+        line = f"{name:50} {self_time / 1e3:8.2f} {cumulative / 1e3:9.2f}"
+        if baseline:
+            line += f" {baseline[name][1] / 1e3:9.2f}" if name in baseline else f" {'new':>9}"
+        print(line)
+
+    packages: Dict[str, float] = collections.defaultdict(float)
+    for name, (self_time, _) in times.items():
+        packages[name.split(".")[0]] += self_time
+    print(f"\n{'package':50} {'self ms':>8}")
+    for package, self_time in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{package:50} {self_time / 1e3:8.2f}")
+    if baseline:
+        removed = sorted(set(baseline) - set(times))
+        print(f"\nno longer imported: {len(removed)} modules, "
+              f"{sum(baseline[name][0] for name in removed) / 1e3:.1f} ms ({', '.join(removed[:10])}...)")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(times, file, indent=2)
+
+    if not args.imports_only:
+        with tempfile.TemporaryDirectory() as directory:
+            openapi_path = os.path.join(directory, "openapi.json")
+            subprocess.run([sys.executable, "-c", "from src.main import build_openapi; build_openapi()",
+                            openapi_path], env={**os.environ, "PYTHONPATH": os.pathsep.join([".", "src"])},
+                           check=True)
+            print(f"\n{'time to ready':50} {'median s':>8}")
+            for name, path in [("generated OpenAPI document", None), ("static OpenAPI document", openapi_path)]:
+                ready: List[float] = [time_to_ready(path) for _ in range(args.repeat)]
+                print(f"{name:50} {statistics.median(ready):8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Compare the what-if analysis with scoring each perturbed subject from zero, and its endpoint with one scoring call.
+
+Run from the repository root:
+    $ PYTHONPATH=.:src poetry run python -m benchmarks.bench_what_if --size 2000 --repeat 5
+"""
+import argparse
+import asyncio
+
+from src.risk_analysis.risk_analysys_service import DEFAULT_LOOKUP_TABLE, DEFAULT_RULE_ENGINE
+from src.risk_analysis.risk_analysis_what_if import WhatIfAnalysis
+from benchmarks.bench_fast_codec import best_of, post
+from benchmarks.subjects import perturb, random_subjects
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    subjects = random_subjects(args.size)
+    bodies = [subject.json().encode() for subject in subjects]
+    what_if = WhatIfAnalysis(DEFAULT_LOOKUP_TABLE)
+    # The perturbed subjects are built beforehand, only their scoring is timed
+    perturbed = [
+        [perturb(subject, perturbation["field"], perturbation["value"])
+         for perturbation in what_if.analyze(subject)["perturbations"]]
+        for subject in subjects
+    ]
+    perturbations = sum(map(len, perturbed)) / args.size
+
+    indexes = [DEFAULT_LOOKUP_TABLE.calculate_subject_index(subject) for subject in subjects]
+    first_of_cell = best_of(lambda: [what_if._analyze_cell(index) for index in indexes], args.repeat)
+    incremental = best_of(lambda: [what_if.analyze(subject) for subject in subjects], args.repeat)
+    rule_engine = best_of(
+        lambda: [[DEFAULT_RULE_ENGINE.calculate_subject_score(subject) for subject in changed]
+                 for changed in perturbed],
+        args.repeat,
+    )
+    lookup_table = best_of(
+        lambda: [[DEFAULT_LOOKUP_TABLE.calculate_subject_score(subject) for subject in changed]
+                 for changed in perturbed],
+        args.repeat,
+    )
+
+    def endpoint(path):
+        async def run():
+            for body in bodies:
+                await post(path, body)
+        return best_of(lambda: asyncio.run(run()), args.repeat) / args.size
+
+    score_endpoint = endpoint("/risk-analysis")
+    fast_endpoint = endpoint("/risk-analysis/fast")
+    what_if_endpoint = endpoint("/risk-analysis/what-if")
+
+    print(f"subjects:                    {args.size}, {perturbations:.1f} perturbations each")
+    print(f"what-if, first of its cell:  {first_of_cell / args.size * 1e6:8.2f} µs")
+    print(f"what-if, analyzed cell:      {incremental / args.size * 1e6:8.2f} µs")
+    print(f"perturbed, rule engine:      {rule_engine / args.size * 1e6:8.2f} µs")
+    print(f"perturbed, lookup table:     {lookup_table / args.size * 1e6:8.2f} µs")
+    print(f"POST /risk-analysis:         {score_endpoint * 1e6:8.2f} µs")
+    print(f"POST /risk-analysis/fast:    {fast_endpoint * 1e6:8.2f} µs")
+    print(f"POST /risk-analysis/what-if: {what_if_endpoint * 1e6:8.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Record timestamped request logs of synthetic applicants and replay them against a running instance.
+
+A request log holds one request per line: its time in seconds from the start of the log, its method and path, and
+the body of POST /risk-analysis requests drawn from benchmarks.population. Replay is open-loop: every request is
+sent at its scheduled time, on an idle keep-alive connection or a new one, whether or not the earlier requests got
+their response. Latencies are measured from the scheduled time, so a stalled server is charged for every request
+it delays rather than only the one it stalls on (coordinated omission), the time from the actual send is reported
+next to it. Run from the repository root:
+    $ poetry run python -m benchmarks.load_replay population --size 5 --age uniform:18:30
+    $ poetry run python -m benchmarks.load_replay record --rps 500 --duration 60 --output requests.ndjson
+    $ PYTHONPATH=.:src poetry run python -m benchmarks.load_replay replay requests.ndjson --rps 1000 --workers 2
+"""
+import argparse
+import asyncio
+import json
+import signal
+import sys
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, TextIO, Tuple
+
+import numpy as np
+
+from benchmarks.bench_server import free_port, start_server
+from benchmarks.population import POPULATION_FIELDS, PopulationConfig, generate_population, population_config
+
+ARRIVALS = ("poisson", "uniform")
+PERCENTILES = (50, 90, 99, 99.9)
+DEFAULT_MAX_CONNECTIONS = 256
+
+
+class Result(NamedTuple):
+    path: str
+    # Seconds from the start of the replay
+    scheduled: float
+    sent: float
+    done: float
+    # HTTP status, 0 when the connection failed
+    status: int
+
+
+def record(size: int, rps: float, config: PopulationConfig, health_share: float = 0.0, arrivals: str = "poisson",
+           seed: int = 42) -> List[dict]:
+    """Request log of size requests at rps requests per second, the same one for a given seed.
+
+    Poisson arrivals are spaced by exponential gaps, uniform ones by 1/rps. A health_share of the requests are
+    GET /health, the others POST /risk-analysis of the applicants of the population.
+    """
+    rng = np.random.default_rng(seed)
+    if arrivals == "poisson":
+        times = np.cumsum(rng.exponential(1 / rps, size)) - 1 / rps
+    else:
+        times = np.arange(size) / rps
+    health = (rng.random(size) < health_share).tolist()
+    bodies = iter(generate_population(size - sum(health), config, seed))
+    return [
+        {"at": round(at, 6), "method": "GET", "path": "/health"} if is_health else
+        {"at": round(at, 6), "method": "POST", "path": "/risk-analysis", "body": next(bodies)}
+        for at, is_health in zip(np.maximum(times, 0).tolist(), health)
+    ]
+
+
+def write_lines(records: Iterable[dict], file: TextIO) -> None:
+    for entry in records:
+        file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+
+def read_log(file: TextIO) -> List[dict]:
+    """Read a request log, in the order of the scheduled times"""
+    return sorted((json.loads(line) for line in file if line.strip()), key=lambda entry: entry["at"])
+
+
+def encode_request(entry: dict, host: str) -> bytes:
+    body = json.dumps(entry["body"]).encode() if "body" in entry else b""
+    headers = f"{entry['method']} {entry['path']} HTTP/1.1\r\nHost: {host}\r\n"
+    if body:
+        headers += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+    return (headers + "\r\n").encode() + body
+
+
+class ConnectionPool:
+    """Keep-alive connections to one server, at most max_connections of them open at once"""
+
+    def __init__(self, host: str, port: int, max_connections: int = DEFAULT_MAX_CONNECTIONS) -> None:
+        self.host = host
+        self.port = port
+        self.idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self.slots = asyncio.Semaphore(max_connections)
+        self.opened = 0
+
+    async def send(self, request: bytes) -> Tuple[int, float]:
+        """Send one request and return the status of its response, 0 when the connection failed, and the time it
+        was written at.
+
+        A request failing on a reused connection, closed by the server since its last response, is sent again on a
+        new one.
+        """
+        async with self.slots:
+            while self.idle:
+                reader, writer = self.idle.pop()
+                if not reader.at_eof():
+                    status, sent = await self._exchange(reader, writer, request)
+                    if status:
+                        return status, sent
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError:
+                return 0, time.perf_counter()
+            self.opened += 1
+            return await self._exchange(reader, writer, request)
+
+    async def _exchange(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                        request: bytes) -> Tuple[int, float]:
+        sent = time.perf_counter()
+        try:
+            writer.write(request)
+            headers = await reader.readuntil(b"\r\n\r\n")
+            status = int(headers.split(b" ", 2)[1])
+            fields = headers.lower()
+            length = int(fields.split(b"content-length:", 1)[1].split(b"\r\n", 1)[0])
+            await reader.readexactly(length)
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+            writer.close()
+            return 0, sent
+        if b"connection: close" in fields:
+            writer.close()
+        else:
+            self.idle.append((reader, writer))
+        return status, sent
+
+    def close(self) -> None:
+        for _, writer in self.idle:
+            writer.close()
+        self.idle.clear()
+
+
+async def replay(log: List[dict], host: str, port: int, rps: Optional[float] = None,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS) -> List[Result]:
+    """Send the requests of a log at their scheduled times, the times scaled to rps requests per second if given.
+
+    Requests are started by the schedule only, a request waiting for a free connection keeps its scheduled time.
+    """
+    scale = 1.0
+    if rps is not None and len(log) > 1 and log[-1]["at"] > 0:
+        scale = len(log) / log[-1]["at"] / rps
+    pool = ConnectionPool(host, port, max_connections)
+    requests = [encode_request(entry, host) for entry in log]
+    results = []
+    start = time.perf_counter()
+
+    async def send(path: str, request: bytes, scheduled: float) -> None:
+        status, sent = await pool.send(request)
+        results.append(Result(path, scheduled, sent - start, time.perf_counter() - start, status))
+
+    tasks = []
+    for entry, request in zip(log, requests):
+        scheduled = entry["at"] * scale
+        delay = scheduled - (time.perf_counter() - start)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(send(entry["path"], request, scheduled)))
+    await asyncio.gather(*tasks)
+    pool.close()
+    return sorted(results, key=lambda result: result.scheduled)
+
+
+def latency_percentiles(latencies: np.ndarray) -> Dict[str, float]:
+    if not len(latencies):
+        return {}
+    values = np.percentile(latencies, PERCENTILES)
+    return {**{f"p{rank:g}": float(value) for rank, value in zip(PERCENTILES, values)}, "max": float(latencies.max())}
+
+
+def summarize(results: List[Result]) -> Dict[str, dict]:
+    """Requests, errors, throughput and latency percentiles per path and over all of them.
+
+    `latency` is measured from the scheduled time, corrected for coordinated omission, `service_time` from the
+    actual send. The throughput counts the successful responses over the time from the first scheduled request to
+    the last response.
+    """
+    if not results:
+        return {}
+    duration = max(result.done for result in results) - min(result.scheduled for result in results)
+    groups = {"all": results}
+    for result in results:
+        groups.setdefault(result.path, []).append(result)
+    summary = {}
+    for path, group in groups.items():
+        times = np.array([(result.scheduled, result.sent, result.done) for result in group])
+        ok = np.array([200 <= result.status < 300 for result in group])
+        summary[path] = {
+            "requests": len(group),
+            "errors": int((~ok).sum()),
+            "throughput": float(ok.sum() / duration) if duration > 0 else 0.0,
+            "latency": latency_percentiles(times[ok, 2] - times[ok, 0]),
+            "service_time": latency_percentiles(times[ok, 2] - times[ok, 1]),
+            # Longest wait for the event loop or a free connection
+            "max_send_delay": float((times[:, 1] - times[:, 0]).max()),
+        }
+    return summary
+
+
+def format_summary(summary: Dict[str, dict]) -> str:
+    ranks = [f"p{rank:g}" for rank in PERCENTILES] + ["max"]
+    lines = [f"{'path':16} {'requests':>9} {'errors':>7} {'req/s':>9}  {'latency ms':11} "
+             + " ".join(f"{rank:>8}" for rank in ranks)]
+    for path, stats in summary.items():
+        for name, label in (("latency", "scheduled"), ("service_time", "sent")):
+            prefix = (f"{path:16} {stats['requests']:9} {stats['errors']:7} {stats['throughput']:9.1f}"
+                      if name == "latency" else " " * 44)
+            lines.append(f"{prefix}  {'from ' + label:11} "
+                         + " ".join(f"{stats[name].get(rank, float('nan')) * 1e3:8.2f}" for rank in ranks))
+    return "\n".join(lines)
+
+
+def add_population_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--seed", type=int, default=42)
+    for field in POPULATION_FIELDS:
+        parser.add_argument(f"--{field.replace('_', '-')}", dest=field, metavar="DISTRIBUTION",
+                            help=f"distribution of {field}, as in benchmarks.population")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    population = commands.add_parser("population", help="write request bodies of synthetic applicants")
+    population.add_argument("--size", type=int, default=1000)
+    population.add_argument("--output", type=argparse.FileType("w"), default=sys.stdout)
+    add_population_arguments(population)
+    recorder = commands.add_parser("record", help="write a timestamped request log")
+    recorder.add_argument("--rps", type=float, default=100)
+    recorder.add_argument("--duration", type=float, default=60)
+    recorder.add_argument("--health-share", type=float, default=0.0, help="share of GET /health requests")
+    recorder.add_argument("--arrivals", choices=ARRIVALS, default="poisson")
+    recorder.add_argument("--output", type=argparse.FileType("w"), default=sys.stdout)
+    add_population_arguments(recorder)
+    replayer = commands.add_parser("replay", help="send the requests of a log and report the latencies")
+    replayer.add_argument("log", type=argparse.FileType("r"))
+    replayer.add_argument("--rps", type=float, help="target rate, the rate of the log by default")
+    replayer.add_argument("--host", default="127.0.0.1")
+    replayer.add_argument("--port", type=int, help="port of a running instance, one is started by default")
+    replayer.add_argument("--workers", type=int, default=1, help="workers of the started instance")
+    replayer.add_argument("--max-connections", type=int, default=DEFAULT_MAX_CONNECTIONS)
+    replayer.add_argument("--results", type=argparse.FileType("w"), help="NDJSON file of every request result")
+    replayer.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    if args.command in ("population", "record"):
+        try:
+            config = population_config(**{field: getattr(args, field) for field in POPULATION_FIELDS})
+        except ValueError as error:
+            parser.error(str(error))
+        if args.command == "population":
+            write_lines(generate_population(args.size, config, args.seed), args.output)
+        else:
+            write_lines(record(int(args.rps * args.duration), args.rps, config, args.health_share, args.arrivals,
+                               args.seed), args.output)
+        if args.output is not sys.stdout:
+            args.output.close()
+        return
+
+    log = read_log(args.log)
+    server = None
+    port = args.port
+    if port is None:
+        port = free_port()
+        server = start_server(port, args.workers)
+    try:
+        results = asyncio.run(replay(log, args.host, port, args.rps, args.max_connections))
+    finally:
+        if server is not None:
+            server.send_signal(signal.SIGTERM)
+            server.wait(60)
+    if args.results is not None:
+        write_lines((result._asdict() for result in results), args.results)
+        args.results.close()
+    summary = summarize(results)
+    print(json.dumps(summary, indent=2) if args.json else format_summary(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Seeded synthetic populations of applicants, with configurable distributions of their fields.
+
+A distribution is written `kind:parameters`, as on the command line of benchmarks.load_replay:
+    uniform:16:85                 integers from 16 to 85, both included
+    normal:42:14:16:85            normal of mean 42 and deviation 14, rounded and clipped to [16, 85]
+    lognormal:11:0.9:0:2000000    log-normal of the log mean 11 and log deviation 0.9, clipped to [0, 2000000]
+    choice:single=0.55,married=0.45
+Optional fields (house, vehicle) are drawn as None with the probability of their `none` choice.
+"""
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from src.risk_analysis.schemas.personal_information_schema import MaritalStatusEnum, OwnershipStatusEnum
+from src.risk_analysis.risk_analysis_fast_codec import VEHICLE_YEAR_MAX, VEHICLE_YEAR_MIN
+
+
+class Distribution(NamedTuple):
+    kind: str
+    parameters: Tuple
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        return SAMPLERS[self.kind](rng, size, *self.parameters)
+
+    def __str__(self) -> str:
+        if self.kind == "choice":
+            return "choice:" + ",".join(f"{value}={weight:g}" for value, weight in self.parameters)
+        return ":".join([self.kind, *(f"{parameter:.15g}" for parameter in self.parameters)])
+
+
+def _uniform(rng: np.random.Generator, size: int, low: float, high: float) -> np.ndarray:
+    return rng.integers(int(low), int(high), size, endpoint=True)
+
+
+def _normal(rng: np.random.Generator, size: int, mean: float, deviation: float, low: float = -np.inf,
+            high: float = np.inf) -> np.ndarray:
+    return np.clip(np.rint(rng.normal(mean, deviation, size)), low, high).astype(np.int64)
+
+
+def _lognormal(rng: np.random.Generator, size: int, mean: float, deviation: float, low: float = 0,
+               high: float = np.inf) -> np.ndarray:
+    return np.clip(np.rint(rng.lognormal(mean, deviation, size)), low, high).astype(np.int64)
+
+
+def _choice(rng: np.random.Generator, size: int, *weighted_values: Tuple[str, float]) -> np.ndarray:
+    values = np.array([value for value, _ in weighted_values], dtype=object)
+    weights = np.array([weight for _, weight in weighted_values], dtype=float)
+    return values[rng.choice(len(values), size, p=weights / weights.sum())]
+
+
+SAMPLERS: Dict[str, Callable[..., np.ndarray]] = {
+    "uniform": _uniform,
+    "normal": _normal,
+    "lognormal": _lognormal,
+    "choice": _choice,
+}
+# Number of parameters of each kind, the last two of normal and lognormal are the optional clipping bounds
+_PARAMETER_COUNTS = {"uniform": (2,), "normal": (2, 4), "lognormal": (2, 4)}
+
+
+def parse_distribution(text: str) -> Distribution:
+    """Parse a distribution written `kind:parameters`, raising ValueError for any other text."""
+    kind, _, parameters = text.partition(":")
+    if kind == "choice":
+        weighted_values = []
+        for choice in parameters.split(","):
+            value, _, weight = choice.partition("=")
+            weighted_values.append((value, float(weight) if weight else 1.0))
+        if not parameters or any(weight < 0 for _, weight in weighted_values) or \
+                not sum(weight for _, weight in weighted_values) > 0:
+            raise ValueError(f"invalid choice distribution: {text!r}")
+        return Distribution(kind, tuple(weighted_values))
+    if kind not in _PARAMETER_COUNTS:
+        raise ValueError(f"unknown distribution {kind!r}, expected one of {', '.join(SAMPLERS)}")
+    values = tuple(float(parameter) for parameter in parameters.split(":")) if parameters else ()
+    if len(values) not in _PARAMETER_COUNTS[kind]:
+        raise ValueError(f"{kind} distribution takes {' or '.join(map(str, _PARAMETER_COUNTS[kind]))} parameters")
+    return Distribution(kind, values)
+
+
+class PopulationConfig(NamedTuple):
+    """Distribution of every field of the generated applicants"""
+    age: Distribution = parse_distribution("normal:42:14:16:85")
+    dependents: Distribution = parse_distribution("choice:0=0.45,1=0.2,2=0.2,3=0.1,4=0.05")
+    income: Distribution = parse_distribution("lognormal:11:0.9:0:2000000")
+    marital_status: Distribution = parse_distribution("choice:single=0.55,married=0.45")
+    house: Distribution = parse_distribution("choice:none=0.35,owned=0.35,mortgaged=0.3")
+    # Build years of the vehicles, clipped to the years accepted by VehicleSchema
+    vehicle_year: Distribution = parse_distribution(f"uniform:{VEHICLE_YEAR_MAX - 20}:{VEHICLE_YEAR_MAX - 1}")
+    vehicle: Distribution = parse_distribution("choice:none=0.3,vehicle=0.7")
+    risk_answer: Distribution = parse_distribution("choice:0=0.5,1=0.5")
+
+
+DEFAULT_POPULATION = PopulationConfig()
+POPULATION_FIELDS = PopulationConfig._fields
+
+
+def generate_population(size: int, config: PopulationConfig = DEFAULT_POPULATION, seed: int = 42) -> List[dict]:
+    """Request bodies of POST /risk-analysis drawn from the config, the same ones for a given seed.
+
+    Every field is drawn as one vector, ages, dependents and incomes are clipped to the values the API accepts.
+    """
+    rng = np.random.default_rng(seed)
+    age = np.maximum(config.age.sample(rng, size).astype(np.int64), 0).tolist()
+    dependents = np.maximum(config.dependents.sample(rng, size).astype(np.int64), 0).tolist()
+    income = np.maximum(config.income.sample(rng, size).astype(np.int64), 0).tolist()
+    marital_status = config.marital_status.sample(rng, size).tolist()
+    house = config.house.sample(rng, size).tolist()
+    vehicle_year = np.clip(config.vehicle_year.sample(rng, size).astype(np.int64), VEHICLE_YEAR_MIN,
+                           VEHICLE_YEAR_MAX - 1).tolist()
+    has_vehicle = (config.vehicle.sample(rng, size) != "none").tolist()
+    risk_answers = config.risk_answer.sample(rng, 3 * size).astype(np.int64).reshape(size, 3).tolist()
+    return [
+        {
+            "age": age[row],
+            "dependents": dependents[row],
+            "house": {"ownership_status": house[row]} if house[row] != "none" else None,
+            "income": income[row],
+            "marital_status": marital_status[row],
+            "risk_questions": risk_answers[row],
+            "vehicle": {"year": vehicle_year[row]} if has_vehicle[row] else None,
+        }
+        for row in range(size)
+    ]
+
+
+def population_config(**distributions: Optional[str]) -> PopulationConfig:
+    """DEFAULT_POPULATION with the fields given as distribution texts replaced, None keeps the default."""
+    unknown = set(distributions) - set(POPULATION_FIELDS)
+    if unknown:
+        raise ValueError(f"unknown population fields: {', '.join(sorted(unknown))}")
+    config = DEFAULT_POPULATION._replace(**{
+        field: parse_distribution(text) for field, text in distributions.items() if text is not None
+    })
+    for field, values in (("marital_status", [status.value for status in MaritalStatusEnum]),
+                          ("house", ["none", *(status.value for status in OwnershipStatusEnum)])):
+        distribution = getattr(config, field)
+        if distribution.kind != "choice" or any(value not in values for value, _ in distribution.parameters):
+            raise ValueError(f"{field} takes a choice of {', '.join(values)}")
+    return config
@@ -0,0 +1,77 @@
+"""Randomized subjects for the benchmarks, covering every branch of the risk rules."""
+import datetime
+import random
+from typing import Dict, List, Union
+
+from src.risk_analysis.schemas.personal_information_schema import PersonalInformationSchema, HouseSchema, VehicleSchema
+from src.risk_analysis.risk_calculator import RiskCalculator
+from src.risk_analysis.risk_analysis_constants import MAX_AGE_LIMIT, MIN_AGE_LIMIT, MIN_INCOME, MIN_INCOME_THRESHOLD
+
+CURRENT_YEAR = datetime.date.today().year
+
+
+def random_subjects(size: int, seed: int = 42) -> List[PersonalInformationSchema]:
+    """Subjects drawn from a plausible population of applicants, the same ones for a given seed."""
+    rng = random.Random(seed)
+    return [
+        PersonalInformationSchema(
+            age=rng.randint(16, 85),
+            dependents=rng.choice([0, 0, 1, 2, 3]),
+            house=rng.choice([None, {"ownership_status": "owned"}, {"ownership_status": "mortgaged"}]),
+            income=rng.choice([0, rng.randint(1, 199999), rng.randint(200000, 500000)]),
+            marital_status=rng.choice(["single", "married"]),
+            risk_questions=[rng.randint(0, 1) for _ in range(3)],
+            vehicle=rng.choice([None, {"year": rng.randint(CURRENT_YEAR - 20, CURRENT_YEAR - 1)}]),
+        )
+        for _ in range(size)
+    ]
+
+
+def rule_branches(subject: PersonalInformationSchema) -> Dict[str, bool]:
+    """Outcome of every condition of the risk rules for a subject."""
+    calculator = RiskCalculator(subject)
+    return {
+        "has_income": calculator.subject_check_income_min(MIN_INCOME),
+        "income_over_threshold": calculator.subject_check_income_min(MIN_INCOME_THRESHOLD),
+        "mortgaged_house": calculator.subject_has_mortgaged_house(),
+        "has_dependents": calculator.subject_has_dependents(),
+        "married": calculator.subject_is_married(),
+        "recent_vehicle": calculator.subject_vehicle_age(),
+        "age_in_range": calculator.subject_age_range(MIN_AGE_LIMIT, MAX_AGE_LIMIT),
+        "under_min_age": calculator.subject_under_min_age(MIN_AGE_LIMIT),
+        "over_max_age": calculator.subject_over_max_age(MAX_AGE_LIMIT),
+    }
+
+
+def uncovered_branches(subjects: List[PersonalInformationSchema]) -> List[str]:
+    """Return the rule conditions that are never true, or never false, for the subjects."""
+    outcomes = {}
+    for subject in subjects:
+        for name, outcome in rule_branches(subject).items():
+            outcomes.setdefault(name, set()).add(outcome)
+    return [f"{name}={outcome}" for name, seen in outcomes.items() for outcome in (True, False) if outcome not in seen]
+
+
+def perturb(subject: PersonalInformationSchema, field: str, value: Union[int, str, None]) -> PersonalInformationSchema:
+    """Copy of subject with the field of a what-if perturbation set to its value."""
+    if field == "vehicle.year":
+        return subject.copy(update={"vehicle": VehicleSchema.construct(year=value) if value is not None else None})
+    if field == "house.ownership_status":
+        return subject.copy(update={"house": HouseSchema.construct(ownership_status=value) if value else None})
+    if field == "risk_questions":
+        return subject.copy(update={"risk_questions": [True] * value + [False] * (3 - value)})
+    return subject.copy(update={field: value})
+
+
+def subject_columns_json(subjects: List[PersonalInformationSchema]) -> Dict[str, list]:
+    """Columnar JSON dataset of subjects, in the columns of the file scoring."""
+    return {
+        "age": [subject.age for subject in subjects],
+        "dependents": [subject.dependents for subject in subjects],
+        "income": [subject.income for subject in subjects],
+        "marital_status": [subject.marital_status.value for subject in subjects],
+        "house": [subject.house.ownership_status.value if subject.house else None for subject in subjects],
+        "vehicle_year": [subject.vehicle.year if subject.vehicle else None for subject in subjects],
+        **{f"risk_{answer + 1}": [int(subject.risk_questions[answer]) for subject in subjects]
+           for answer in range(3)},
+    }
@@ -0,0 +1,134 @@
+"""Benchmark suite of the scorer, the service and the HTTP layer, with a JSON baseline to catch regressions.
+
+Run from the repository root:
+    $ poetry run python -m benchmarks.suite --output baseline.json
+    $ poetry run python -m benchmarks.suite --compare baseline.json --threshold 0.15
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+from src.risk_analysis.risk_calculator import RiskCalculator
+from src.risk_analysis.risk_analysys_service import RiskAnalysisService
+from benchmarks.subjects import random_subjects, uncovered_branches
+
+DEFAULT_THRESHOLD = 0.15
+
+
+def bench_calculator(subjects) -> Callable[[], None]:
+    def run():
+        for subject in subjects:
+            RiskCalculator(subject).calculate_subject_score()
+    return run
+
+
+def bench_service(subjects) -> Callable[[], None]:
+    service = RiskAnalysisService()
+
+    def run():
+        for subject in subjects:
+            service.run_risk_analysis(subject)
+    return run
+
+
+def bench_http(subjects) -> Callable[[], None]:
+    # The app is only imported by this layer, its module imports `risk_analysis` from `src`
+    from benchmarks.bench_fast_codec import post
+
+    bodies = [subject.json().encode() for subject in subjects]
+
+    async def post_all():
+        for body in bodies:
+            await post("/risk-analysis", body)
+
+    def run():
+        asyncio.run(post_all())
+    return run
+
+
+# Layers of the suite, from the bare scorer to a full request through the ASGI app
+BENCHMARKS = {
+    "calculator": bench_calculator,
+    "service": bench_service,
+    "http": bench_http,
+}
+
+
+def run_suite(names: List[str], size: int, rounds: int, seed: int = 42) -> dict:
+    subjects = random_subjects(size, seed)
+    uncovered = uncovered_branches(subjects)
+    if uncovered:
+        raise ValueError(f"subjects do not cover the rule branches: {', '.join(uncovered)}")
+
+    results = {}
+    for name in names:
+        run = BENCHMARKS[name](subjects)
+        run()  # Warm up
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - start) / size * 1e9)
+        results[name] = {
+            "median_ns": statistics.median(timings),
+            "min_ns": min(timings),
+            "max_ns": max(timings),
+            "rounds": rounds,
+        }
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "size": size,
+        "seed": seed,
+        "benchmarks": results,
+    }
+
+
+def compare_results(results: dict, baseline: dict) -> Dict[str, float]:
+    """Return the relative change of the median of every benchmark found in both runs, e.g. 0.2 for 20% slower."""
+    return {
+        name: result["median_ns"] / baseline["benchmarks"][name]["median_ns"] - 1
+        for name, result in results["benchmarks"].items()
+        if name in baseline["benchmarks"]
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=2000, help="subjects scored per round")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--benchmark", action="append", choices=list(BENCHMARKS),
+                        help="benchmark to run, all of them by default")
+    parser.add_argument("--output", help="save the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown of a median that fails the comparison")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.benchmark or list(BENCHMARKS), args.size, args.rounds)
+    for name, result in results["benchmarks"].items():
+        print(f"{name:12} {result['median_ns']:12.1f} ns/subject (min {result['min_ns']:.1f})")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if not args.compare:
+        return 0
+    with open(args.compare) as file:
+        baseline = json.load(file)
+    changes = compare_results(results, baseline)
+    regressions = [name for name, change in changes.items() if change > args.threshold]
+    for name, change in changes.items():
+        status = "REGRESSION" if name in regressions else "ok"
+        print(f"{name:12} {change:+8.1%} against {args.compare} {status}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
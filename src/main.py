@@ -1,20 +1,130 @@
-import uvicorn
-from fastapi import FastAPI
+import sys
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.openapi.utils import get_openapi
-from risk_analysis import risk_analysis_controller
+from risk_analysis import risk_analysis_controller, risk_analysis_startup
+from risk_analysis.risk_analysis_constants import (
+    OPENAPI_PATH, RATE_LIMIT_BURST, RATE_LIMIT_KEY_HEADER, RATE_LIMIT_MAX_CLIENTS, RATE_LIMIT_PER_SECOND,
+)
+from risk_analysis.risk_analysis_idempotency import IdempotencyMiddleware
+from risk_analysis.risk_analysis_metrics import PROMETHEUS_CONTENT_TYPE
+from risk_analysis.risk_analysis_rate_limit import RateLimitMiddleware, TokenBucketLimiter
+from risk_analysis.risk_analysis_store import StoreBatchTooLargeError, StoreUnavailableError
 
 app = FastAPI()
+health_check = risk_analysis_startup.HealthCheck()
 app.include_router(risk_analysis_controller.router)
+# Added before the rate limit, which wraps it: the retries answered from the cache are still limited
+if risk_analysis_controller.idempotency_cache is not None:
+    app.add_middleware(
+        IdempotencyMiddleware,
+        cache=risk_analysis_controller.idempotency_cache,
+        paths=risk_analysis_controller.IDEMPOTENT_PATHS,
+        stored_headers=[risk_analysis_controller.RULE_SET_VERSION_HEADER],
+    )
+if RATE_LIMIT_PER_SECOND > 0:
+    app.add_middleware(
+        RateLimitMiddleware,
+        limiter=TokenBucketLimiter(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST, max_keys=RATE_LIMIT_MAX_CLIENTS),
+        path_prefix=risk_analysis_controller.router.prefix,
+        key_header=RATE_LIMIT_KEY_HEADER or None,
+    )
+
+
+@app.on_event("shutdown")
+async def stop_readiness():
+    """Registered first, so that the app stops reporting ready before draining"""
+    health_check.ready = False
+
+
+@app.on_event("startup")
+async def start_store():
+    if risk_analysis_controller.risk_analysis_store is not None:
+        await risk_analysis_controller.risk_analysis_store.start()
+
+
+@app.on_event("shutdown")
+async def close_store():
+    """Write the queued scoring decisions before exiting"""
+    if risk_analysis_controller.risk_analysis_store is not None:
+        await risk_analysis_controller.risk_analysis_store.close()
+
+
+@app.on_event("startup")
+async def start_shadow():
+    if risk_analysis_controller.risk_analysis_shadow is not None:
+        await risk_analysis_controller.risk_analysis_shadow.start()
+
+
+@app.on_event("shutdown")
+async def close_shadow():
+    if risk_analysis_controller.risk_analysis_shadow is not None:
+        await risk_analysis_controller.risk_analysis_shadow.close()
+
+
+@app.on_event("startup")
+async def start_rule_set_reloader():
+    if risk_analysis_controller.rule_set_reloader is not None:
+        await risk_analysis_controller.rule_set_reloader.start()
+
+
+@app.on_event("shutdown")
+async def close_rule_set_reloader():
+    if risk_analysis_controller.rule_set_reloader is not None:
+        await risk_analysis_controller.rule_set_reloader.close()
+
+
+@app.on_event("startup")
+async def warm_up():
+    """Registered last, so that the app reports ready once every other startup handler is done"""
+    risk_analysis_startup.warm_up(app, risk_analysis_controller.risk_analysis_service)
+    health_check.ready = True
+
+
+@app.exception_handler(StoreUnavailableError)
+async def store_unavailable_handler(request: Request, error: StoreUnavailableError):
+    return JSONResponse({"detail": str(error)}, status_code=503, headers={"Retry-After": "1"})
+
+
+@app.exception_handler(StoreBatchTooLargeError)
+async def store_batch_too_large_handler(request: Request, error: StoreBatchTooLargeError):
+    return JSONResponse({"detail": str(error)}, status_code=413)
 
 
 @app.get("/health")
 async def root():
-    return {"status": "ok", "info": {}, "error": {}, "details": {}}
+    """Liveness and readiness of the process, 503 until its startup is done"""
+    report = health_check.report()
+    return JSONResponse(report, status_code=200 if health_check.ready else 503)
+
+
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe, 200 as long as the process answers"""
+    return health_check.indicators()["liveness"]
+
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe, 503 until the scoring tables are warmed and once the shutdown starts"""
+    return JSONResponse(health_check.indicators()["readiness"], status_code=200 if health_check.ready else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus metrics, empty unless RISK_ANALYSIS_METRICS_ENABLED=1"""
+    return PlainTextResponse(
+        risk_analysis_controller.risk_analysis_metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE,
+    )
 
 
 def custom_openapi():
     if app.openapi_schema:
         return app.openapi_schema
+    if OPENAPI_PATH:
+        app.openapi_schema = risk_analysis_startup.read_openapi(OPENAPI_PATH)
+        return app.openapi_schema
     openapi_schema = get_openapi(
         title="Origin - Risk Analysis",
         version="0.1.0",
@@ -33,16 +143,41 @@ app.openapi = custom_openapi
 
 def start():
     """Launched with `poetry run start` at root level"""
+    import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
 
 
+def serve():
+    """Launched with `poetry run serve` at root level, one worker per core for production"""
+    from risk_analysis import risk_analysis_server
+    risk_analysis_server.main(app)
+
+
+def build_openapi():
+    """Launched with `poetry run build-openapi [output file]` at root level, when building the image"""
+    risk_analysis_startup.write_openapi(app, sys.argv[1] if len(sys.argv) > 1 else OPENAPI_PATH or "openapi.json")
+
+
+def score_file():
+    """Launched with `poetry run score-file <input file>` at root level"""
+    from risk_analysis import risk_file_scoring
+    risk_file_scoring.main()
+
+
+def portfolio_analytics():
+    """Launched with `poetry run portfolio-analytics <input file>` at root level"""
+    from risk_analysis import risk_portfolio_analytics
+    risk_portfolio_analytics.main()
+
+
 """
     TODO
      - [ ] Docker and compose with debug
      - [ ] ORM with SQLite to store data
+     - [x] SQLite audit trail of the scoring decisions
      - [x] Create Endpoint
      - [x] Document OpenAPI
-     - [ ] API Rate Limit
+     - [x] API Rate Limit
      - [ ] Authentication Header
      - [x] Unit Tests, E2E Tests
      - [ ] Update Readme
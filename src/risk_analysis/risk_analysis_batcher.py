@@ -0,0 +1,97 @@
+import asyncio
+from typing import List, Optional, Tuple, Union
+
+from .schemas.personal_information_schema import PersonalInformationSchema
+from .schemas.risk_score import RiskProfile
+from .risk_lookup_table import RiskLookupTable
+from .risk_analysys_service import RiskAnalysisService
+
+
+class RiskAnalysisBatcher:
+    """Coalesce the subjects of concurrent requests into batches scored by the vectorized path.
+
+    The first request of a batch opens a window of `window` seconds. The batch is scored when the window closes
+    or as soon as it holds max_size subjects, whichever comes first, then the future of every request is
+    resolved. Identical subjects of a batch are scored once. Scoring runs on the event loop: a batch is a single
+    synchronous call, so no request interleaves with it.
+    """
+    service: RiskAnalysisService
+    window: float
+    max_size: int
+
+    def __init__(self, service: RiskAnalysisService, window: float, max_size: int) -> None:
+        if window <= 0:
+            raise ValueError("window must be greater than 0")
+        if max_size <= 0:
+            raise ValueError("max_size must be greater than 0")
+        self.service = service
+        self.window = window
+        self.max_size = max_size
+        self.pending: List[Tuple[PersonalInformationSchema, RiskLookupTable, asyncio.Future]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.batches = 0
+        self.subjects = 0
+        self.full_batches = 0
+
+    async def run_risk_analysis(self, subject: PersonalInformationSchema,
+                                lookup_table: RiskLookupTable) -> RiskProfile:
+        """Score the subject with lookup_table along with the subjects of the concurrent requests"""
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((subject, lookup_table, future))
+        if len(self.pending) >= self.max_size:
+            self.full_batches += 1
+            self.flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.window, self.flush)
+        return await future
+
+    def flush(self) -> None:
+        """Score the pending subjects now, each group of a rule set in one call"""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+        self.batches += 1
+        self.subjects += len(pending)
+
+        # A rule set swapped during the window leaves the requests pinned to the previous one
+        groups = {}
+        for item in pending:
+            groups.setdefault(id(item[1]), []).append(item)
+        for group in groups.values():
+            subjects = [subject for subject, _, _ in group]
+            lookup_table = group[0][1]
+            try:
+                results = self.service.run_coalesced_risk_analysis(subjects, lookup_table)
+            except Exception as error:
+                # Scored again one subject at a time, so that a failing subject only fails its own request
+                results = [error] if len(group) == 1 else [self._score_alone(subject, lookup_table)
+                                                          for subject in subjects]
+            for (_, _, future), result in zip(group, results):
+                # The request may have been cancelled, e.g. by a client disconnect
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _score_alone(self, subject: PersonalInformationSchema,
+                     lookup_table: RiskLookupTable) -> Union[RiskProfile, Exception]:
+        try:
+            return self.service.run_coalesced_risk_analysis([subject], lookup_table)[0]
+        except Exception as error:
+            return error
+
+    def stats(self) -> dict:
+        return {
+            "enabled": True,
+            "window_ms": self.window * 1e3,
+            "max_size": self.max_size,
+            "pending": len(self.pending),
+            "batches": self.batches,
+            "subjects": self.subjects,
+            "full_batches": self.full_batches,
+        }
@@ -0,0 +1,111 @@
+import datetime
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Tuple
+
+from .schemas.personal_information_schema import PersonalInformationSchema
+
+
+def subject_cache_key(subject: PersonalInformationSchema) -> Tuple:
+    """Canonical key of a subject, made only of the fields that affect its score."""
+    house = subject.house
+    vehicle = subject.vehicle
+    return (
+        subject.age,
+        subject.dependents,
+        subject.income,
+        subject.marital_status,
+        house.ownership_status if house is not None else None,
+        vehicle.year if vehicle is not None else None,
+        sum(subject.risk_questions),
+    )
+
+
+def next_year_boundary(timestamp: float) -> float:
+    """Timestamp of the next January 1st, when every vehicle gets one year older."""
+    year = datetime.datetime.fromtimestamp(timestamp).year
+    return datetime.datetime(year + 1, 1, 1).timestamp()
+
+
+class RiskAnalysisCache:
+    """Bounded LRU cache of risk profiles with a per-entry TTL.
+
+    Entries never outlive the current year, because the vehicle age rule depends on it.
+    """
+    max_size: int
+    ttl_seconds: float
+
+    def __init__(self, max_size: int, ttl_seconds: float, clock: Callable[[], float] = time.time) -> None:
+        if max_size <= 0:
+            raise ValueError("max_size must be greater than 0")
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.year_boundary = next_year_boundary(clock())
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _roll_year(self, now: float) -> None:
+        self.expirations += len(self.entries)
+        self.entries.clear()
+        self.year_boundary = next_year_boundary(now)
+
+    def get(self, key: Hashable) -> Optional[object]:
+        now = self.clock()
+        if now >= self.year_boundary:
+            self._roll_year(now)
+
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires_at = entry
+        if now >= expires_at:
+            del self.entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: object) -> None:
+        now = self.clock()
+        if now >= self.year_boundary:
+            self._roll_year(now)
+
+        self.entries[key] = (value, min(now + self.ttl_seconds, self.year_boundary))
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def discard(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove the entries whose key matches the predicate, returning how many were removed."""
+        keys = [key for key in self.entries if predicate(key)]
+        for key in keys:
+            del self.entries[key]
+        return len(keys)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": True,
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
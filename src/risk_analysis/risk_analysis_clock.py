@@ -0,0 +1,43 @@
+import datetime
+import time
+from typing import Callable
+
+
+def next_day_boundary(timestamp: float) -> float:
+    """Timestamp of the next local midnight."""
+    tomorrow = datetime.date.fromtimestamp(timestamp) + datetime.timedelta(days=1)
+    return datetime.datetime(tomorrow.year, tomorrow.month, tomorrow.day).timestamp()
+
+
+class DailyClock:
+    """Current date, computed once a day instead of on every request.
+
+    Reading it only costs a timestamp comparison, the date is refreshed at the first read after midnight.
+    """
+    __slots__ = ("_clock", "_today", "_expires_at")
+
+    def __init__(self, clock: Callable[[], float] = time.time) -> None:
+        self._clock = clock
+        self._today = None
+        self._expires_at = float("-inf")
+
+    def _refresh(self, now: float) -> None:
+        self._today = datetime.date.fromtimestamp(now)
+        self._expires_at = next_day_boundary(now)
+
+    def today(self) -> datetime.date:
+        now = self._clock()
+        if now >= self._expires_at:
+            self._refresh(now)
+        return self._today
+
+    def current_year(self) -> int:
+        now = self._clock()
+        if now >= self._expires_at:
+            self._refresh(now)
+        return self._today.year
+
+
+# Clock shared by every calculator of the process
+DAILY_CLOCK = DailyClock()
+current_year = DAILY_CLOCK.current_year
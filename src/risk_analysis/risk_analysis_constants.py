@@ -1,4 +1,52 @@
+import os
+
 MIN_INCOME = 0
 MIN_INCOME_THRESHOLD = 200000
 MIN_AGE_LIMIT = 30
 MAX_AGE_LIMIT = 60
+
+# Risk profile cache, disabled when the max size is 0
+CACHE_MAX_SIZE = int(os.getenv("RISK_ANALYSIS_CACHE_MAX_SIZE", "0"))
+CACHE_TTL_SECONDS = int(os.getenv("RISK_ANALYSIS_CACHE_TTL_SECONDS", "3600"))
+
+# Prometheus metrics at /metrics, disabled unless set to 1
+METRICS_ENABLED = os.getenv("RISK_ANALYSIS_METRICS_ENABLED", "0") == "1"
+
+# Write-behind persistence of the scoring decisions, disabled when the database path is empty
+STORE_DB_PATH = os.getenv("RISK_ANALYSIS_STORE_DB_PATH", "")
+STORE_MAX_PENDING = int(os.getenv("RISK_ANALYSIS_STORE_MAX_PENDING", "10000"))
+STORE_BATCH_SIZE = int(os.getenv("RISK_ANALYSIS_STORE_BATCH_SIZE", "1000"))
+STORE_FLUSH_INTERVAL = float(os.getenv("RISK_ANALYSIS_STORE_FLUSH_INTERVAL", "0.1"))
+
+# Micro-batching of concurrent POST /risk-analysis requests, disabled when the window is 0
+MICRO_BATCH_WINDOW_MS = float(os.getenv("RISK_ANALYSIS_MICRO_BATCH_WINDOW_MS", "0"))
+MICRO_BATCH_MAX_SIZE = int(os.getenv("RISK_ANALYSIS_MICRO_BATCH_MAX_SIZE", "256"))
+
+# Responses replayed to the retries carrying an Idempotency-Key header, shared by the forked workers in a table of
+# fixed size, disabled when the number of slots is 0
+IDEMPOTENCY_CACHE_SLOTS = int(os.getenv("RISK_ANALYSIS_IDEMPOTENCY_CACHE_SLOTS", "0"))
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("RISK_ANALYSIS_IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_VALUE_SIZE = 256
+
+# Longest accepted line of the NDJSON stream endpoint
+STREAM_MAX_LINE_BYTES = 64 * 1024
+
+# Per-client token bucket in front of /risk-analysis, disabled when the rate is 0
+RATE_LIMIT_PER_SECOND = float(os.getenv("RISK_ANALYSIS_RATE_LIMIT_PER_SECOND", "0"))
+RATE_LIMIT_BURST = float(os.getenv("RISK_ANALYSIS_RATE_LIMIT_BURST", "20"))
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RISK_ANALYSIS_RATE_LIMIT_MAX_CLIENTS", "1000000"))
+# Header holding the client address when behind a proxy, e.g. X-Forwarded-For, the peer address when empty
+RATE_LIMIT_KEY_HEADER = os.getenv("RISK_ANALYSIS_RATE_LIMIT_KEY_HEADER", "")
+
+# JSON rule set file loaded at startup and reloaded when it changes, the built-in rule set when empty
+RULE_SET_PATH = os.getenv("RISK_ANALYSIS_RULE_SET_PATH", "")
+RULE_SET_RELOAD_INTERVAL = float(os.getenv("RISK_ANALYSIS_RULE_SET_RELOAD_INTERVAL", "1"))
+
+# Candidate JSON rule set scoring every request again off the request path, shadow scoring is disabled when empty
+SHADOW_RULE_SET_PATH = os.getenv("RISK_ANALYSIS_SHADOW_RULE_SET_PATH", "")
+SHADOW_MAX_PENDING = int(os.getenv("RISK_ANALYSIS_SHADOW_MAX_PENDING", "10000"))
+SHADOW_BATCH_SIZE = int(os.getenv("RISK_ANALYSIS_SHADOW_BATCH_SIZE", "64"))
+SHADOW_SAMPLE_SIZE = int(os.getenv("RISK_ANALYSIS_SHADOW_SAMPLE_SIZE", "10"))
+
+# OpenAPI document written by `poetry run build-openapi` and served instead of being generated, generated when empty
+OPENAPI_PATH = os.getenv("RISK_ANALYSIS_OPENAPI_PATH", "")
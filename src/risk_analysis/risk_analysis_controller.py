@@ -1,17 +1,287 @@
-from fastapi import APIRouter
+from typing import List, Union
+
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response
+from pydantic.error_wrappers import ErrorWrapper
+from pydantic.errors import BoolError
+from pydantic.validators import bool_validator
 
 from .schemas.personal_information_schema import PersonalInformationSchema
-from .risk_analysys_service import RiskAnalysisService
+from .risk_analysys_service import DEFAULT_LOOKUP_TABLE, RiskAnalysisService
+from .risk_lookup_table import RiskLookupTable
+from .risk_analysis_cache import RiskAnalysisCache
+from .risk_analysis_batcher import RiskAnalysisBatcher
+from .risk_analysis_idempotency import SharedResponseCache
+from .risk_analysis_stream import RequestStreamingResponse, stream_risk_analysis
+from .risk_analysis_fast_codec import decode_columns, decode_subject, decode_subjects, encode_risk_profile, \
+    encode_risk_profiles, encode_what_if, encode_explanation
+from .risk_analysis_msgpack import MSGPACK_MEDIA_TYPE, decode_subject as decode_msgpack_subject, \
+    encode_risk_profile as encode_msgpack_risk_profile, stream_msgpack_risk_analysis
+from .risk_analysis_metrics import RiskAnalysisMetrics, instrumented_route_class
+from .risk_analysis_store import RiskAnalysisStore
+from .risk_analysis_shadow import ShadowScorer
+from .risk_file_scoring import SUBJECT_COLUMNS
+from .risk_portfolio_analytics import GROUP_BY_FIELDS, PortfolioAnalytics, analyze_columns
+from .risk_rule_set_reload import RuleSetReloader, load_lookup_table
+from .risk_analysis_constants import CACHE_MAX_SIZE, CACHE_TTL_SECONDS, METRICS_ENABLED, STORE_DB_PATH, \
+    STORE_MAX_PENDING, STORE_BATCH_SIZE, STORE_FLUSH_INTERVAL, RULE_SET_PATH, RULE_SET_RELOAD_INTERVAL, \
+    MICRO_BATCH_WINDOW_MS, MICRO_BATCH_MAX_SIZE, IDEMPOTENCY_CACHE_SLOTS, IDEMPOTENCY_TTL_SECONDS, \
+    IDEMPOTENCY_VALUE_SIZE, SHADOW_RULE_SET_PATH, SHADOW_MAX_PENDING, SHADOW_BATCH_SIZE, SHADOW_SAMPLE_SIZE
 from .schemas.risk_score import RiskProfile
+from .schemas.cache_stats_schema import CacheStatsSchema
+from .schemas.store_stats_schema import StoreStatsSchema
+from .schemas.batcher_stats_schema import BatcherStatsSchema
+from .schemas.idempotency_stats_schema import IdempotencyStatsSchema
+from .schemas.shadow_stats_schema import ShadowStatsSchema
+from .schemas.what_if_schema import WhatIfSchema
+from .schemas.explanation_schema import ExplanationSchema
+from .schemas.portfolio_analytics_schema import GroupByEnum, PortfolioAnalyticsSchema
+
+risk_analysis_metrics = RiskAnalysisMetrics(enabled=METRICS_ENABLED)
+
+# Version of the rule set that scored the response, pinned by the request when it starts
+RULE_SET_VERSION_HEADER = "X-Rule-Set-Version"
 
 router = APIRouter(
+    route_class=instrumented_route_class(risk_analysis_metrics),
     prefix="/risk-analysis",
     tags=["Risk Analysis"],
     responses={404: {"description": "Not found"}},
 )
 
 
-@router.post("", response_model=RiskProfile)
-async def run_risk_analysis(subject: PersonalInformationSchema):
-    return RiskAnalysisService().run_risk_analysis(subject)
+# Started and closed with the app, see main.py
+risk_analysis_store = RiskAnalysisStore(
+    STORE_DB_PATH, STORE_MAX_PENDING, STORE_BATCH_SIZE, STORE_FLUSH_INTERVAL,
+) if STORE_DB_PATH else None
+
+# Started and closed with the app, see main.py
+risk_analysis_shadow = ShadowScorer(
+    load_lookup_table(SHADOW_RULE_SET_PATH), SHADOW_MAX_PENDING, SHADOW_BATCH_SIZE, SHADOW_SAMPLE_SIZE,
+) if SHADOW_RULE_SET_PATH else None
+
+# The service is shared by every request so the cache outlives them
+risk_analysis_service = RiskAnalysisService(
+    lookup_table=load_lookup_table(RULE_SET_PATH) if RULE_SET_PATH else DEFAULT_LOOKUP_TABLE,
+    cache=RiskAnalysisCache(CACHE_MAX_SIZE, CACHE_TTL_SECONDS) if CACHE_MAX_SIZE > 0 else None,
+    metrics=risk_analysis_metrics if METRICS_ENABLED else None,
+    store=risk_analysis_store,
+    shadow=risk_analysis_shadow,
+)
+
+
+# Started and closed with the app, see main.py
+rule_set_reloader = RuleSetReloader(
+    risk_analysis_service, RULE_SET_PATH, RULE_SET_RELOAD_INTERVAL,
+) if RULE_SET_PATH else None
+
+
+# Served by the IdempotencyMiddleware of the app, see main.py, built before the workers are forked
+idempotency_cache = SharedResponseCache(
+    IDEMPOTENCY_CACHE_SLOTS, IDEMPOTENCY_VALUE_SIZE, IDEMPOTENCY_TTL_SECONDS,
+) if IDEMPOTENCY_CACHE_SLOTS > 0 else None
+
+# Routes whose retries are answered from the idempotency cache
+IDEMPOTENT_PATHS = ("/risk-analysis", "/risk-analysis/fast", "/risk-analysis/msgpack")
+
+# Coalesces the single-subject requests of the shared service
+risk_analysis_batcher = RiskAnalysisBatcher(
+    risk_analysis_service, MICRO_BATCH_WINDOW_MS / 1e3, MICRO_BATCH_MAX_SIZE,
+) if MICRO_BATCH_WINDOW_MS > 0 else None
+
+
+def get_risk_analysis_service() -> RiskAnalysisService:
+    return risk_analysis_service
+
+
+async def score_subject(service: RiskAnalysisService, subject: PersonalInformationSchema,
+                        lookup_table: RiskLookupTable) -> RiskProfile:
+    """Score one subject, in a micro-batch of the concurrent requests when batching is enabled for the service"""
+    batcher = risk_analysis_batcher
+    if batcher is None or batcher.service is not service:
+        return service.run_risk_analysis(subject, lookup_table)
+    return await batcher.run_risk_analysis(subject, lookup_table)
+
+
+# Declared in the schema only: a query parameter of the route would be parsed on every request, explained or not
+EXPLAIN_PARAMETER = {
+    "name": "explain",
+    "in": "query",
+    "required": False,
+    "description": "Return the rules behind every line score along with the risk profile",
+    "schema": {"title": "Explain", "type": "boolean", "default": False},
+}
+
+
+def explain_requested(request: Request) -> bool:
+    """Value of the explain query parameter, validated like a boolean parameter of FastAPI"""
+    value = request.query_params.get("explain")
+    if value is None:
+        return False
+    try:
+        return bool_validator(value)
+    except BoolError as error:
+        raise RequestValidationError([ErrorWrapper(error, loc=("query", "explain"))])
+
+
+@router.post(
+    "",
+    response_model=RiskProfile,
+    responses={200: {"model": Union[RiskProfile, ExplanationSchema]}},
+    openapi_extra={"parameters": [EXPLAIN_PARAMETER]},
+)
+async def run_risk_analysis(subject: PersonalInformationSchema, request: Request, response: Response,
+                            service: RiskAnalysisService = Depends(get_risk_analysis_service)):
+    lookup_table = service.lookup_table
+    if request.scope["query_string"] and explain_requested(request):
+        return Response(encode_explanation(service.run_explained_risk_analysis(subject, lookup_table)),
+                        media_type="application/json", headers={RULE_SET_VERSION_HEADER: lookup_table.version})
+    response.headers[RULE_SET_VERSION_HEADER] = lookup_table.version
+    return await score_subject(service, subject, lookup_table)
+
+
+@router.post(
+    "/fast",
+    response_model=RiskProfile,
+    openapi_extra={"requestBody": {
+        "content": {"application/json": {"schema": {"$ref": "#/components/schemas/PersonalInformationSchema"}}},
+        "required": True,
+    }},
+)
+async def run_fast_risk_analysis(request: Request, service: RiskAnalysisService = Depends(get_risk_analysis_service)):
+    """Same contract as POST /risk-analysis, decoding the body with orjson and encoding the profile straight to bytes"""
+    subject = decode_subject(await request.body(), request.headers.get("content-type"))
+    lookup_table = service.lookup_table
+    return Response(encode_risk_profile(await score_subject(service, subject, lookup_table)),
+                    media_type="application/json", headers={RULE_SET_VERSION_HEADER: lookup_table.version})
+
+
+@router.post(
+    "/msgpack",
+    response_model=RiskProfile,
+    responses={200: {"content": {MSGPACK_MEDIA_TYPE: {}}}},
+    openapi_extra={"requestBody": {
+        "content": {MSGPACK_MEDIA_TYPE: {"schema": {"$ref": "#/components/schemas/PersonalInformationSchema"}}},
+        "required": True,
+    }},
+)
+async def run_msgpack_risk_analysis(request: Request,
+                                    service: RiskAnalysisService = Depends(get_risk_analysis_service)):
+    """Same contract as POST /risk-analysis with msgpack request and response bodies, the errors stay JSON"""
+    subject = decode_msgpack_subject(await request.body())
+    lookup_table = service.lookup_table
+    return Response(encode_msgpack_risk_profile(await score_subject(service, subject, lookup_table)),
+                    media_type=MSGPACK_MEDIA_TYPE, headers={RULE_SET_VERSION_HEADER: lookup_table.version})
+
+
+@router.post("/msgpack/stream", response_class=RequestStreamingResponse)
+async def run_msgpack_stream_risk_analysis(request: Request,
+                                           service: RiskAnalysisService = Depends(get_risk_analysis_service)):
+    """Score a stream of concatenated msgpack subjects, returning one msgpack map per subject as they arrive"""
+    lookup_table = service.lookup_table
+    return RequestStreamingResponse(
+        stream_msgpack_risk_analysis(request.stream(), service, lookup_table),
+        media_type=MSGPACK_MEDIA_TYPE, headers={RULE_SET_VERSION_HEADER: lookup_table.version},
+    )
+
+
+@router.post(
+    "/batch",
+    response_model=List[RiskProfile],
+    openapi_extra={"requestBody": {
+        "content": {"application/json": {"schema": {
+            "type": "array", "items": {"$ref": "#/components/schemas/PersonalInformationSchema"},
+        }}},
+        "required": True,
+    }},
+)
+async def run_batch_risk_analysis(request: Request, service: RiskAnalysisService = Depends(get_risk_analysis_service)):
+    """Score a JSON array of subjects, decoding plain valid subjects with orjson and the others with the schema"""
+    subjects = decode_subjects(await request.body(), request.headers.get("content-type"))
+    lookup_table = service.lookup_table
+    return Response(encode_risk_profiles(service.run_batch_risk_analysis(subjects, lookup_table)),
+                    media_type="application/json", headers={RULE_SET_VERSION_HEADER: lookup_table.version})
+
+
+@router.post(
+    "/what-if",
+    response_model=WhatIfSchema,
+    openapi_extra={"requestBody": {
+        "content": {"application/json": {"schema": {"$ref": "#/components/schemas/PersonalInformationSchema"}}},
+        "required": True,
+    }},
+)
+async def run_what_if_analysis(request: Request, service: RiskAnalysisService = Depends(get_risk_analysis_service)):
+    """Score the subject and every change of a single field that would alter the rules applied to it"""
+    subject = decode_subject(await request.body(), request.headers.get("content-type"))
+    lookup_table = service.lookup_table
+    return Response(encode_what_if(service.run_what_if_analysis(subject, lookup_table)),
+                    media_type="application/json", headers={RULE_SET_VERSION_HEADER: lookup_table.version})
+
+
+@router.post(
+    "/portfolio",
+    response_model=PortfolioAnalyticsSchema,
+    response_model_exclude_none=True,
+    openapi_extra={"requestBody": {
+        "content": {"application/json": {"schema": {
+            "type": "object",
+            "properties": {name: {"type": "array", "items": {}} for name in SUBJECT_COLUMNS},
+            "required": list(SUBJECT_COLUMNS),
+        }}},
+        "required": True,
+    }},
+)
+async def run_portfolio_analytics(request: Request, response: Response,
+                                  group_by: List[GroupByEnum] = Query(list(GROUP_BY_FIELDS)),
+                                  service: RiskAnalysisService = Depends(get_risk_analysis_service)):
+    """Count the risk scores of a columnar dataset of subjects per insurance line, in total and per group"""
+    columns = decode_columns(await request.body(), request.headers.get("content-type"), SUBJECT_COLUMNS)
+    lookup_table = service.lookup_table
+    response.headers[RULE_SET_VERSION_HEADER] = lookup_table.version
+    analytics = PortfolioAnalytics(lookup_table)
+    analyze_columns(analytics, columns)
+    return analytics.histograms([field.value for field in group_by])
+
+
+@router.post("/stream", response_class=RequestStreamingResponse)
+async def run_stream_risk_analysis(request: Request,
+                                   service: RiskAnalysisService = Depends(get_risk_analysis_service)):
+    """Score newline-delimited JSON subjects, returning one risk profile or error line per input line"""
+    lookup_table = service.lookup_table
+    return RequestStreamingResponse(
+        stream_risk_analysis(request.stream(), service, lookup_table),
+        headers={RULE_SET_VERSION_HEADER: lookup_table.version},
+    )
+
+
+@router.get("/cache", response_model=CacheStatsSchema)
+async def get_cache_stats(service: RiskAnalysisService = Depends(get_risk_analysis_service)):
+    return service.cache_stats()
+
+
+@router.get("/store", response_model=StoreStatsSchema)
+async def get_store_stats(service: RiskAnalysisService = Depends(get_risk_analysis_service)):
+    return service.store_stats()
+
+
+@router.get("/shadow", response_model=ShadowStatsSchema)
+async def get_shadow_stats(service: RiskAnalysisService = Depends(get_risk_analysis_service)):
+    """Divergences of the candidate rule set from the active one, per insurance line, with sampled subjects"""
+    return service.shadow_stats()
+
+
+@router.get("/idempotency", response_model=IdempotencyStatsSchema)
+async def get_idempotency_stats():
+    """Counters of the worker answering the request, the table itself is shared"""
+    if idempotency_cache is None:
+        return {"enabled": False}
+    return idempotency_cache.stats()
+
 
+@router.get("/batcher", response_model=BatcherStatsSchema)
+async def get_batcher_stats():
+    if risk_analysis_batcher is None:
+        return {"enabled": False}
+    return risk_analysis_batcher.stats()
@@ -0,0 +1,66 @@
+from typing import Dict, List, Optional, Tuple
+
+from .schemas.personal_information_schema import PersonalInformationSchema
+from .schemas.risk_score import INSURANCE_LINES
+from .risk_lookup_table import RiskLookupTable, RISK_ANSWERS_EDGES
+
+# Contribution of a rule to a line: its risk points and whether it makes the subject ineligible to the line
+Contribution = Tuple[int, bool]
+
+
+class RiskExplainer:
+    """Explains a risk profile by the rules that produced it, line by line.
+
+    Every subject of a lookup table cell fires the same rules, which the table already records, so an explanation
+    is built once per cell into a list allocated with the table size, the first time one of its subjects asks
+    for it. Scoring itself is left untouched: the explanation only reads the cell of the subject.
+    """
+    lookup_table: RiskLookupTable
+
+    def __init__(self, lookup_table: RiskLookupTable) -> None:
+        self.lookup_table = lookup_table
+        self.contributions: Dict[str, Dict[str, Contribution]] = {
+            rule.name: {
+                line: (rule.deltas.get(line, 0), line in rule.ineligible)
+                for line in INSURANCE_LINES
+                if rule.deltas.get(line, 0) or line in rule.ineligible
+            }
+            for rule in lookup_table.rule_engine.rule_set.rules
+        }
+        self.explanations: List[Optional[dict]] = [None] * len(lookup_table)
+
+    def _explain_cell(self, index: int) -> dict:
+        # The risk answers are the last dimension, one bucket per number of positive answers
+        base_score = ([0] + RISK_ANSWERS_EDGES)[index % self.lookup_table.shape[-1]]
+        fired_rules = self.lookup_table.fired_rules[index]
+        risk_profile = self.lookup_table.table[index]
+        lines = {}
+        for line in INSURANCE_LINES:
+            rules = []
+            score = base_score
+            for name in fired_rules:
+                contribution = self.contributions[name].get(line)
+                if contribution is not None:
+                    delta, ineligible = contribution
+                    score += delta
+                    rules.append({"name": name, "delta": delta, "ineligible": ineligible})
+            lines[line] = {
+                "base_score": base_score,
+                "rules": rules,
+                "score": score,
+                "risk_score": risk_profile[line],
+            }
+        return {
+            "risk_profile": {line: risk_profile[line] for line in INSURANCE_LINES},
+            "version": self.lookup_table.version,
+            "fired_rules": list(fired_rules),
+            "lines": lines,
+        }
+
+    def explain(self, subject: PersonalInformationSchema) -> dict:
+        """Explanation of the profile of the subject, shared by every subject of its cell and not to be modified"""
+        index = self.lookup_table.calculate_subject_index(subject)
+        explanation = self.explanations[index]
+        if explanation is None:
+            explanation = self.explanations[index] = self._explain_cell(index)
+        return explanation
@@ -0,0 +1,198 @@
+import email.message
+import json
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Sequence, Union
+
+import orjson
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+from pydantic.error_wrappers import ErrorWrapper
+from pydantic.errors import DictError, ListError, MissingError
+
+from .schemas.personal_information_schema import PersonalInformationSchema, VehicleSchema, MaritalStatusEnum, \
+    OwnershipStatusEnum
+from .schemas.risk_score import INSURANCE_LINES
+
+# Bounds of the Field definitions of the schemas, so that both paths accept the same subjects
+VEHICLE_YEAR_MIN = VehicleSchema.__fields__["year"].field_info.ge
+VEHICLE_YEAR_MAX = VehicleSchema.__fields__["year"].field_info.lt
+RISK_QUESTIONS_SIZE = PersonalInformationSchema.__fields__["risk_questions"].field_info.min_items
+_MARITAL_STATUSES = {status.value for status in MaritalStatusEnum}
+_OWNERSHIP_STATUSES = {status.value for status in OwnershipStatusEnum}
+
+
+class HouseStruct(NamedTuple):
+    ownership_status: str
+
+
+class VehicleStruct(NamedTuple):
+    year: int
+
+
+class SubjectStruct(NamedTuple):
+    """Compact subject with the attributes of PersonalInformationSchema, built without pydantic."""
+    age: int
+    dependents: int
+    house: Optional[HouseStruct]
+    income: int
+    marital_status: str
+    risk_questions: list
+    vehicle: Optional[VehicleStruct]
+
+
+def subject_from_json(value: Any) -> Optional[SubjectStruct]:
+    """Return the subject of a decoded JSON object holding plain valid values, None when it needs validation.
+
+    The accepted values are a subset of what PersonalInformationSchema accepts, without coercion: any other
+    value, valid or not, is left to the schema.
+    """
+    if type(value) is not dict:
+        return None
+    age, dependents, income = value.get("age"), value.get("dependents"), value.get("income")
+    marital_status, risk_questions = value.get("marital_status"), value.get("risk_questions")
+    house, vehicle = value.get("house"), value.get("vehicle")
+    if not (type(age) is int and type(dependents) is int and type(income) is int):
+        return None
+    if age < 0 or dependents < 0 or income < 0 or marital_status not in _MARITAL_STATUSES:
+        return None
+    if type(risk_questions) is not list or len(risk_questions) != RISK_QUESTIONS_SIZE:
+        return None
+    if not all(type(answer) in (bool, int) and answer in (0, 1) for answer in risk_questions):
+        return None
+    if house is not None:
+        if type(house) is not dict or house.get("ownership_status") not in _OWNERSHIP_STATUSES:
+            return None
+        house = HouseStruct(house["ownership_status"])
+    if vehicle is not None:
+        year = vehicle.get("year") if type(vehicle) is dict else None
+        if type(year) is not int or not VEHICLE_YEAR_MIN <= year < VEHICLE_YEAR_MAX:
+            return None
+        vehicle = VehicleStruct(year)
+    return SubjectStruct(age, dependents, house, income, marital_status, risk_questions, vehicle)
+
+
+def _is_json_content_type(content_type: Optional[str]) -> bool:
+    if not content_type:
+        return True
+    message = email.message.Message()
+    message["content-type"] = content_type
+    subtype = message.get_content_subtype()
+    return message.get_content_maintype() == "application" and (subtype == "json" or subtype.endswith("+json"))
+
+
+def _decode_body(body: bytes, content_type: Optional[str]) -> Any:
+    """Decode a JSON request body with orjson, failing exactly as the body parameters of FastAPI."""
+    if not body:
+        raise RequestValidationError([ErrorWrapper(MissingError(), loc=("body",))], body=None)
+
+    value: Any = body
+    if _is_json_content_type(content_type):
+        try:
+            value = orjson.loads(body)
+        except orjson.JSONDecodeError:
+            # The standard library accepts a few documents orjson rejects and reports the errors of the API
+            try:
+                value = json.loads(body)
+            except json.JSONDecodeError as error:
+                raise RequestValidationError([ErrorWrapper(error, ("body", error.pos))], body=error.doc)
+            except Exception:
+                raise HTTPException(status_code=400, detail="There was an error parsing the body")
+        if value is None:
+            raise RequestValidationError([ErrorWrapper(MissingError(), loc=("body",))], body=None)
+    return value
+
+
+def decode_subject(body: bytes, content_type: Optional[str] = None) -> Union[SubjectStruct, PersonalInformationSchema]:
+    """Decode a request body into a subject, failing exactly as a PersonalInformationSchema body parameter.
+
+    Plain valid bodies are decoded by orjson into a SubjectStruct. Anything else goes through the decoding
+    and validation steps of FastAPI, raising the same RequestValidationError or HTTPException.
+    """
+    value = _decode_body(body, content_type)
+    subject = subject_from_json(value)
+    if subject is not None:
+        return subject
+    try:
+        return PersonalInformationSchema.validate(value)
+    except (TypeError, ValueError, AssertionError) as error:
+        raise RequestValidationError([ErrorWrapper(error, loc=("body",))], body=value)
+
+
+def decode_subjects(body: bytes,
+                    content_type: Optional[str] = None) -> List[Union[SubjectStruct, PersonalInformationSchema]]:
+    """Decode a request body into a list of subjects, failing exactly as a List[PersonalInformationSchema] body.
+
+    Only the items that are not plain valid subjects are validated by the schema, and the errors of every
+    invalid item are reported together.
+    """
+    value = _decode_body(body, content_type)
+    if type(value) is not list:
+        raise RequestValidationError([ErrorWrapper(ListError(), loc=("body",))], body=value)
+
+    subjects = []
+    errors = []
+    for index, item in enumerate(value):
+        subject = subject_from_json(item)
+        if subject is None:
+            try:
+                subject = PersonalInformationSchema.validate(item)
+            except (TypeError, ValueError, AssertionError) as error:
+                errors.append(ErrorWrapper(error, loc=("body", index)))
+                continue
+        subjects.append(subject)
+    if errors:
+        raise RequestValidationError(errors, body=value)
+    return subjects
+
+
+def decode_columns(body: bytes, content_type: Optional[str], names: Sequence[str]) -> Dict[str, list]:
+    """Decode a columnar JSON request body, an object of arrays of the same length, one per column name.
+
+    The values themselves are left to the caller, the shape of the body fails as a body parameter of FastAPI.
+    """
+    value = _decode_body(body, content_type)
+    if type(value) is not dict:
+        raise RequestValidationError([ErrorWrapper(DictError(), loc=("body",))], body=value)
+
+    errors = []
+    for name in names:
+        if name not in value:
+            errors.append(ErrorWrapper(MissingError(), loc=("body", name)))
+        elif type(value[name]) is not list:
+            errors.append(ErrorWrapper(ListError(), loc=("body", name)))
+    if not errors:
+        size = len(value[names[0]])
+        errors = [ErrorWrapper(ValueError(f"columns must have the same length, {names[0]} has {size} values"),
+                               loc=("body", name)) for name in names if len(value[name]) != size]
+    if errors:
+        raise RequestValidationError(errors, body=value)
+    return {name: value[name] for name in names}
+
+
+def encode_risk_profile(risk_profile: Mapping) -> bytes:
+    """Encode a risk profile as the JSON body of a RiskProfile response."""
+    return orjson.dumps({line: risk_profile[line] for line in INSURANCE_LINES})
+
+
+def encode_risk_profiles(risk_profiles: Sequence[Mapping]) -> bytes:
+    """Encode risk profiles as the JSON body of a List[RiskProfile] response.
+
+    Profiles read from a lookup table are shared by every subject of their cell, so each one is encoded once.
+    """
+    encoded: Dict[int, bytes] = {}
+    parts = []
+    for risk_profile in risk_profiles:
+        part = encoded.get(id(risk_profile))
+        if part is None:
+            part = encoded[id(risk_profile)] = encode_risk_profile(risk_profile)
+        parts.append(part)
+    return b"[" + b",".join(parts) + b"]"
+
+
+def encode_what_if(analysis: Mapping) -> bytes:
+    """Encode a what-if analysis as the JSON body of a WhatIfSchema response."""
+    return orjson.dumps(analysis)
+
+
+def encode_explanation(explanation: Mapping) -> bytes:
+    """Encode an explained risk profile as the JSON body of an ExplanationSchema response."""
+    return orjson.dumps(explanation)
@@ -0,0 +1,259 @@
+import hashlib
+import struct
+import time
+from typing import Callable, Collection, List, Optional, Tuple
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+IDEMPOTENCY_KEY_HEADER = b"idempotency-key"
+REPLAYED_HEADER = b"idempotent-replayed"
+
+# Slot: state, digest of the key, digest of the request body, expiry timestamp, value length, then the value
+_SLOT_HEADER = struct.Struct("<B16s16sdH")
+_EMPTY, _USED = 0, 1
+# Slots probed from the home slot of a key before the entry expiring first is replaced
+MAX_PROBES = 16
+# A worker killed while holding a stripe lock must not block the others: past this wait the cache is skipped
+LOCK_TIMEOUT = 0.05
+
+
+class IdempotencyKeyReusedError(ValueError):
+    """The idempotency key was already used with another request body"""
+
+
+def key_digest(*parts: bytes) -> bytes:
+    return hashlib.blake2b(b"\0".join(parts), digest_size=16).digest()
+
+
+class SharedResponseCache:
+    """Fixed-size hash table of response bytes in shared memory, with a per-entry TTL.
+
+    The table is split in stripes, each guarded by its own lock: a key belongs to the stripe picked by its digest
+    and is probed linearly from its home slot within the stripe, over at most MAX_PROBES slots. Slots are never
+    emptied, an expired entry is reused by the next insertion on its probe path, so the probe chains stay unbroken
+    without tombstones. When the probed slots all hold live entries, the one expiring first is replaced.
+
+    The segment is unlinked as soon as it is mapped: the workers forked after the cache is built inherit the
+    mapping and the locks, and nothing is left behind however the processes exit. Counters are per process.
+    """
+    slots: int
+    value_size: int
+    ttl_seconds: float
+
+    def __init__(self, slots: int, value_size: int, ttl_seconds: float, stripes: int = 64,
+                 clock: Callable[[], float] = time.time) -> None:
+        # Imported here, so that importing the module does not import multiprocessing when the cache is disabled
+        from multiprocessing import get_context, shared_memory
+        if slots < stripes or stripes <= 0:
+            raise ValueError("slots must be at least the number of stripes")
+        if not 0 < value_size <= 0xFFFF:
+            raise ValueError("value_size must be between 1 and 65535")
+        self.stripes = stripes
+        self.stripe_slots = slots // stripes
+        self.slots = self.stripe_slots * stripes
+        self.max_probes = min(MAX_PROBES, self.stripe_slots)
+        self.value_size = value_size
+        self.slot_size = _SLOT_HEADER.size + value_size
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.memory = shared_memory.SharedMemory(create=True, size=self.slots * self.slot_size)
+        self.memory.unlink()
+        self.buffer = self.memory.buf
+        # Semaphores inherited by the forked workers
+        self.locks = [get_context("fork").Lock() for _ in range(stripes)]
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.replaced = 0
+        self.mismatches = 0
+        self.too_large = 0
+        self.lock_timeouts = 0
+
+    def _home(self, key: bytes) -> Tuple[int, int, int]:
+        """Stripe of the key, offset of the first slot of the stripe and index of the home slot of the key in it"""
+        value = int.from_bytes(key[:8], "little")
+        stripe = value % self.stripes
+        return stripe, stripe * self.stripe_slots * self.slot_size, (value // self.stripes) % self.stripe_slots
+
+    def get(self, key: bytes, fingerprint: bytes) -> Optional[bytes]:
+        """Value stored for the key, None when missing or expired.
+
+        Raises IdempotencyKeyReusedError when the key was stored for a request with another fingerprint.
+        """
+        stripe, first, home = self._home(key)
+        lock = self.locks[stripe]
+        if not lock.acquire(timeout=LOCK_TIMEOUT):
+            self.lock_timeouts += 1
+            return None
+        try:
+            now = self.clock()
+            for probe in range(home, home + self.max_probes):
+                offset = first + probe % self.stripe_slots * self.slot_size
+                state, slot_key, slot_fingerprint, expires_at, length = _SLOT_HEADER.unpack_from(self.buffer, offset)
+                if state == _EMPTY:
+                    break
+                if slot_key == key and expires_at > now:
+                    if slot_fingerprint != fingerprint:
+                        self.mismatches += 1
+                        raise IdempotencyKeyReusedError("the idempotency key was used with another request body")
+                    self.hits += 1
+                    start = offset + _SLOT_HEADER.size
+                    return bytes(self.buffer[start:start + length])
+        finally:
+            lock.release()
+        self.misses += 1
+        return None
+
+    def put(self, key: bytes, fingerprint: bytes, value: bytes) -> bool:
+        """Store the value of the key for ttl_seconds, False when it is too large or the stripe is locked"""
+        if len(value) > self.value_size:
+            self.too_large += 1
+            return False
+        stripe, first, home = self._home(key)
+        lock = self.locks[stripe]
+        if not lock.acquire(timeout=LOCK_TIMEOUT):
+            self.lock_timeouts += 1
+            return False
+        try:
+            now = self.clock()
+            target = None
+            # Live entry expiring first among the probed slots, replaced when none of them is free
+            victim, victim_expiry = None, None
+            for probe in range(home, home + self.max_probes):
+                offset = first + probe % self.stripe_slots * self.slot_size
+                state, slot_key, _, expires_at, _ = _SLOT_HEADER.unpack_from(self.buffer, offset)
+                if state == _EMPTY or slot_key == key or expires_at <= now:
+                    target = offset
+                    break
+                if victim_expiry is None or expires_at < victim_expiry:
+                    victim, victim_expiry = offset, expires_at
+            if target is None:
+                target = victim
+                self.replaced += 1
+            _SLOT_HEADER.pack_into(self.buffer, target, _USED, key, fingerprint, now + self.ttl_seconds, len(value))
+            start = target + _SLOT_HEADER.size
+            self.buffer[start:start + len(value)] = value
+        finally:
+            lock.release()
+        self.stores += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "enabled": True,
+            "slots": self.slots,
+            "value_size": self.value_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "replaced": self.replaced,
+            "mismatches": self.mismatches,
+            "too_large": self.too_large,
+            "lock_timeouts": self.lock_timeouts,
+        }
+
+
+def encode_response(headers: List[Tuple[bytes, bytes]], body: bytes) -> bytes:
+    """Stored form of a response: its headers, each a length-prefixed name and value, then its body"""
+    parts = [struct.pack("<B", len(headers))]
+    for name, value in headers:
+        parts.append(struct.pack("<BB", len(name), len(value)) + name + value)
+    parts.append(body)
+    return b"".join(parts)
+
+
+def decode_response(value: bytes) -> Tuple[List[Tuple[bytes, bytes]], bytes]:
+    headers = []
+    offset = 1
+    for _ in range(value[0]):
+        name_length, value_length = struct.unpack_from("<BB", value, offset)
+        offset += 2
+        headers.append((value[offset:offset + name_length],
+                        value[offset + name_length:offset + name_length + value_length]))
+        offset += name_length + value_length
+    return headers, value[offset:]
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware answering the retries of a request from a SharedResponseCache.
+
+    A POST to one of paths with an Idempotency-Key header is looked up by its path, query string and key before
+    the app parses it. A hit is answered with the stored response, with an Idempotent-Replayed header, without
+    calling the app; a key seen with another body is answered 422. A miss is served by the app and its response
+    stored when it is a 200. Only the content type and the headers listed in stored_headers are kept.
+    """
+
+    def __init__(self, app: ASGIApp, cache: SharedResponseCache, paths: Collection[str],
+                 stored_headers: Collection[str] = ()) -> None:
+        self.app = app
+        self.cache = cache
+        self.paths = frozenset(paths)
+        self.stored_headers = frozenset([b"content-type", *(name.lower().encode("latin-1")
+                                                            for name in stored_headers)])
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        idempotency_key = None
+        for name, value in scope["headers"]:
+            if name == IDEMPOTENCY_KEY_HEADER:
+                idempotency_key = value
+                break
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+        key = key_digest(scope["path"].encode("latin-1"), scope["query_string"], idempotency_key)
+        fingerprint = key_digest(body)
+
+        try:
+            value = self.cache.get(key, fingerprint)
+        except IdempotencyKeyReusedError as error:
+            await JSONResponse({"detail": str(error)}, status_code=422)(scope, receive, send)
+            return
+        if value is not None:
+            headers, response_body = decode_response(value)
+            headers.append((b"content-length", str(len(response_body)).encode()))
+            headers.append((REPLAYED_HEADER, b"true"))
+            await send({"type": "http.response.start", "status": 200, "headers": headers})
+            await send({"type": "http.response.body", "body": response_body})
+            return
+
+        replayed = False
+
+        async def receive_body() -> Message:
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        stored_headers = None
+        response_chunks = []
+
+        async def send_and_store(message: Message) -> None:
+            nonlocal stored_headers
+            if message["type"] == "http.response.start":
+                if message["status"] == 200:
+                    # Lengths are stored on a byte
+                    stored_headers = [(name, value) for name, value in message.get("headers", [])
+                                      if name.lower() in self.stored_headers and len(name) < 256 and len(value) < 256]
+            elif message["type"] == "http.response.body" and stored_headers is not None:
+                response_chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    self.cache.put(key, fingerprint, encode_response(stored_headers, b"".join(response_chunks)))
+            await send(message)
+
+        await self.app(scope, receive_body, send_and_store)
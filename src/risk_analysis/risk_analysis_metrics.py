@@ -0,0 +1,206 @@
+import asyncio
+import contextvars
+import functools
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+import numpy as np
+from fastapi import Request
+from fastapi.routing import APIRoute
+
+from .risk_lookup_table import RiskLookupTable
+
+# Upper bounds in seconds of the latency histograms, from the microseconds of a table lookup to slow requests
+LATENCY_BUCKETS = (
+    1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25,
+    0.5, 1.0,
+)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    labels = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+class Counter:
+    """Monotonic counter with labels, rendered in the Prometheus text format."""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.values: Dict[Tuple[str, ...], int] = {}
+
+    def inc(self, amount: int = 1, *labels: str) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines.extend(
+            f"{self.name}{_format_labels(self.label_names, labels)} {value}"
+            for labels, value in sorted(self.values.items())
+        )
+        return lines
+
+
+class Histogram:
+    """Cumulative histogram with labels, rendered in the Prometheus text format.
+
+    An observation costs a bisection over the bucket bounds and two additions.
+    """
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # Per label values: the count of every bucket, the +Inf bucket last, then the sum of the observations
+        self.series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {total!r}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class RiskAnalysisMetrics:
+    """Request stage latencies and rule counters of the risk analysis API."""
+    enabled: bool
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.request_seconds = Histogram(
+            "risk_analysis_request_seconds", "Time to handle a request, from routing to the response.", ["route"],
+        )
+        self.stage_seconds = Histogram(
+            "risk_analysis_stage_seconds",
+            "Time spent in each stage of a request: parse, validate, score and serialize.",
+            ["route", "stage"],
+        )
+        self.subjects_scored = Counter("risk_analysis_subjects_scored_total", "Number of subjects scored.")
+        self.rule_fired = Counter(
+            "risk_analysis_rule_fired_total", "Number of scored subjects each rule applied to.", ["rule"],
+        )
+
+    def count_rules(self, rules: Iterable[str], count: int = 1) -> None:
+        self.subjects_scored.inc(count)
+        for rule in rules:
+            self.rule_fired.inc(count, rule)
+
+    def count_cells(self, lookup_table: RiskLookupTable, indexes: np.ndarray) -> None:
+        """Count the rules of a batch of subjects from their lookup table cells."""
+        counts = np.bincount(indexes, minlength=len(lookup_table))
+        for index in np.flatnonzero(counts).tolist():
+            self.count_rules(lookup_table.fired_rules[index], int(counts[index]))
+
+    def render(self) -> str:
+        if not self.enabled:
+            return ""
+        metrics = [self.request_seconds, self.stage_seconds, self.subjects_scored, self.rule_fired]
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+class _RequestTimings:
+    __slots__ = ("parsed_at", "parse_seconds", "endpoint_started_at", "endpoint_ended_at")
+
+    def __init__(self) -> None:
+        self.parsed_at = None
+        self.parse_seconds = None
+        self.endpoint_started_at = None
+        self.endpoint_ended_at = None
+
+
+_request_timings: contextvars.ContextVar = contextvars.ContextVar("risk_analysis_request_timings")
+
+
+class InstrumentedRequest(Request):
+    """Request timing the JSON parsing of its body, which FastAPI does before validating it."""
+
+    async def json(self):
+        if hasattr(self, "_json"):
+            return self._json
+        await self.body()
+        started = perf_counter()
+        value = await super().json()
+        timings = _request_timings.get(None)
+        if timings is not None:
+            timings.parsed_at = perf_counter()
+            timings.parse_seconds = timings.parsed_at - started
+        return value
+
+
+def instrumented_route_class(metrics: RiskAnalysisMetrics) -> Type[APIRoute]:
+    """Return the route class recording the stage latencies of every request into metrics.
+
+    The stages are split at the points FastAPI hands over: the JSON body parsing, the validation of the
+    parameters until the endpoint is called, the endpoint itself and the serialization of its result.
+    When metrics are disabled the plain APIRoute is returned, so requests pay nothing.
+    """
+    if not metrics.enabled:
+        return APIRoute
+
+    class InstrumentedRoute(APIRoute):
+
+        def get_route_handler(self) -> Callable:
+            endpoint = self.dependant.call
+            if asyncio.iscoroutinefunction(endpoint):
+                @functools.wraps(endpoint)
+                async def timed_endpoint(**values):
+                    timings = _request_timings.get()
+                    timings.endpoint_started_at = perf_counter()
+                    try:
+                        return await endpoint(**values)
+                    finally:
+                        timings.endpoint_ended_at = perf_counter()
+
+                self.dependant.call = timed_endpoint
+
+            handler = super().get_route_handler()
+            route = self.path
+
+            async def instrumented_handler(request: Request):
+                timings = _RequestTimings()
+                token = _request_timings.set(timings)
+                started = perf_counter()
+                try:
+                    return await handler(InstrumentedRequest(request.scope, request.receive))
+                finally:
+                    ended = perf_counter()
+                    _request_timings.reset(token)
+                    _observe_stages(metrics, route, timings, started, ended)
+
+            return instrumented_handler
+
+    return InstrumentedRoute
+
+
+def _observe_stages(metrics: RiskAnalysisMetrics, route: str, timings: _RequestTimings, started: float,
+                    ended: float) -> None:
+    observe = metrics.stage_seconds.observe
+    metrics.request_seconds.observe(ended - started, route)
+    if timings.parse_seconds is not None:
+        observe(timings.parse_seconds, route, "parse")
+    validated_at: Optional[float] = timings.endpoint_started_at
+    observe((validated_at or ended) - (timings.parsed_at or started), route, "validate")
+    if validated_at is not None and timings.endpoint_ended_at is not None:
+        observe(timings.endpoint_ended_at - validated_at, route, "score")
+        observe(ended - timings.endpoint_ended_at, route, "serialize")
@@ -0,0 +1,151 @@
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Mapping, Optional, Sequence, Union
+
+import msgpack
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+from pydantic.error_wrappers import ErrorWrapper
+from pydantic.errors import MissingError
+
+from .schemas.personal_information_schema import PersonalInformationSchema
+from .schemas.risk_score import INSURANCE_LINES
+from .risk_lookup_table import RiskLookupTable
+from .risk_analysys_service import RiskAnalysisService
+from .risk_analysis_store import StoreUnavailableError
+from .risk_analysis_fast_codec import SubjectStruct, subject_from_json
+from .risk_analysis_constants import STREAM_MAX_LINE_BYTES
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+ITEM_TOO_LONG_ERROR = {
+    "loc": ["body"],
+    "msg": f"item exceeds {STREAM_MAX_LINE_BYTES} bytes",
+    "type": "value_error.item_too_long",
+}
+INVALID_STREAM_ERROR = {"loc": ["body"], "msg": "invalid msgpack data", "type": "value_error.msgpack"}
+
+
+def _unpack_body(body: bytes) -> Any:
+    """Decode a msgpack request body, failing as the body parameters of FastAPI fail on JSON."""
+    if not body:
+        raise RequestValidationError([ErrorWrapper(MissingError(), loc=("body",))], body=None)
+    try:
+        value = msgpack.unpackb(body)
+    except (ValueError, msgpack.UnpackException):
+        raise HTTPException(status_code=400, detail="There was an error parsing the body")
+    if value is None:
+        raise RequestValidationError([ErrorWrapper(MissingError(), loc=("body",))], body=None)
+    return value
+
+
+def _validate_subject(value: Any) -> Union[SubjectStruct, PersonalInformationSchema]:
+    """Subject of a decoded map, from the plain valid values or the schema, raising the schema errors."""
+    subject = subject_from_json(value)
+    if subject is not None:
+        return subject
+    return PersonalInformationSchema.validate(value)
+
+
+def decode_subject(body: bytes) -> Union[SubjectStruct, PersonalInformationSchema]:
+    """Decode a msgpack map into a subject, with the 422 errors of a PersonalInformationSchema body parameter.
+
+    msgpack maps decode to the same Python values as JSON objects, so the fast and the schema paths of the JSON
+    codec apply unchanged.
+    """
+    value = _unpack_body(body)
+    try:
+        return _validate_subject(value)
+    except (TypeError, ValueError, AssertionError) as error:
+        raise RequestValidationError([ErrorWrapper(error, loc=("body",))], body=value)
+
+
+def encode_risk_profile(risk_profile: Mapping) -> bytes:
+    """Encode a risk profile as a msgpack map of the RiskProfile fields."""
+    return msgpack.packb({line: risk_profile[line] for line in INSURANCE_LINES})
+
+
+def _error_detail(error: Exception) -> List[dict]:
+    """Errors of an invalid item, in the format of the 422 response of POST /risk-analysis"""
+    return RequestValidationError([ErrorWrapper(error, loc=("body",))]).errors()
+
+
+def _score_items(items: Sequence[Any], first_index: int, service: RiskAnalysisService,
+                 lookup_table: RiskLookupTable) -> List[Dict[str, Any]]:
+    """Score the valid items together through the batch path, answering every item in order"""
+    results: List[Dict[str, Any]] = []
+    subjects = []
+    scored = []
+    for index, item in enumerate(items, first_index):
+        try:
+            subject = _validate_subject(item)
+        except (TypeError, ValueError, AssertionError) as error:
+            results.append({"index": index, "detail": _error_detail(error)})
+            continue
+        result = {"index": index}
+        results.append(result)
+        subjects.append(subject)
+        scored.append(result)
+    if subjects:
+        try:
+            risk_profiles = service.run_batch_risk_analysis(subjects, lookup_table)
+        except StoreUnavailableError as error:
+            detail = [{"loc": ["body"], "msg": str(error), "type": "service_unavailable.store"}]
+            for result in scored:
+                result["detail"] = detail
+        else:
+            for result, risk_profile in zip(scored, risk_profiles):
+                result["profile"] = {line: risk_profile[line] for line in INSURANCE_LINES}
+    return results
+
+
+async def stream_msgpack_risk_analysis(chunks: AsyncIterable[bytes], service: RiskAnalysisService,
+                                       lookup_table: Optional[RiskLookupTable] = None,
+                                       max_item_bytes: int = STREAM_MAX_LINE_BYTES) -> AsyncIterator[bytes]:
+    """Score a stream of concatenated msgpack subjects, emitting one msgpack map per subject.
+
+    The subjects decoded from each received chunk are scored together by the batch path and answered before the
+    next chunk is read, so memory stays bounded by the chunk size and max_item_bytes. Every answer carries the
+    index of its subject and either its profile or its validation errors, in the format of the 422 response of
+    POST /risk-analysis. Data that is not msgpack, a subject longer than max_item_bytes or a truncated last
+    subject ends the stream with an error, as the following subjects cannot be found. The whole stream is scored
+    with lookup_table, the rule set current when it starts by default.
+    """
+    if lookup_table is None:
+        lookup_table = service.lookup_table
+    # The buffer holds at most a partial subject of max_item_bytes and the slice fed after it
+    unpacker = msgpack.Unpacker(max_buffer_size=2 * max_item_bytes)
+    packer = msgpack.Packer()
+    count = 0
+    # Bytes received and bytes of the subjects decoded, the difference is the partial subject being received
+    received = 0
+    decoded = 0
+    async for chunk in chunks:
+        items = []
+        error = None
+        for start in range(0, len(chunk), max_item_bytes):
+            part = chunk[start:start + max_item_bytes]
+            received += len(part)
+            try:
+                unpacker.feed(part)
+                for item in unpacker:
+                    if unpacker.tell() - decoded > max_item_bytes:
+                        break
+                    items.append(item)
+                    decoded = unpacker.tell()
+            except (ValueError, msgpack.UnpackException):
+                error = INVALID_STREAM_ERROR
+                break
+            # The subject read last, whole or partial, is too long: at most two slices of it are buffered
+            if unpacker.tell() - decoded > max_item_bytes:
+                error = ITEM_TOO_LONG_ERROR
+                break
+        results = _score_items(items, count, service, lookup_table)
+        count += len(items)
+        if error is not None:
+            results.append({"index": count, "detail": [error]})
+        if results:
+            yield b"".join(packer.pack(result) for result in results)
+        if error is not None:
+            return
+
+    if decoded < received:
+        yield packer.pack({"index": count, "detail": [INVALID_STREAM_ERROR]})
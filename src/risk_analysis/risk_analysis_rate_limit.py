@@ -0,0 +1,118 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# Stale buckets evicted per new bucket, enough to keep up with any arrival rate of new keys
+EVICTIONS_PER_INSERT = 2
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets, refilled lazily when a key is checked.
+
+    A bucket holds up to `burst` tokens and gains `rate` tokens per second, computed from the time
+    elapsed since its last check, so no timer runs in the background. Buckets are spread over shards
+    kept in least recently checked order. A bucket idle long enough to be full again is the same as
+    no bucket, so every new bucket evicts the stale ones at the front of its shard, and a shard never
+    holds more than max_keys / shards buckets. The limiter takes no lock: under threads, a race can
+    only lose the update of one check.
+    """
+    rate: float
+    burst: float
+    max_keys: int
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 1_000_000, shards: int = 64,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be greater than 0 and burst at least 1")
+        if shards & (shards - 1):
+            raise ValueError("shards must be a power of 2")
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.idle_seconds = burst / rate
+        self.clock = clock
+        self.mask = shards - 1
+        self.shard_max_keys = max(1, max_keys // shards)
+        # Per shard: key -> [tokens, checked_at]
+        self.shards: List[OrderedDict] = [OrderedDict() for _ in range(shards)]
+        self.limited = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return sum(map(len, self.shards))
+
+    def acquire(self, key: str) -> float:
+        """Take a token from the bucket of key, returning 0 when allowed or the seconds to wait for one."""
+        now = self.clock()
+        shard = self.shards[hash(key) & self.mask]
+        bucket = shard.get(key)
+        if bucket is None:
+            self._evict(shard, now)
+            shard[key] = [self.burst - 1, now]
+            return 0.0
+
+        shard.move_to_end(key)
+        tokens = bucket[0] + (now - bucket[1]) * self.rate
+        if tokens > self.burst:
+            tokens = self.burst
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        self.limited += 1
+        return (1 - tokens) / self.rate
+
+    def _evict(self, shard: OrderedDict, now: float) -> None:
+        stale_before = now - self.idle_seconds
+        for _ in range(EVICTIONS_PER_INSERT):
+            if not shard:
+                return
+            key, (_, checked_at) = next(iter(shard.items()))
+            if checked_at > stale_before:
+                break
+            del shard[key]
+            self.evictions += 1
+        while len(shard) >= self.shard_max_keys:
+            shard.popitem(last=False)
+            self.evictions += 1
+
+
+def client_key(scope: Scope, header: Optional[bytes] = None) -> str:
+    """Key of the client of a request: the first address of header when given, else the peer address."""
+    if header is not None:
+        for name, value in scope["headers"]:
+            if name == header:
+                return value.split(b",", 1)[0].strip().decode("latin-1")
+    client = scope.get("client")
+    return client[0] if client else ""
+
+
+class RateLimitMiddleware:
+    """ASGI middleware answering 429 to the clients that exceed their token bucket.
+
+    Only the requests whose path starts with path_prefix are counted, the other routes are not limited.
+    """
+
+    def __init__(self, app: ASGIApp, limiter: TokenBucketLimiter, path_prefix: str = "",
+                 key_header: Optional[str] = None) -> None:
+        self.app = app
+        self.limiter = limiter
+        self.path_prefix = path_prefix
+        self.key_header = key_header.lower().encode("latin-1") if key_header else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"].startswith(self.path_prefix):
+            retry_after = self.limiter.acquire(client_key(scope, self.key_header))
+            if retry_after:
+                response = JSONResponse(
+                    {"detail": "Too Many Requests"}, status_code=429,
+                    headers={"Retry-After": str(math.ceil(retry_after))},
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
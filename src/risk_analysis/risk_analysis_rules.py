@@ -0,0 +1,58 @@
+from .schemas.rule_schema import RuleSetSchema
+from .risk_analysis_constants import MAX_AGE_LIMIT, MIN_AGE_LIMIT, MIN_INCOME, MIN_INCOME_THRESHOLD
+
+ALL_LINES = ["auto", "disability", "home", "life"]
+
+DEFAULT_RULE_SET = RuleSetSchema.parse_obj({
+    "version": "1",
+    "rules": [
+        {
+            "name": "no_income",
+            "conditions": [{"feature": "income", "operator": "le", "value": MIN_INCOME}],
+            "ineligible": ALL_LINES,
+        },
+        {
+            "name": "income_under_threshold",
+            "conditions": [{"feature": "income", "operator": "lt", "value": MIN_INCOME_THRESHOLD}],
+            "deltas": {"auto": -1, "disability": -1, "home": -1, "life": -1},
+        },
+        {
+            "name": "mortgaged_house",
+            "conditions": [{"feature": "house_status", "operator": "eq", "value": "mortgaged"}],
+            "deltas": {"home": 1, "disability": -1},
+        },
+        {
+            "name": "has_dependents",
+            "conditions": [{"feature": "dependents", "operator": "gt", "value": 0}],
+            "deltas": {"home": 1, "disability": 1},
+        },
+        {
+            "name": "married",
+            "conditions": [{"feature": "marital_status", "operator": "eq", "value": "married"}],
+            "deltas": {"life": 1, "disability": -1},
+        },
+        {
+            "name": "recent_vehicle",
+            "conditions": [{"feature": "vehicle_age", "operator": "le", "value": 5}],
+            "deltas": {"auto": 1},
+        },
+        {
+            "name": "age_in_range",
+            "conditions": [
+                {"feature": "age", "operator": "ge", "value": MIN_AGE_LIMIT},
+                {"feature": "age", "operator": "le", "value": MAX_AGE_LIMIT},
+            ],
+            "deltas": {"auto": -1, "disability": -1, "home": -1, "life": -1},
+        },
+        {
+            "name": "under_min_age",
+            "conditions": [{"feature": "age", "operator": "lt", "value": MIN_AGE_LIMIT}],
+            "deltas": {"auto": -2, "disability": -2, "home": -2, "life": -2},
+        },
+        {
+            "name": "over_max_age",
+            "conditions": [{"feature": "age", "operator": "gt", "value": MAX_AGE_LIMIT}],
+            "ineligible": ["disability", "life"],
+        },
+    ],
+})
@@ -0,0 +1,177 @@
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI
+
+from . import risk_analysis_controller, risk_analysis_startup
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def event_loop_and_parser() -> Dict[str, str]:
+    """uvloop and httptools when they are installed, the asyncio loop and the h11 parser otherwise."""
+    implementations = {"loop": "asyncio", "http": "h11"}
+    try:
+        import uvloop  # noqa: F401
+        implementations["loop"] = "uvloop"
+    except ImportError:
+        pass
+    try:
+        import httptools  # noqa: F401
+        implementations["http"] = "httptools"
+    except ImportError:
+        pass
+    return implementations
+
+
+def warm_up(app: FastAPI) -> None:
+    """Warm the app up on the service of the controller, then move the heap out of the collector's reach.
+
+    Frozen objects are never written by the collector, so their pages stay shared between the forked workers
+    instead of being copied into each of them.
+    """
+    risk_analysis_startup.warm_up(app, risk_analysis_controller.risk_analysis_service)
+    gc.collect()
+    gc.freeze()
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    """Listening socket opened by the supervisor and inherited by every worker."""
+    # IPPROTO_TCP, so that asyncio sets TCP_NODELAY on the accepted connections, without it every response on a
+    # keep-alive connection waits for the delayed ACK of the client (about 40 ms) before its body is sent
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class PreforkServer:
+    """Supervisor of uvicorn workers forked from a warmed app, sharing one listening socket.
+
+    The app, its tables and its OpenAPI schema are built once in the supervisor, then each worker is forked
+    from it and serves the inherited socket on its own event loop. On SIGTERM or SIGINT, the workers are asked to
+    stop: they close the socket, finish their requests and run the app shutdown, which writes the queued store
+    records. Workers still running after graceful_timeout seconds are killed. A worker exiting on its own is
+    replaced.
+    """
+
+    def __init__(self, app: FastAPI, host: str = "0.0.0.0", port: int = 8000, workers: Optional[int] = None,
+                 backlog: int = 2048, keep_alive: int = 5, limit_concurrency: Optional[int] = None,
+                 graceful_timeout: float = 30) -> None:
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.backlog = backlog
+        self.keep_alive = keep_alive
+        self.limit_concurrency = limit_concurrency
+        self.graceful_timeout = graceful_timeout
+        self.implementations = event_loop_and_parser()
+        self.pids: List[int] = []
+        self.should_exit = False
+
+    def _config(self) -> uvicorn.Config:
+        return uvicorn.Config(
+            self.app,
+            loop=self.implementations["loop"],
+            http=self.implementations["http"],
+            lifespan="on",
+            backlog=self.backlog,
+            timeout_keep_alive=self.keep_alive,
+            limit_concurrency=self.limit_concurrency,
+            access_log=False,
+        )
+
+    def _spawn(self, sock: socket.socket) -> int:
+        pid = os.fork()
+        if pid:
+            return pid
+        # Worker: out of the terminal's process group, so that a Ctrl-C reaches the supervisor only, and uvicorn
+        # installs its own handlers for a graceful exit
+        os.setpgid(0, 0)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        status = 0
+        try:
+            uvicorn.Server(self._config()).run(sockets=[sock])
+        except BaseException:
+            logger.exception("Worker %d failed", os.getpid())
+            status = 1
+        finally:
+            os._exit(status)
+
+    def _stop(self, signum, frame) -> None:
+        self.should_exit = True
+
+    def _reap(self) -> List[int]:
+        """Pids of the workers that exited since the last call."""
+        exited = []
+        while self.pids:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return list(self.pids)
+            if not pid:
+                break
+            exited.append(pid)
+        return exited
+
+    def run(self) -> None:
+        warm_up(self.app)
+        sock = bind_socket(self.host, self.port, self.backlog)
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        logger.info("Serving on %s:%d with %d workers, %s loop and %s parser", self.host, self.port, self.workers,
+                    self.implementations["loop"], self.implementations["http"])
+        self.pids = [self._spawn(sock) for _ in range(self.workers)]
+        while not self.should_exit:
+            for pid in self._reap():
+                self.pids.remove(pid)
+                logger.warning("Worker %d exited, starting a new one", pid)
+                self.pids.append(self._spawn(sock))
+            time.sleep(0.1)
+        self._shutdown()
+        sock.close()
+
+    def _shutdown(self) -> None:
+        for pid in self.pids:
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.pids and time.monotonic() < deadline:
+            for pid in self._reap():
+                self.pids.remove(pid)
+            time.sleep(0.05)
+        for pid in self.pids:
+            logger.warning("Worker %d did not stop within %s s, killing it", pid, self.graceful_timeout)
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.pids = []
+
+
+def main(app: FastAPI, argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve the risk analysis API with several worker processes.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, help="number of worker processes, one per core by default")
+    parser.add_argument("--backlog", type=int, default=2048, help="connections waiting to be accepted")
+    parser.add_argument("--keep-alive", type=int, default=5, help="seconds an idle connection is kept open")
+    parser.add_argument("--limit-concurrency", type=int,
+                        help="connections and tasks per worker before answering 503, unlimited by default")
+    parser.add_argument("--graceful-timeout", type=float, default=30,
+                        help="seconds the workers have to finish their requests on shutdown")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:     %(message)s")
+    PreforkServer(
+        app, args.host, args.port, args.workers, args.backlog, args.keep_alive, args.limit_concurrency,
+        args.graceful_timeout,
+    ).run()
@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import random
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .schemas.personal_information_schema import PersonalInformationSchema
+from .schemas.risk_score import INSURANCE_LINES, RISK_SCORE_CODES
+from .risk_batch_calculator import BatchRiskCalculator
+from .risk_lookup_table import RiskLookupTable
+
+logger = logging.getLogger(__name__)
+
+# Offset of the transition matrix of every line among the cells of all of them
+LINE_OFFSETS = np.arange(len(INSURANCE_LINES)) * len(RISK_SCORE_CODES) ** 2
+
+# Queued comparison: the subject and the lookup table that answered it
+ShadowItem = Tuple[PersonalInformationSchema, RiskLookupTable]
+
+
+def subject_fields(subject) -> dict:
+    """Fields of a PersonalInformationSchema or of a SubjectStruct of the fast decoders"""
+    house = subject.house
+    vehicle = subject.vehicle
+    return {
+        "age": subject.age,
+        "dependents": subject.dependents,
+        "house": {"ownership_status": house.ownership_status} if house is not None else None,
+        "income": subject.income,
+        "marital_status": subject.marital_status,
+        "risk_questions": [int(answer) for answer in subject.risk_questions],
+        "vehicle": {"year": vehicle.year} if vehicle is not None else None,
+    }
+
+
+class ShadowScorer:
+    """Scores the subjects of live requests again with a candidate rule set, off the request path.
+
+    Requests only append their subject and the table that scored them to a bounded asyncio queue, dropping it when
+    the queue is full rather than delaying the response. A background task takes up to batch_size queued subjects
+    at a time, scores them with both tables through the vectorized BatchRiskCalculator and yields to the event
+    loop between batches, so a request waits for at most one batch. A thread would not shorten that wait: the
+    scoring holds the GIL, which the event loop only gets back every switch interval, 5 ms by default.
+
+    Every insurance line keeps a matrix of the active score against the candidate score of the compared subjects,
+    and a uniform sample of sample_size divergent subjects, drawn by reservoir sampling.
+    """
+    candidate: RiskLookupTable
+    max_pending: int
+    batch_size: int
+    sample_size: int
+
+    def __init__(self, candidate: RiskLookupTable, max_pending: int = 10000, batch_size: int = 64,
+                 sample_size: int = 10, seed: Optional[int] = None) -> None:
+        if max_pending <= 0 or batch_size <= 0:
+            raise ValueError("max_pending and batch_size must be greater than 0")
+        self.candidate = candidate
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.sample_size = sample_size
+        self.random = random.Random(seed)
+        self.queue: Optional[asyncio.Queue] = None
+        self.worker: Optional[asyncio.Task] = None
+        self.compared = 0
+        self.divergent = 0
+        self.dropped = 0
+        self.failed = 0
+        # Subjects per line, active score and candidate score, both as RISK_SCORE_CODES indexes
+        self.transitions = np.zeros((len(INSURANCE_LINES), len(RISK_SCORE_CODES), len(RISK_SCORE_CODES)),
+                                    dtype=np.int64)
+        self.examples: List[List[dict]] = [[] for _ in INSURANCE_LINES]
+        self.sampled = [0] * len(INSURANCE_LINES)
+
+    async def start(self) -> None:
+        """Start comparing, on the running event loop."""
+        self.queue = asyncio.Queue(self.max_pending)
+        self.worker = asyncio.create_task(self._compare_behind())
+
+    async def close(self) -> None:
+        """Stop taking subjects, compare the queued ones and stop."""
+        if self.worker is None:
+            return
+        worker, self.worker = self.worker, None
+        await self.queue.put(None)
+        await worker
+
+    def submit(self, subject: PersonalInformationSchema, lookup_table: RiskLookupTable) -> None:
+        """Queue the subject scored by lookup_table for comparison, or drop it when the queue is full"""
+        if self.worker is None:
+            self.dropped += 1
+            return
+        try:
+            self.queue.put_nowait((subject, lookup_table))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def submit_many(self, subjects: Sequence[PersonalInformationSchema], lookup_table: RiskLookupTable) -> None:
+        """Queue as many of the subjects as the queue has room for, dropping the others"""
+        if self.worker is None:
+            self.dropped += len(subjects)
+            return
+        room = self.max_pending - self.queue.qsize()
+        for subject in subjects[:room]:
+            self.queue.put_nowait((subject, lookup_table))
+        self.dropped += max(len(subjects) - room, 0)
+
+    async def _next_batch(self) -> list:
+        """Wait for a subject, then take the queued ones up to batch_size or the close sentinel."""
+        items = [await self.queue.get()]
+        while len(items) < self.batch_size and items[-1] is not None and not self.queue.empty():
+            items.append(self.queue.get_nowait())
+        return items
+
+    async def _compare_behind(self) -> None:
+        running = True
+        while running:
+            items = await self._next_batch()
+            if items[-1] is None:
+                items.pop()
+                running = False
+            if not items:
+                continue
+            try:
+                self.compare(items)
+            except Exception:
+                logger.exception("Could not compare %d subjects with rule set %s", len(items), self.candidate.version)
+                self.failed += len(items)
+            # Requests queued meanwhile run before the next batch
+            await asyncio.sleep(0)
+
+    def compare(self, items: Sequence[ShadowItem]) -> None:
+        """Score the subjects with the candidate and count where it disagrees with the table that answered them"""
+        # A rule set swapped while subjects were queued leaves them with the table that actually answered them
+        groups: Dict[int, List[ShadowItem]] = {}
+        for item in items:
+            groups.setdefault(id(item[1]), []).append(item)
+        for group in groups.values():
+            active = group[0][1]
+            subjects = [subject for subject, _ in group]
+            calculator = BatchRiskCalculator.from_subjects(subjects)
+            active_indexes = calculator.calculate_indexes(active)
+            candidate_indexes = calculator.calculate_indexes(self.candidate)
+            active_codes = active.score_codes[active_indexes]
+            candidate_codes = self.candidate.score_codes[candidate_indexes]
+            # One bincount over the cells of the transition matrices, line by line
+            cells = (LINE_OFFSETS + active_codes.astype(np.intp) * len(RISK_SCORE_CODES) + candidate_codes).ravel()
+            self.transitions += np.bincount(cells, minlength=self.transitions.size).reshape(self.transitions.shape)
+            differs = active_codes != candidate_codes
+            self.compared += len(subjects)
+            self.divergent += int(np.count_nonzero(differs.any(axis=1)))
+            for position, line in zip(*np.nonzero(differs)):
+                self._sample(line, {
+                    "subject": subjects[position],
+                    "active_version": active.version,
+                    "active": active.table[active_indexes[position]],
+                    "candidate": self.candidate.table[candidate_indexes[position]],
+                })
+
+    def _sample(self, line: int, example: dict) -> None:
+        # Reservoir sampling: the n-th divergence of the line is kept with probability sample_size / n
+        self.sampled[line] += 1
+        examples = self.examples[line]
+        if len(examples) < self.sample_size:
+            examples.append(example)
+            return
+        slot = self.random.randrange(self.sampled[line])
+        if slot < self.sample_size:
+            examples[slot] = example
+
+    def stats(self) -> dict:
+        lines = {}
+        for position, line in enumerate(INSURANCE_LINES):
+            transitions = self.transitions[position]
+            lines[line] = {
+                "divergent": int(transitions.sum() - np.trace(transitions)),
+                "transitions": {
+                    active.value: {
+                        candidate.value: int(transitions[row, column])
+                        for column, candidate in enumerate(RISK_SCORE_CODES)
+                        if column != row and transitions[row, column]
+                    }
+                    for row, active in enumerate(RISK_SCORE_CODES)
+                    if transitions[row].sum() > transitions[row, row]
+                },
+                "examples": [{**example, "subject": subject_fields(example["subject"])}
+                             for example in self.examples[position]],
+            }
+        return {
+            "enabled": True,
+            "candidate_version": self.candidate.version,
+            "pending": self.queue.qsize() if self.queue is not None else 0,
+            "max_pending": self.max_pending,
+            "compared": self.compared,
+            "divergent": self.divergent,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "lines": lines,
+        }
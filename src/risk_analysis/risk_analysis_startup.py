@@ -0,0 +1,65 @@
+import json
+from typing import Dict
+
+from fastapi import FastAPI
+
+from .schemas.personal_information_schema import PersonalInformationSchema
+from .risk_analysis_fast_codec import decode_subject, encode_risk_profile
+from .risk_analysys_service import RiskAnalysisService
+
+# Scored before the app reports ready, so that every lazy initialization of the request path is done
+WARM_UP_SUBJECT = (b'{"age": 35, "dependents": 2, "house": {"ownership_status": "owned"}, "income": 0, '
+                   b'"marital_status": "married", "risk_questions": [0, 1, 0], "vehicle": {"year": 2018}}')
+
+
+def warm_up(app: FastAPI, service: RiskAnalysisService) -> None:
+    """Build the OpenAPI schema and run the scoring paths once.
+
+    The lookup tables are built when the service module is imported, the first scoring call still initializes
+    the daily clock, the validators of the schema path and the orjson path.
+    """
+    app.openapi()
+    lookup_table = service.lookup_table
+    subject = PersonalInformationSchema.parse_raw(WARM_UP_SUBJECT)
+    encode_risk_profile(lookup_table.calculate_subject_score(subject))
+    encode_risk_profile(lookup_table.calculate_subject_score(decode_subject(WARM_UP_SUBJECT)))
+    lookup_table.calculate_subject_index(subject)
+
+
+def write_openapi(app: FastAPI, path: str) -> None:
+    """Write the OpenAPI document of the app, to be served from the file instead of generated at startup."""
+    with open(path, "w") as file:
+        json.dump(app.openapi(), file, separators=(",", ":"))
+
+
+def read_openapi(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+class HealthCheck:
+    """Liveness and readiness of the process, in the format of the /health route.
+
+    A process that answers is alive. It is ready once the startup of the app has warmed its scoring paths, and no
+    longer ready once its shutdown starts, so that an orchestrator stops routing requests to it while it drains.
+    """
+    ready: bool
+
+    def __init__(self) -> None:
+        self.ready = False
+
+    def indicators(self) -> Dict[str, dict]:
+        return {
+            "liveness": {"status": "up"},
+            "readiness": {"status": "up" if self.ready else "down"},
+        }
+
+    def report(self) -> dict:
+        indicators = self.indicators()
+        down = {name: indicator for name, indicator in indicators.items() if indicator["status"] != "up"}
+        return {
+            "status": "error" if down else "ok",
+            "info": {name: indicator for name, indicator in indicators.items() if name not in down},
+            "error": down,
+            "details": indicators,
+        }
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Mapping, Optional, Sequence, Tuple
+
+from .schemas.personal_information_schema import PersonalInformationSchema
+from .schemas.risk_score import INSURANCE_LINES, RiskScoreEnum
+
+logger = logging.getLogger(__name__)
+
+# One row per scoring decision, the subject is stored as the fields that affect its score
+CREATE_TABLE = f"""
+CREATE TABLE IF NOT EXISTS risk_analysis (
+    id INTEGER PRIMARY KEY,
+    scored_at REAL NOT NULL,
+    rule_set_version TEXT NOT NULL,
+    age INTEGER NOT NULL,
+    dependents INTEGER NOT NULL,
+    income INTEGER NOT NULL,
+    marital_status TEXT NOT NULL,
+    house_status TEXT,
+    vehicle_year INTEGER,
+    risk_answers TEXT NOT NULL,
+    {", ".join(f"{line} TEXT NOT NULL" for line in INSURANCE_LINES)}
+)
+"""
+INSERT_ROW = (
+    "INSERT INTO risk_analysis (scored_at, rule_set_version, age, dependents, income, marital_status, house_status, "
+    f"vehicle_year, risk_answers, {', '.join(INSURANCE_LINES)}) VALUES ({', '.join('?' * (9 + len(INSURANCE_LINES)))})"
+)
+
+# Queued record: (scored_at, rule set version, subject, risk profile)
+Record = Tuple[float, str, PersonalInformationSchema, Mapping[str, RiskScoreEnum]]
+
+
+class StoreUnavailableError(Exception):
+    """The store can not take a record, because its queue is full or it is not running.
+
+    The decision is then refused rather than returned without its audit record.
+    """
+
+
+class StoreBatchTooLargeError(ValueError):
+    """A batch holds more subjects than the store queue, so it could never be recorded."""
+
+
+def record_row(record: Record) -> tuple:
+    scored_at, version, subject, risk_profile = record
+    house = subject.house
+    vehicle = subject.vehicle
+    return (
+        scored_at,
+        version,
+        subject.age,
+        subject.dependents,
+        subject.income,
+        subject.marital_status,
+        house.ownership_status if house is not None else None,
+        vehicle.year if vehicle is not None else None,
+        "".join("1" if answer else "0" for answer in subject.risk_questions),
+        *(risk_profile[line] for line in INSURANCE_LINES),
+    )
+
+
+class RiskAnalysisStore:
+    """Write-behind audit trail of the scoring decisions in SQLite.
+
+    Requests only append records to a bounded asyncio queue. A background task collects the records
+    arriving within flush_interval seconds of the first one, up to batch_size, and writes them in a single
+    transaction on a dedicated thread, so no request waits on the disk. A full queue rejects new records
+    with StoreUnavailableError instead of buffering without bound. A failed write is logged and its
+    records are counted as failed, the writer goes on with the next batch.
+    """
+    path: str
+    max_pending: int
+    batch_size: int
+    flush_interval: float
+
+    def __init__(self, path: str, max_pending: int = 10000, batch_size: int = 1000, flush_interval: float = 0.1,
+                 clock: Callable[[], float] = time.time) -> None:
+        if max_pending <= 0 or batch_size <= 0:
+            raise ValueError("max_pending and batch_size must be greater than 0")
+        self.path = path
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.queue: Optional[asyncio.Queue] = None
+        self.connection: Optional[sqlite3.Connection] = None
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.writer: Optional[asyncio.Task] = None
+        self.written = 0
+        self.batches = 0
+        self.rejected = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(CREATE_TABLE)
+        connection.commit()
+        return connection
+
+    def _write(self, records: List[Record]) -> None:
+        with self.connection:
+            self.connection.executemany(INSERT_ROW, map(record_row, records))
+
+    async def start(self) -> None:
+        """Open the database and start the writer, on the running event loop."""
+        loop = asyncio.get_running_loop()
+        # A single thread owns the connection, so writes never run concurrently
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="risk-analysis-store")
+        self.connection = await loop.run_in_executor(self.executor, self._connect)
+        self.queue = asyncio.Queue(self.max_pending)
+        self.writer = asyncio.create_task(self._write_behind())
+
+    async def _next_batch(self) -> list:
+        """Wait for the records of the next batch, ending early on a full batch or the close sentinel."""
+        loop = asyncio.get_running_loop()
+        records = [await self.queue.get()]
+        deadline = loop.time() + self.flush_interval
+        while len(records) < self.batch_size and records[-1] is not None:
+            if not self.queue.empty():
+                records.append(self.queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                records.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return records
+
+    async def _write_behind(self) -> None:
+        loop = asyncio.get_running_loop()
+        running = True
+        while running:
+            records = await self._next_batch()
+            if records[-1] is None:
+                records.pop()
+                running = False
+            if not records:
+                continue
+            try:
+                await loop.run_in_executor(self.executor, self._write, records)
+            except Exception as error:
+                logger.exception("Could not write %d risk analysis records to %s", len(records), self.path)
+                self.failed += len(records)
+                self.last_error = repr(error)
+            else:
+                self.written += len(records)
+                self.batches += 1
+
+    async def close(self) -> None:
+        """Stop taking records, write the queued ones and close the database."""
+        if self.writer is None:
+            return
+        writer, self.writer = self.writer, None
+        await self.queue.put(None)
+        await writer
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.connection.close)
+        self.executor.shutdown()
+
+    def record(self, subject: PersonalInformationSchema, risk_profile: Mapping[str, RiskScoreEnum],
+               version: str) -> None:
+        self.record_many([subject], [risk_profile], version)
+
+    def record_many(self, subjects: Sequence[PersonalInformationSchema],
+                    risk_profiles: Sequence[Mapping[str, RiskScoreEnum]], version: str) -> None:
+        """Queue the records of a scoring, all of them or none."""
+        if len(subjects) > self.max_pending:
+            raise StoreBatchTooLargeError(
+                f"batches are limited to {self.max_pending} subjects while the decisions are persisted"
+            )
+        if self.writer is None:
+            self.rejected += len(subjects)
+            raise StoreUnavailableError("risk analysis store is not running")
+        if self.max_pending - self.queue.qsize() < len(subjects):
+            self.rejected += len(subjects)
+            raise StoreUnavailableError("risk analysis store queue is full")
+        scored_at = self.clock()
+        for subject, risk_profile in zip(subjects, risk_profiles):
+            self.queue.put_nowait((scored_at, version, subject, risk_profile))
+
+    def stats(self) -> dict:
+        return {
+            "enabled": True,
+            "pending": self.queue.qsize() if self.queue is not None else 0,
+            "max_pending": self.max_pending,
+            "written": self.written,
+            "batches": self.batches,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,104 @@
+import json
+from typing import AsyncIterable, AsyncIterator, Optional, Tuple
+
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+
+from .schemas.personal_information_schema import PersonalInformationSchema
+from .risk_lookup_table import RiskLookupTable
+from .risk_analysys_service import RiskAnalysisService
+from .risk_analysis_store import StoreUnavailableError
+from .risk_analysis_constants import STREAM_MAX_LINE_BYTES
+
+LINE_TOO_LONG_ERROR = {
+    "loc": ["body"],
+    "msg": f"line exceeds {STREAM_MAX_LINE_BYTES} bytes",
+    "type": "value_error.line_too_long",
+}
+
+
+class RequestStreamingResponse(StreamingResponse):
+    """NDJSON streaming response whose body iterator consumes the request body.
+
+    StreamingResponse listens for the client disconnect while streaming, which takes the request
+    body messages away from `request.stream()`, so this response only sends its body.
+    """
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def iter_ndjson_lines(chunks: AsyncIterable[bytes],
+                            max_line_bytes: int = STREAM_MAX_LINE_BYTES) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """Split a stream of chunks into (line number, line) pairs.
+
+    Only the current line is buffered. A line longer than max_line_bytes is yielded as None
+    and the rest of it is discarded, so memory stays bounded whatever the input.
+    """
+    buffer = bytearray()
+    line_number = 0
+    overflow = False
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end == -1:
+                if not overflow:
+                    buffer += chunk[start:]
+                    if len(buffer) > max_line_bytes:
+                        overflow = True
+                        buffer.clear()
+                break
+
+            line_number += 1
+            if overflow:
+                overflow = False
+                yield line_number, None
+            else:
+                buffer += chunk[start:end]
+                if len(buffer) > max_line_bytes:
+                    yield line_number, None
+                elif buffer.strip():
+                    yield line_number, bytes(buffer)
+            buffer.clear()
+            start = end + 1
+
+    if overflow:
+        yield line_number + 1, None
+    elif buffer.strip():
+        yield line_number + 1, bytes(buffer)
+
+
+async def stream_risk_analysis(chunks: AsyncIterable[bytes], service: RiskAnalysisService,
+                               lookup_table: Optional[RiskLookupTable] = None) -> AsyncIterator[bytes]:
+    """Score newline-delimited JSON subjects, emitting one JSON line per non-blank input line.
+
+    Every output line carries the number of the input line it answers. A line that is not a valid
+    subject yields its validation errors instead of a risk profile, in the same format as the 422
+    response of POST /risk-analysis. The whole stream is scored with lookup_table, the rule set current when it
+    starts by default.
+    """
+    if lookup_table is None:
+        lookup_table = service.lookup_table
+    async for line_number, line in iter_ndjson_lines(chunks):
+        if line is None:
+            yield json.dumps({"line": line_number, "detail": [LINE_TOO_LONG_ERROR]}).encode() + b"\n"
+            continue
+
+        try:
+            subject = PersonalInformationSchema.parse_raw(line)
+        except ValidationError as error:
+            detail = [{**detail, "loc": ["body", *detail["loc"]]} for detail in error.errors()]
+            yield json.dumps({"line": line_number, "detail": detail}).encode() + b"\n"
+            continue
+
+        try:
+            risk_profile = service.run_risk_analysis(subject, lookup_table)
+        except StoreUnavailableError as error:
+            detail = [{"loc": ["body"], "msg": str(error), "type": "service_unavailable.store"}]
+            yield json.dumps({"line": line_number, "detail": detail}).encode() + b"\n"
+            continue
+        yield json.dumps({"line": line_number, "profile": dict(risk_profile)}).encode() + b"\n"
@@ -0,0 +1,113 @@
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from .schemas.personal_information_schema import PersonalInformationSchema, MaritalStatusEnum, OwnershipStatusEnum
+from .schemas.risk_score import INSURANCE_LINES
+from .schemas.rule_schema import RuleFeatureEnum
+from .risk_lookup_table import RiskLookupTable, RISK_ANSWERS_EDGES, bucket_representatives
+from .risk_analysis_clock import current_year
+
+# Perturbed field of each lookup table dimension, in the order of the dimensions
+WHAT_IF_FIELDS = ("age", "dependents", "income", "vehicle.year", "marital_status", "house.ownership_status",
+                  "risk_questions")
+VEHICLE_DIMENSION = WHAT_IF_FIELDS.index("vehicle.year")
+
+# Perturbation of a cell: offset to the cell of the perturbed subject, field and value of the perturbed subject
+Perturbation = Tuple[int, str, Union[int, str, None]]
+
+
+def nearest_bucket_value(edges: List[int], bucket: int, current: int) -> int:
+    """Value of bucket closest to the current bucket: its lowest value above it, its highest value below it."""
+    return edges[bucket - 1] if bucket > current else edges[bucket] - 1
+
+
+def numeric_values(edges: List[int]) -> Callable[[int, int], int]:
+    return lambda bucket, current: nearest_bucket_value(edges, bucket, current)
+
+
+def vehicle_age_values(edges: List[int]) -> Callable[[int, int], Optional[int]]:
+    """Vehicle age of a vehicle bucket, bucket 0 standing for no vehicle."""
+    representatives = bucket_representatives(edges)
+
+    def value(bucket: int, current: int) -> Optional[int]:
+        if bucket == 0:
+            return None
+        if current == 0:
+            return representatives[bucket - 1]
+        return nearest_bucket_value(edges, bucket - 1, current - 1)
+    return value
+
+
+class WhatIfAnalysis:
+    """Profiles of a subject and of every change of a single field that moves it to another cell of the table.
+
+    A cell index is the sum of the bucket of every feature times the stride of its dimension, so changing one
+    field of the subject only offsets the baseline cell by a multiple of that stride. The offsets to every other
+    bucket of every dimension are computed once per lookup table, and the analysis of a cell, shared by all of its
+    subjects, is built from them the first time one of its subjects is analyzed: a request then costs the
+    bucketing of one scoring call. A perturbed numeric field gets the value of its new bucket closest to the
+    subject's bucket, e.g. the threshold an income has to reach.
+    """
+    lookup_table: RiskLookupTable
+
+    def __init__(self, lookup_table: RiskLookupTable) -> None:
+        self.lookup_table = lookup_table
+        # Plain dicts, encoded by orjson without going through the read-only cells
+        self.profiles = [{line: profile[line] for line in INSURANCE_LINES} for profile in lookup_table.table]
+        edges = lookup_table.edges
+        marital_statuses = [status.value for status in MaritalStatusEnum]
+        house_statuses = [None] + [status.value for status in OwnershipStatusEnum]
+        risk_answers = [0] + RISK_ANSWERS_EDGES
+        values = [
+            numeric_values(edges[RuleFeatureEnum.age]),
+            numeric_values(edges[RuleFeatureEnum.dependents]),
+            numeric_values(edges[RuleFeatureEnum.income]),
+            vehicle_age_values(edges[RuleFeatureEnum.vehicle_age]),
+            lambda bucket, current: marital_statuses[bucket],
+            lambda bucket, current: house_statuses[bucket],
+            lambda bucket, current: risk_answers[bucket],
+        ]
+        # Per dimension, per bucket of the subject: the perturbations to every other bucket
+        self.perturbations: List[List[List[Perturbation]]] = [
+            [
+                [((bucket - current) * stride, field, value(bucket, current))
+                 for bucket in range(size) if bucket != current]
+                for current in range(size)
+            ]
+            for field, size, stride, value in zip(WHAT_IF_FIELDS, lookup_table.shape, lookup_table.strides, values)
+        ]
+        # Analyses of the cells analyzed so far, in the year their vehicle years were computed for
+        self.analyses: Dict[int, dict] = {}
+        self.year = current_year()
+
+    def _analyze_cell(self, index: int) -> dict:
+        profiles = self.profiles
+        baseline = profiles[index]
+        perturbations = []
+        for dimension, (size, stride, dimension_perturbations) in enumerate(
+                zip(self.lookup_table.shape, self.lookup_table.strides, self.perturbations)):
+            for offset, field, value in dimension_perturbations[index // stride % size]:
+                profile = profiles[index + offset]
+                if dimension == VEHICLE_DIMENSION and value is not None:
+                    value = self.year - value
+                perturbations.append({
+                    "field": field,
+                    "value": value,
+                    "risk_profile": profile,
+                    "changed_lines": [line for line in INSURANCE_LINES if profile[line] != baseline[line]],
+                })
+        return {"risk_profile": baseline, "perturbations": perturbations}
+
+    def analyze(self, subject: PersonalInformationSchema) -> dict:
+        """Profile of the subject and its perturbations, with the lines each of them changes.
+
+        The analysis is shared by every subject of the cell and must not be modified.
+        """
+        year = current_year()
+        if year != self.year:
+            self.analyses = {}
+            self.year = year
+        index = self.lookup_table.calculate_subject_index(subject)
+        analysis = self.analyses.get(index)
+        if analysis is None:
+            analysis = self.analyses[index] = self._analyze_cell(index)
+        return analysis
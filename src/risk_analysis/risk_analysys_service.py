@@ -1,12 +1,160 @@
+from typing import List, Optional
+
 from .schemas.personal_information_schema import PersonalInformationSchema
-from .risk_calculator import RiskCalculator
+from .risk_batch_calculator import BatchRiskCalculator
+from .risk_rule_engine import RuleEngine
+from .risk_lookup_table import RiskLookupTable
+from .risk_analysis_cache import RiskAnalysisCache, subject_cache_key
+from .risk_analysis_metrics import RiskAnalysisMetrics
+from .risk_analysis_store import RiskAnalysisStore
+from .risk_analysis_what_if import WhatIfAnalysis
+from .risk_analysis_explain import RiskExplainer
+from .risk_analysis_shadow import ShadowScorer
+from .risk_analysis_rules import DEFAULT_RULE_SET
 from .schemas.risk_score import RiskProfile
 
+DEFAULT_RULE_ENGINE = RuleEngine(DEFAULT_RULE_SET)
+DEFAULT_LOOKUP_TABLE = RiskLookupTable(DEFAULT_RULE_ENGINE)
+
 
 class RiskAnalysisService:
+    lookup_table: RiskLookupTable
+    cache: Optional[RiskAnalysisCache]
+    metrics: Optional[RiskAnalysisMetrics]
+    store: Optional[RiskAnalysisStore]
+    shadow: Optional[ShadowScorer]
+
+    def __init__(self, lookup_table: RiskLookupTable = DEFAULT_LOOKUP_TABLE,
+                 cache: Optional[RiskAnalysisCache] = None, metrics: Optional[RiskAnalysisMetrics] = None,
+                 store: Optional[RiskAnalysisStore] = None, shadow: Optional[ShadowScorer] = None) -> None:
+        self.lookup_table = lookup_table
+        self.cache = cache
+        self.metrics = metrics
+        self.store = store
+        self.shadow = shadow
+        self.what_if: Optional[WhatIfAnalysis] = None
+        self.explainer: Optional[RiskExplainer] = None
+
+    def run_risk_analysis(self, subject: PersonalInformationSchema,
+                          lookup_table: Optional[RiskLookupTable] = None) -> RiskProfile:
+        """Score the subject with lookup_table, the current rule set by default"""
+        if lookup_table is None:
+            lookup_table = self.lookup_table
+        if self.cache is None and self.metrics is None:
+            risk_profile = lookup_table.calculate_subject_score(subject)
+        else:
+            # The cell index gives both the profile and the fired rules, so the cache keeps indexes. Versioned keys:
+            # a request still scoring with a replaced rule set never serves its cells to others
+            index = None
+            if self.cache is not None:
+                key = (lookup_table.version, subject_cache_key(subject))
+                index = self.cache.get(key)
+            if index is None:
+                index = lookup_table.calculate_subject_index(subject)
+                if self.cache is not None:
+                    self.cache.put(key, index)
+            if self.metrics is not None:
+                self.metrics.count_rules(lookup_table.fired_rules[index])
+            risk_profile = lookup_table.table[index]
+        if self.store is not None:
+            self.store.record(subject, risk_profile, lookup_table.version)
+        if self.shadow is not None:
+            self.shadow.submit(subject, lookup_table)
+        return risk_profile
+
+    def run_batch_risk_analysis(self, subjects: List[PersonalInformationSchema],
+                                lookup_table: Optional[RiskLookupTable] = None) -> List[RiskProfile]:
+        if lookup_table is None:
+            lookup_table = self.lookup_table
+        calculator = BatchRiskCalculator.from_subjects(subjects)
+        if self.metrics is not None:
+            self.metrics.count_cells(lookup_table, calculator.calculate_indexes(lookup_table))
+        risk_profiles = calculator.calculate_subject_scores(lookup_table)
+        if self.store is not None:
+            self.store.record_many(subjects, risk_profiles, lookup_table.version)
+        if self.shadow is not None:
+            self.shadow.submit_many(subjects, lookup_table)
+        return risk_profiles
+
+    def run_coalesced_risk_analysis(self, subjects: List[PersonalInformationSchema],
+                                    lookup_table: Optional[RiskLookupTable] = None) -> List[RiskProfile]:
+        """Score the subjects of concurrent requests together, each distinct subject once.
+
+        Every subject is still counted in the metrics and recorded in the audit trail as its own request.
+        """
+        if lookup_table is None:
+            lookup_table = self.lookup_table
+        # Position of every subject among the distinct ones, which are the only ones bucketed
+        unique_positions = {}
+        unique_subjects = []
+        positions = []
+        for subject in subjects:
+            key = subject_cache_key(subject)
+            position = unique_positions.get(key)
+            if position is None:
+                position = unique_positions[key] = len(unique_subjects)
+                unique_subjects.append(subject)
+            positions.append(position)
+        indexes = BatchRiskCalculator.from_subjects(unique_subjects).calculate_indexes(lookup_table)
+        if len(unique_subjects) < len(subjects):
+            indexes = indexes[positions]
+        if self.metrics is not None:
+            self.metrics.count_cells(lookup_table, indexes)
+        table = lookup_table.table
+        risk_profiles = [table[index] for index in indexes.tolist()]
+        if self.store is not None:
+            self.store.record_many(subjects, risk_profiles, lookup_table.version)
+        if self.shadow is not None:
+            self.shadow.submit_many(subjects, lookup_table)
+        return risk_profiles
+
+    def run_what_if_analysis(self, subject: PersonalInformationSchema,
+                             lookup_table: Optional[RiskLookupTable] = None) -> dict:
+        """Profiles of the subject with each single field changed, neither cached, counted nor recorded"""
+        if lookup_table is None:
+            lookup_table = self.lookup_table
+        what_if = self.what_if
+        if what_if is None or what_if.lookup_table is not lookup_table:
+            what_if = WhatIfAnalysis(lookup_table)
+            if lookup_table is self.lookup_table:
+                self.what_if = what_if
+        return what_if.analyze(subject)
+
+    def run_explained_risk_analysis(self, subject: PersonalInformationSchema,
+                                    lookup_table: Optional[RiskLookupTable] = None) -> dict:
+        """Score the subject like run_risk_analysis, returning its profile with the rules that produced it"""
+        if lookup_table is None:
+            lookup_table = self.lookup_table
+        self.run_risk_analysis(subject, lookup_table)
+        explainer = self.explainer
+        if explainer is None or explainer.lookup_table is not lookup_table:
+            explainer = RiskExplainer(lookup_table)
+            if lookup_table is self.lookup_table:
+                self.explainer = explainer
+        return explainer.explain(subject)
+
+    def swap_lookup_table(self, lookup_table: RiskLookupTable) -> None:
+        """Score the next requests with another rule set.
+
+        Replacing the reference is atomic, so requests need no lock: each one reads the table once and keeps it
+        until it is answered. Only the cached profiles of the replaced version are dropped.
+        """
+        previous = self.lookup_table
+        self.lookup_table = lookup_table
+        if self.cache is not None and previous.version != lookup_table.version:
+            self.cache.discard(lambda key: key[0] == previous.version)
+
+    def cache_stats(self) -> dict:
+        if self.cache is None:
+            return {"enabled": False}
+        return self.cache.stats()
 
-    def __init__(self) -> None:
-        pass
+    def store_stats(self) -> dict:
+        if self.store is None:
+            return {"enabled": False}
+        return self.store.stats()
 
-    def run_risk_analysis(self, subject: PersonalInformationSchema) -> RiskProfile:
-        return RiskCalculator(subject).calculate_subject_score()
+    def shadow_stats(self) -> dict:
+        if self.shadow is None:
+            return {"enabled": False}
+        return self.shadow.stats()
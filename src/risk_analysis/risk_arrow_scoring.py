@@ -0,0 +1,260 @@
+"""Arrow adapters of the scoring core, for applicant snapshots shaped like the API requests.
+
+Record batches hold one subject per row with the columns of PersonalInformationSchema: `house` a struct with an
+`ownership_status` string, `vehicle` a struct with a `year` integer, both null when missing, and `risk_questions`
+a list of booleans or 0/1 integers. The columns are read as whole arrays into the columns of the
+BatchRiskCalculator, without a Python object per row, and the risk profiles are written back as dictionary-encoded
+string columns. pyarrow is imported by the functions, so that importing the module does not require it.
+"""
+import json
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+from pydantic import ValidationError
+
+from .schemas.personal_information_schema import PersonalInformationSchema, MaritalStatusEnum
+from .schemas.risk_score import INSURANCE_LINES, RISK_SCORE_CODES
+from .risk_batch_calculator import BatchRiskCalculator, subject_columns
+from .risk_lookup_table import RiskLookupTable, HOUSE_STATUS_CODES, HOUSE_NONE, NO_VEHICLE
+from .risk_analysis_fast_codec import VEHICLE_YEAR_MAX, VEHICLE_YEAR_MIN, RISK_QUESTIONS_SIZE
+from .risk_analysys_service import DEFAULT_LOOKUP_TABLE
+
+NESTED_COLUMNS = ("age", "dependents", "income", "marital_status", "house", "vehicle", "risk_questions")
+# Columns of the scored batches: one dictionary-encoded risk score per insurance line, null for rejected rows, and
+# the JSON validation errors of those rows
+PROFILE_COLUMNS = (*INSURANCE_LINES, "detail")
+DEFAULT_BATCH_ROWS = 1_000_000
+
+_MARITAL_STATUSES = [status.value for status in MaritalStatusEnum]
+# Ownership statuses in the order of their codes, starting at 1 as HOUSE_NONE is 0
+_HOUSE_STATUSES = [status.value for status in sorted(HOUSE_STATUS_CODES, key=HOUSE_STATUS_CODES.get)]
+
+
+def is_nested(schema) -> bool:
+    """Whether an Arrow schema holds subjects shaped like the API requests rather than the flat file columns"""
+    import pyarrow as pa
+
+    return set(NESTED_COLUMNS) <= set(schema.names) and pa.types.is_struct(schema.field("house").type)
+
+
+def integer_values(array) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Return the values of an integer Arrow array and its non-null mask, None for any other type.
+
+    The values are a view of the Arrow buffer for int64 arrays without nulls, a copy with nulls as -1 otherwise.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if pa.types.is_null(array.type):
+        return np.full(len(array), -1, dtype=np.int64), np.zeros(len(array), dtype=bool)
+    if not pa.types.is_integer(array.type):
+        return None
+    if pa.types.is_int64(array.type) and array.null_count == 0:
+        return array.to_numpy(zero_copy_only=True), np.ones(len(array), dtype=bool)
+    try:
+        values = pc.fill_null(array.cast(pa.int64()), -1).to_numpy()
+    except pa.ArrowInvalid:
+        return None  # Unsigned values out of the int64 range
+    return values, array.is_valid().to_numpy(zero_copy_only=False)
+
+
+def string_codes(array, values: List[str]) -> Optional[np.ndarray]:
+    """Return the position of every string of an Arrow array in values, -1 for nulls and other strings.
+
+    Dictionary-encoded arrays, as Parquet strings are usually read, are matched on their dictionary only.
+    None when the array holds neither strings nor dictionary-encoded strings.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if pa.types.is_null(array.type):
+        return np.full(len(array), -1, dtype=np.int64)
+    if pa.types.is_dictionary(array.type):
+        dictionary_codes = string_codes(array.dictionary, values)
+        if dictionary_codes is None:
+            return None
+        indices = integer_values(array.indices)[0]
+        return np.where(indices >= 0, dictionary_codes[np.maximum(indices, 0)], -1)
+    if not (pa.types.is_string(array.type) or pa.types.is_large_string(array.type)):
+        return None
+    codes = pc.index_in(array, value_set=pa.array(values, type=array.type))
+    return pc.fill_null(codes, -1).to_numpy(zero_copy_only=False).astype(np.int64)
+
+
+def risk_answers(array) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Return the number of positive answers of every list of a risk_questions array and the mask of the lists
+    of exactly RISK_QUESTIONS_SIZE boolean or 0/1 integer answers, None for any other type.
+
+    The answers are summed over the flat values with a cumulative sum read at the list offsets, a view of the Arrow
+    buffers for integer lists.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    size = len(array)
+    if pa.types.is_fixed_size_list(array.type):
+        list_size = array.type.list_size
+        offsets = (np.arange(size + 1, dtype=np.int64) + array.offset) * list_size
+    elif pa.types.is_list(array.type) or pa.types.is_large_list(array.type):
+        offsets = array.offsets.to_numpy(zero_copy_only=True)
+    else:
+        return None
+    answers = array.values
+    if pa.types.is_boolean(answers.type):
+        # Booleans are packed bits, unpacked with their nulls counted as invalid answers
+        values = pc.fill_null(answers.cast(pa.int8()), -1).to_numpy(zero_copy_only=False)
+    else:
+        integers = integer_values(answers)
+        if integers is None:
+            return None
+        values = integers[0]
+    invalid = (values != 0) & (values != 1)
+    positive = np.concatenate(([0], np.cumsum(values == 1)))
+    invalid_count = np.concatenate(([0], np.cumsum(invalid)))
+    starts, ends = offsets[:-1], offsets[1:]
+    plain = (ends - starts == RISK_QUESTIONS_SIZE) & (invalid_count[ends] == invalid_count[starts])
+    plain &= array.is_valid().to_numpy(zero_copy_only=False)
+    return positive[ends] - positive[starts], plain
+
+
+def _column(batch, name: str):
+    """Return a column of a record batch, or of a table as a single array"""
+    column = batch.column(name)
+    return column.combine_chunks() if hasattr(column, "combine_chunks") else column
+
+
+def record_batch_columns(batch) -> Tuple[np.ndarray, BatchRiskCalculator]:
+    """Read the batch columns of the rows of a nested record batch or table holding plain valid values.
+
+    Returns the mask of those rows and their BatchRiskCalculator. The other rows are left to
+    PersonalInformationSchema, so that they are coerced or rejected exactly as by the API.
+    """
+    import pyarrow as pa
+
+    size = batch.num_rows
+    none = np.zeros(size, dtype=bool), BatchRiskCalculator([], [], [], [], [], [], [])
+    if not is_nested(batch.schema) or not pa.types.is_struct(batch.schema.field("vehicle").type):
+        return none
+    house, vehicle = _column(batch, "house"), _column(batch, "vehicle")
+    if house.type.get_field_index("ownership_status") < 0 or vehicle.type.get_field_index("year") < 0:
+        return none
+
+    integers = {name: integer_values(_column(batch, name)) for name in ("age", "dependents", "income")}
+    vehicle_year = integer_values(vehicle.field("year"))
+    answers = risk_answers(_column(batch, "risk_questions"))
+    marital_status = string_codes(_column(batch, "marital_status"), _MARITAL_STATUSES)
+    house_status = string_codes(house.field("ownership_status"), _HOUSE_STATUSES)
+    if any(column is None for column in (*integers.values(), vehicle_year, answers, marital_status, house_status)):
+        return none
+
+    plain = (marital_status >= 0) & answers[1]
+    for values, valid in integers.values():
+        plain &= valid & (values >= 0)
+    # A null struct is a missing house or vehicle, a present one needs a valid field
+    has_house = house.is_valid().to_numpy(zero_copy_only=False)
+    plain &= ~has_house | (house_status >= 0)
+    has_vehicle = vehicle.is_valid().to_numpy(zero_copy_only=False)
+    year, has_year = vehicle_year
+    plain &= ~has_vehicle | (has_year & (year >= VEHICLE_YEAR_MIN) & (year < VEHICLE_YEAR_MAX))
+
+    if plain.all():
+        # Views of the Arrow buffers are kept as they are, BatchRiskCalculator does not copy int64 arrays
+        select = slice(None)
+    else:
+        select = plain
+    return plain, BatchRiskCalculator(
+        integers["age"][0][select],
+        integers["dependents"][0][select],
+        integers["income"][0][select],
+        np.where(has_house, house_status + 1, HOUSE_NONE)[select],
+        (marital_status == _MARITAL_STATUSES.index(MaritalStatusEnum.married.value))[select],
+        np.where(has_vehicle, year, NO_VEHICLE)[select],
+        answers[0][select],
+    )
+
+
+def risk_profile_arrays(indexes: np.ndarray, lookup_table: RiskLookupTable = DEFAULT_LOOKUP_TABLE,
+                        scored: Optional[np.ndarray] = None) -> list:
+    """Return one dictionary-encoded Arrow array of risk scores per insurance line for lookup table cells.
+
+    The int8 score codes of each line are contiguous, so every array uses them as its indices buffer without a
+    copy. Rows outside the scored mask are null.
+    """
+    import pyarrow as pa
+
+    dictionary = pa.array([score.value for score in RISK_SCORE_CODES])
+    # Line-major codes, each row of the matrix is the contiguous column of one line
+    codes = lookup_table.score_codes.T[:, indexes]
+    mask = None if scored is None or scored.all() else ~scored
+    return [pa.DictionaryArray.from_arrays(pa.array(codes[line], mask=mask), dictionary)
+            for line in range(len(INSURANCE_LINES))]
+
+
+def score_record_batch(batch, lookup_table: RiskLookupTable = DEFAULT_LOOKUP_TABLE):
+    """Score every row of a nested record batch, returning a record batch of PROFILE_COLUMNS in the same order"""
+    import pyarrow as pa
+
+    plain, calculator = record_batch_columns(batch)
+    indexes = np.zeros(batch.num_rows, dtype=np.intp)
+    indexes[plain] = calculator.calculate_indexes(lookup_table)
+    scored = plain.copy()
+    details = None
+    other_rows = np.flatnonzero(~plain)
+    if len(other_rows):
+        details = [None] * batch.num_rows
+        other_lines = []
+        columns = []
+        for row, value in zip(other_rows.tolist(), batch.take(pa.array(other_rows)).to_pylist()):
+            try:
+                subject = PersonalInformationSchema.parse_obj(value)
+            except ValidationError as error:
+                details[row] = json.dumps(error.errors())
+                continue
+            other_lines.append(row)
+            columns.append(subject_columns(subject))
+        indexes[other_lines] = BatchRiskCalculator.from_rows(columns, len(columns)).calculate_indexes(lookup_table)
+        scored[other_lines] = True
+    return pa.RecordBatch.from_arrays(
+        [*risk_profile_arrays(indexes, lookup_table, scored), pa.array(details, type=pa.string())
+         if details is not None else pa.nulls(batch.num_rows, pa.string())],
+        names=list(PROFILE_COLUMNS),
+    )
+
+
+def score_parquet_file(path: str, output_path: str, lookup_table: RiskLookupTable = DEFAULT_LOOKUP_TABLE,
+                       batch_rows: int = DEFAULT_BATCH_ROWS) -> dict:
+    """Score a Parquet file of nested subjects into a Parquet file of PROFILE_COLUMNS, batch_rows at a time.
+
+    The input is memory-mapped with its marital status read as a dictionary, the output keeps the risk scores
+    dictionary-encoded. Returns the rows, the rejected rows and the seconds spent reading, scoring and writing.
+    """
+    import pyarrow.parquet as pq
+
+    stats = {"rows": 0, "rejected": 0, "read": 0.0, "score": 0.0, "write": 0.0}
+    started = time.perf_counter()
+    source = pq.ParquetFile(path, memory_map=True, read_dictionary=["marital_status"])
+    writer = None
+    try:
+        batches = source.iter_batches(batch_size=batch_rows)
+        while True:
+            read_started = time.perf_counter()
+            batch = next(batches, None)
+            score_started = time.perf_counter()
+            stats["read"] += score_started - read_started
+            if batch is None:
+                break
+            profiles = score_record_batch(batch, lookup_table)
+            write_started = time.perf_counter()
+            stats["score"] += write_started - score_started
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, profiles.schema)
+            writer.write_batch(profiles)
+            stats["write"] += time.perf_counter() - write_started
+            stats["rows"] += batch.num_rows
+            stats["rejected"] += batch.num_rows - profiles.column("detail").null_count
+    finally:
+        if writer is not None:
+            writer.close()
+    stats["total"] = time.perf_counter() - started
+    return stats
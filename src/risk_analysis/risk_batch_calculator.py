@@ -0,0 +1,131 @@
+from typing import Iterable, List, Mapping, Sequence
+
+import numpy as np
+
+from .schemas.personal_information_schema import PersonalInformationSchema, OwnershipStatusEnum, MaritalStatusEnum
+from .risk_lookup_table import RiskLookupTable, HOUSE_STATUS_CODES, HOUSE_NONE, NO_VEHICLE
+
+# Integer codes used by the columnar representation
+HOUSE_OWNED = HOUSE_STATUS_CODES[OwnershipStatusEnum.owned]
+HOUSE_MORTGAGED = HOUSE_STATUS_CODES[OwnershipStatusEnum.mortgaged]
+
+_SUBJECT_COLUMNS = np.dtype([
+    ("age", np.int64),
+    ("dependents", np.int64),
+    ("income", np.int64),
+    ("house", np.int8),
+    ("married", bool),
+    ("vehicle_year", np.int64),
+    ("risk_answers", np.int64),
+])
+_INT64 = np.iinfo(np.int64)
+
+
+def house_code(subject: PersonalInformationSchema) -> int:
+    if subject.house is None:
+        return HOUSE_NONE
+    if subject.house.ownership_status == OwnershipStatusEnum.mortgaged:
+        return HOUSE_MORTGAGED
+    return HOUSE_OWNED
+
+
+def clip_columns(row: tuple) -> tuple:
+    """Clip the integers of a row to the int64 range of the columns.
+
+    The schema accepts integers of any size, but the columns are only compared with the cut points of the rules,
+    which are far inside the range, so a clipped value falls in the bucket of the original one.
+    """
+    return tuple(min(max(value, _INT64.min), _INT64.max) for value in row)
+
+
+def subject_columns(subject: PersonalInformationSchema) -> tuple:
+    """Return the column values of a subject, in the order of the BatchRiskCalculator columns."""
+    vehicle = subject.vehicle
+    return (
+        subject.age,
+        subject.dependents,
+        subject.income,
+        house_code(subject),
+        subject.marital_status == MaritalStatusEnum.married,
+        vehicle.year if vehicle is not None and vehicle.year is not None else NO_VEHICLE,
+        sum(subject.risk_questions),
+    )
+
+
+class BatchRiskCalculator:
+    """Columnar scoring of a whole population of subjects.
+
+    Every subject attribute is held as a NumPy vector. Scoring buckets the vectors with the cut
+    points of a RiskLookupTable and reads the outcomes from its table, so a batch applies the same
+    rule set as the single-subject path without a Python branch per subject.
+    """
+    age: np.ndarray
+    dependents: np.ndarray
+    income: np.ndarray
+    house: np.ndarray
+    married: np.ndarray
+    vehicle_year: np.ndarray
+    risk_answers: np.ndarray
+
+    def __init__(
+            self,
+            age: Sequence[int],
+            dependents: Sequence[int],
+            income: Sequence[int],
+            house: Sequence[int],
+            married: Sequence[bool],
+            vehicle_year: Sequence[int],
+            risk_answers: Sequence[int],
+    ) -> None:
+        self.age = np.asarray(age, dtype=np.int64)
+        self.dependents = np.asarray(dependents, dtype=np.int64)
+        self.income = np.asarray(income, dtype=np.int64)
+        self.house = np.asarray(house, dtype=np.int8)
+        self.married = np.asarray(married, dtype=bool)
+        self.vehicle_year = np.asarray(vehicle_year, dtype=np.int64)
+        self.risk_answers = np.asarray(risk_answers, dtype=np.int64)
+
+    @classmethod
+    def from_subjects(cls, subjects: Sequence[PersonalInformationSchema]) -> "BatchRiskCalculator":
+        """Build the columns in a single pass over the subjects."""
+        try:
+            return cls.from_rows(map(subject_columns, subjects), len(subjects))
+        except OverflowError:
+            return cls.from_rows([subject_columns(subject) for subject in subjects], len(subjects))
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple], count: int = -1) -> "BatchRiskCalculator":
+        """Build the columns from tuples ordered as the values of subject_columns.
+
+        Integers beyond the int64 range are clipped with clip_columns when rows is a sequence, an iterator holding
+        one raises OverflowError.
+        """
+        try:
+            rows = np.fromiter(rows, dtype=_SUBJECT_COLUMNS, count=count)
+        except OverflowError:
+            if iter(rows) is rows:
+                raise
+            rows = np.fromiter(map(clip_columns, rows), dtype=_SUBJECT_COLUMNS, count=count)
+        return cls(**{name: np.ascontiguousarray(rows[name]) for name in _SUBJECT_COLUMNS.names})
+
+    def __len__(self) -> int:
+        return len(self.age)
+
+    def calculate_indexes(self, lookup_table: RiskLookupTable) -> np.ndarray:
+        """Return the lookup table cell of every subject."""
+        return lookup_table.calculate_indexes(
+            self.age, self.dependents, self.income, self.house, self.married, self.vehicle_year, self.risk_answers,
+        )
+
+    def calculate_scores(self, lookup_table: RiskLookupTable) -> np.ndarray:
+        """Return an (n, 4) matrix of RISK_SCORE_CODES indexes, columns ordered as INSURANCE_LINES."""
+        return lookup_table.score_codes[self.calculate_indexes(lookup_table)]
+
+    def calculate_subject_scores(self, lookup_table: RiskLookupTable) -> List[Mapping]:
+        """Return one profile per subject, in input order.
+
+        Subjects with the same outcome share the read-only profile of their table cell, so a batch
+        of millions does not allocate millions of profiles.
+        """
+        table = lookup_table.table
+        return [table[index] for index in self.calculate_indexes(lookup_table).tolist()]
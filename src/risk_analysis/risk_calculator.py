@@ -1,18 +1,23 @@
-import datetime
+from typing import List
 
 from src.risk_analysis.schemas.personal_information_schema import PersonalInformationSchema, OwnershipStatusEnum, \
     MaritalStatusEnum
 
-from .schemas.risk_score import RiskProfile, RiskScoreEnum
+from .schemas.risk_score import INSURANCE_LINES, RiskProfile, RiskScoreEnum
 from .risk_analysis_constants import MAX_AGE_LIMIT, MIN_AGE_LIMIT, MIN_INCOME, MIN_INCOME_THRESHOLD
+from .risk_analysis_clock import current_year
+
+# Positions of the insurance lines in the fixed-size line scores
+AUTO, DISABILITY, HOME, LIFE = (INSURANCE_LINES.index(line) for line in ("auto", "disability", "home", "life"))
+INELIGIBLE_PROFILE = dict.fromkeys(INSURANCE_LINES, RiskScoreEnum.ineligible)
 
 
 class RiskCalculator:
+    __slots__ = ("subject",)
     subject: PersonalInformationSchema
 
     def __init__(self, subject: PersonalInformationSchema) -> None:
         self.subject = subject
-        pass
 
     def subject_has_mortgaged_house(self) -> bool:
         if self.subject.house is not None and self.subject.house.ownership_status == OwnershipStatusEnum.mortgaged:
@@ -44,8 +49,7 @@ class RiskCalculator:
         if self.subject.vehicle is None or self.subject.vehicle.year is None:
             return False
 
-        current_year = datetime.date.today().year
-        return (current_year - self.subject.vehicle.year) <= 5
+        return (current_year() - self.subject.vehicle.year) <= 5
 
     def subject_has_dependents(self) -> bool:
         return self.subject.dependents > 0
@@ -62,68 +66,60 @@ class RiskCalculator:
 
         return RiskScoreEnum.responsible
 
-    def parse_risk_profile(self, risk_profile: dict) -> dict:
+    def parse_risk_profile(self, risk_scores: List) -> dict:
         return {
-            "auto": self.get_risk_score(risk_profile["auto"]),
-            "disability": self.get_risk_score(risk_profile["disability"]),
-            "home": self.get_risk_score(risk_profile["home"]),
-            "life": self.get_risk_score(risk_profile["life"]),
+            "auto": self.get_risk_score(risk_scores[AUTO]),
+            "disability": self.get_risk_score(risk_scores[DISABILITY]),
+            "home": self.get_risk_score(risk_scores[HOME]),
+            "life": self.get_risk_score(risk_scores[LIFE]),
         }
 
     def calculate_subject_score(self) -> RiskProfile:
 
-        initial_risk_value = self.subject_risk_answers()
-        risk_profile = {
-            "auto": initial_risk_value,
-            "home": initial_risk_value,
-            "life": initial_risk_value,
-            "disability": initial_risk_value,
-        }
-
         if self.subject_check_income_min(MIN_INCOME) is not True:
-            risk_profile["auto"] = RiskScoreEnum.ineligible
-            risk_profile["home"] = RiskScoreEnum.ineligible
-            risk_profile["life"] = RiskScoreEnum.ineligible
-            risk_profile["disability"] = RiskScoreEnum.ineligible
-            return risk_profile
+            return INELIGIBLE_PROFILE.copy()
+
+        # Line scores indexed by AUTO, DISABILITY, HOME and LIFE
+        initial_risk_value = self.subject_risk_answers()
+        risk_scores = [initial_risk_value] * len(INSURANCE_LINES)
 
         if self.subject_check_income_min(MIN_INCOME_THRESHOLD) is not True:
-            risk_profile["auto"] -= 1
-            risk_profile["home"] -= 1
-            risk_profile["life"] -= 1
-            risk_profile["disability"] -= 1
+            risk_scores[AUTO] -= 1
+            risk_scores[HOME] -= 1
+            risk_scores[LIFE] -= 1
+            risk_scores[DISABILITY] -= 1
 
         if self.subject_has_mortgaged_house():
-            risk_profile["home"] += 1
-            risk_profile["disability"] -= 1
+            risk_scores[HOME] += 1
+            risk_scores[DISABILITY] -= 1
 
         if self.subject_has_dependents():
 
-            risk_profile["home"] += 1
-            risk_profile["disability"] += 1
+            risk_scores[HOME] += 1
+            risk_scores[DISABILITY] += 1
 
         if self.subject_is_married():
-            risk_profile["life"] += 1
-            risk_profile["disability"] -= 1
+            risk_scores[LIFE] += 1
+            risk_scores[DISABILITY] -= 1
 
         if self.subject_vehicle_age():
-            risk_profile["auto"] = risk_profile["auto"] + 1
+            risk_scores[AUTO] = risk_scores[AUTO] + 1
 
         if self.subject_age_range(MIN_AGE_LIMIT, MAX_AGE_LIMIT):
-            risk_profile["auto"] -= 1
-            risk_profile["home"] -= 1
-            risk_profile["life"] -= 1
-            risk_profile["disability"] -= 1
+            risk_scores[AUTO] -= 1
+            risk_scores[HOME] -= 1
+            risk_scores[LIFE] -= 1
+            risk_scores[DISABILITY] -= 1
 
         if self.subject_under_min_age(MIN_AGE_LIMIT):
 
-            risk_profile["auto"] -= 2
-            risk_profile["home"] -= 2
-            risk_profile["life"] -= 2
-            risk_profile["disability"] -= 2
+            risk_scores[AUTO] -= 2
+            risk_scores[HOME] -= 2
+            risk_scores[LIFE] -= 2
+            risk_scores[DISABILITY] -= 2
 
         if self.subject_over_max_age(MAX_AGE_LIMIT) is True:
-            risk_profile["disability"] = RiskScoreEnum.ineligible
-            risk_profile["life"] = RiskScoreEnum.ineligible
+            risk_scores[DISABILITY] = RiskScoreEnum.ineligible
+            risk_scores[LIFE] = RiskScoreEnum.ineligible
 
-        return self.parse_risk_profile(risk_profile)
+        return self.parse_risk_profile(risk_scores)
@@ -0,0 +1,413 @@
+import argparse
+import collections
+import concurrent.futures
+import csv
+import functools
+import itertools
+import json
+import mmap
+import os
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import orjson
+from pydantic import ValidationError
+
+from .schemas.personal_information_schema import PersonalInformationSchema, MaritalStatusEnum
+from .risk_batch_calculator import BatchRiskCalculator, subject_columns
+from .risk_lookup_table import RiskLookupTable, HOUSE_STATUS_CODES, HOUSE_NONE, NO_VEHICLE
+from .risk_analysis_fast_codec import VEHICLE_YEAR_MAX, VEHICLE_YEAR_MIN, subject_from_json
+from .risk_analysys_service import DEFAULT_LOOKUP_TABLE
+from .risk_arrow_scoring import is_nested, record_batch_columns
+
+FILE_FORMATS = ("csv", "ndjson", "parquet")
+# Columns of CSV and Parquet files, one row per subject
+SUBJECT_COLUMNS = ("age", "dependents", "income", "marital_status", "house", "vehicle_year",
+                   "risk_1", "risk_2", "risk_3")
+DEFAULT_CHUNK_BYTES = 8 * 1024 * 1024
+
+# Rows made of these plain values are scored without building a PersonalInformationSchema,
+# any other row goes through the schema so that it is coerced or rejected exactly as by the API
+_MARITAL_STATUSES = {status.value for status in MaritalStatusEnum}
+_CSV_HOUSE_CODES = {"": HOUSE_NONE, **{status.value: code for status, code in HOUSE_STATUS_CODES.items()}}
+_CSV_RISK_ANSWERS = {"0": 0, "1": 1}
+_SUBJECT_COLUMNS = set(SUBJECT_COLUMNS)
+
+# Scored chunk: its number of lines, then the line numbers and lookup table cells of its scored rows and the
+# line numbers and JSON validation errors of its rejected rows, lines numbered from 0 within the chunk
+ChunkResult = Tuple[int, np.ndarray, np.ndarray, List[Tuple[int, str]]]
+# Scoring statistics of one chunk: rows, then parse and score seconds
+ChunkStats = Tuple[int, float, float]
+
+
+def detect_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    if extension in ("jsonl", "ndjson"):
+        return "ndjson"
+    if extension in ("parquet", "pq"):
+        return "parquet"
+    return "csv"
+
+
+def split_byte_ranges(buffer, start: int, chunk_bytes: int) -> List[Tuple[int, int]]:
+    """Split buffer[start:] into ranges of about chunk_bytes, each one ending right after a newline."""
+    ranges = []
+    size = len(buffer)
+    while start < size:
+        end = buffer.find(b"\n", min(start + chunk_bytes, size) - 1)
+        end = size if end == -1 else end + 1
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def subject_from_columns(row: Dict[str, Optional[str]]) -> dict:
+    """Map a flat CSV or Parquet row to the fields of PersonalInformationSchema."""
+    house = row.get("house")
+    vehicle_year = row.get("vehicle_year")
+    return {
+        "age": row.get("age"),
+        "dependents": row.get("dependents"),
+        "house": {"ownership_status": house} if house not in (None, "") else None,
+        "income": row.get("income"),
+        "marital_status": row.get("marital_status"),
+        "risk_questions": [row.get("risk_1"), row.get("risk_2"), row.get("risk_3")],
+        "vehicle": {"year": vehicle_year} if vehicle_year not in (None, "") else None,
+    }
+
+
+def _csv_columns(row: Dict[str, str]) -> Optional[tuple]:
+    """Return the batch columns of a CSV row holding plain valid values, None when it needs validation."""
+    if len(row) < len(SUBJECT_COLUMNS) or not row.keys() >= _SUBJECT_COLUMNS:
+        return None
+    age, dependents, income = row["age"], row["dependents"], row["income"]
+    marital_status, house, vehicle_year = row["marital_status"], row["house"], row["vehicle_year"]
+    risk_questions = (row["risk_1"], row["risk_2"], row["risk_3"])
+    # str.isdigit is also true for other Unicode digits, such as "²", that int() rejects
+    if not all(value.isascii() and value.isdigit() for value in (age, dependents, income)):
+        return None
+    if marital_status not in _MARITAL_STATUSES or house not in _CSV_HOUSE_CODES:
+        return None
+    if vehicle_year:
+        if not (vehicle_year.isascii() and vehicle_year.isdigit()) or not VEHICLE_YEAR_MIN <= int(vehicle_year) < VEHICLE_YEAR_MAX:
+            return None
+        vehicle_year = int(vehicle_year)
+    else:
+        vehicle_year = NO_VEHICLE
+    if not all(answer in _CSV_RISK_ANSWERS for answer in risk_questions):
+        return None
+    return (
+        int(age), int(dependents), int(income), _CSV_HOUSE_CODES[house], marital_status == "married",
+        vehicle_year, sum(_CSV_RISK_ANSWERS[answer] for answer in risk_questions),
+    )
+
+
+def _read_text_rows(path: str, file_format: str, start: int, end: int,
+                    header: Optional[List[str]]) -> Tuple[int, Iterator[Tuple[int, object]]]:
+    """Return the number of lines of a byte range and its non-blank rows, numbered from 0."""
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        lines = buffer[start:end].decode().split("\n")
+    if file_format == "ndjson":
+        rows = ((line_number, line) for line_number, line in enumerate(lines) if line.strip())
+    else:
+        rows = ((line_number, dict(zip(header, values))) for line_number, values in enumerate(csv.reader(lines))
+                if values)
+    return len(lines) - 1, rows
+
+
+def _arrow_integers(column) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Return the values of an integer or boolean Arrow column with nulls as -1 and its non-null mask.
+
+    None when the column holds any other type, its rows are then left to the schema.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if pa.types.is_null(column.type):
+        return np.full(len(column), -1, dtype=np.int64), np.zeros(len(column), dtype=bool)
+    if not (pa.types.is_integer(column.type) or pa.types.is_boolean(column.type)):
+        return None
+    try:
+        values = pc.fill_null(column.cast(pa.int64()), -1).to_numpy()
+    except pa.ArrowInvalid:
+        return None  # Unsigned values out of the int64 range
+    return values, column.is_valid().to_numpy(zero_copy_only=False)
+
+
+def _arrow_strings(column) -> Optional[np.ndarray]:
+    """Return the values of a string Arrow column with nulls as "", None for any other type."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if pa.types.is_null(column.type):
+        return np.full(len(column), "", dtype=object)
+    if not (pa.types.is_string(column.type) or pa.types.is_large_string(column.type)):
+        return None
+    return pc.fill_null(column, "").to_numpy(zero_copy_only=False)
+
+
+def arrow_columns(table) -> Tuple[np.ndarray, BatchRiskCalculator]:
+    """Read the batch columns of the rows of an Arrow table holding plain valid values.
+
+    Returns the mask of those rows and their BatchRiskCalculator, built from the Arrow arrays without
+    a Python object per row. The other rows are left to PersonalInformationSchema.
+    """
+    import pyarrow as pa
+
+    size = table.num_rows
+    none = np.zeros(size, dtype=bool), BatchRiskCalculator([], [], [], [], [], [], [])
+    if not set(table.column_names) >= _SUBJECT_COLUMNS:
+        return none
+    # Booleans are only plain values for the risk answers, the schema decides for the other columns
+    if any(pa.types.is_boolean(table.schema.field(name).type)
+           for name in ("age", "dependents", "income", "vehicle_year")):
+        return none
+    integers = {name: _arrow_integers(table.column(name))
+                for name in ("age", "dependents", "income", "vehicle_year", "risk_1", "risk_2", "risk_3")}
+    marital_status = _arrow_strings(table.column("marital_status"))
+    house = _arrow_strings(table.column("house"))
+    if marital_status is None or house is None or any(column is None for column in integers.values()):
+        return none
+
+    plain = np.isin(marital_status, list(_MARITAL_STATUSES)) & np.isin(house, list(_CSV_HOUSE_CODES))
+    for name in ("age", "dependents", "income"):
+        values, valid = integers[name]
+        plain &= valid & (values >= 0)
+    vehicle_year, has_vehicle = integers["vehicle_year"]
+    plain &= ~has_vehicle | ((vehicle_year >= VEHICLE_YEAR_MIN) & (vehicle_year < VEHICLE_YEAR_MAX))
+    risk_answers = np.zeros(size, dtype=np.int64)
+    for name in ("risk_1", "risk_2", "risk_3"):
+        values, valid = integers[name]
+        plain &= valid & ((values == 0) | (values == 1))
+        risk_answers += values
+
+    house_codes = np.zeros(size, dtype=np.int8)
+    for status, code in _CSV_HOUSE_CODES.items():
+        house_codes[house == status] = code
+    return plain, BatchRiskCalculator(
+        integers["age"][0][plain],
+        integers["dependents"][0][plain],
+        integers["income"][0][plain],
+        house_codes[plain],
+        (marital_status == "married")[plain],
+        np.where(has_vehicle, vehicle_year, NO_VEHICLE)[plain],
+        risk_answers[plain],
+    )
+
+
+def _read_parquet_rows(path: str, row_group: int) -> Tuple[int, np.ndarray, BatchRiskCalculator,
+                                                         Iterator[Tuple[int, object]]]:
+    """Return the number of rows of a row group, the columns of its plain rows and its other rows.
+
+    Row groups of subjects shaped like the API requests are read by record_batch_columns, the other rows of both
+    layouts are returned with the fields of PersonalInformationSchema.
+    """
+    import pyarrow.parquet as pq
+
+    table = pq.ParquetFile(path, memory_map=True).read_row_group(row_group)
+    nested = is_nested(table.schema)
+    plain, calculator = record_batch_columns(table) if nested else arrow_columns(table)
+    other_lines = np.flatnonzero(~plain)
+    rows = iter(())
+    if len(other_lines):
+        other_rows = table.take(other_lines).to_pylist()
+        rows = zip(other_lines.tolist(), other_rows if nested else map(subject_from_columns, other_rows))
+    return table.num_rows, np.flatnonzero(plain), calculator, rows
+
+
+@functools.lru_cache(maxsize=None)
+def _profile_lines(lookup_table: RiskLookupTable) -> List[str]:
+    return [json.dumps(dict(profile)) for profile in lookup_table.table]
+
+
+def read_chunk_columns(path: str, file_format: str, start: int, end: int, header: Optional[List[str]] = None
+                       ) -> Tuple[int, List[Tuple[np.ndarray, BatchRiskCalculator]], List[Tuple[int, str]]]:
+    """Read the batch columns of the valid rows of one chunk of the input file.
+
+    For CSV and NDJSON files the chunk is the byte range [start, end) of the memory-mapped
+    file, for Parquet files it is the row group `start`. Returns the number of lines of the chunk,
+    the line numbers and columns of its valid rows, in one or more parts, and the line numbers and
+    JSON validation errors of its other rows. Lines are numbered from 0 within the chunk, as the
+    chunk does not know how many lines come before it.
+    """
+    parts = []
+    if file_format == "parquet":
+        line_count, plain_lines, plain_calculator, rows = _read_parquet_rows(path, start)
+        parts.append((plain_lines, plain_calculator))
+    else:
+        line_count, rows = _read_text_rows(path, file_format, start, end, header)
+
+    line_numbers = []
+    columns = []
+    errors = []
+    for line_number, row in rows:
+        values = None
+        if file_format == "ndjson":
+            try:
+                row = orjson.loads(row)
+            except ValueError:
+                pass  # Reported by parse_raw with the error of the API
+            else:
+                subject = subject_from_json(row)
+                values = subject_columns(subject) if subject is not None else None
+        elif file_format == "csv":
+            values = _csv_columns(row)
+
+        if values is None:
+            try:
+                if isinstance(row, str):
+                    subject = PersonalInformationSchema.parse_raw(row)
+                elif file_format in ("ndjson", "parquet"):
+                    subject = PersonalInformationSchema.parse_obj(row)
+                else:
+                    subject = PersonalInformationSchema.parse_obj(subject_from_columns(row))
+            except ValidationError as error:
+                errors.append((line_number, json.dumps(error.errors())))
+                continue
+            values = subject_columns(subject)
+        line_numbers.append(line_number)
+        columns.append(values)
+    parts.append((np.asarray(line_numbers, dtype=np.int64), BatchRiskCalculator.from_rows(columns, len(columns))))
+    return line_count, parts, errors
+
+
+def score_chunk(path: str, file_format: str, start: int, end: int, header: Optional[List[str]] = None,
+                lookup_table: RiskLookupTable = DEFAULT_LOOKUP_TABLE) -> Tuple[ChunkResult, ChunkStats]:
+    """Score one chunk of the input file, returning the lookup table cells of its rows and statistics."""
+    started = time.perf_counter()
+    line_count, parts, errors = read_chunk_columns(path, file_format, start, end, header)
+    parsed = time.perf_counter()
+
+    line_numbers = np.concatenate([lines for lines, _ in parts])
+    indexes = np.concatenate([calculator.calculate_indexes(lookup_table) for _, calculator in parts])
+    order = np.argsort(line_numbers, kind="stable")
+    scored = time.perf_counter()
+
+    result = (line_count, line_numbers[order], indexes[order], errors)
+    return result, (len(line_numbers) + len(errors), parsed - started, scored - parsed)
+
+
+def encode_chunk(result: ChunkResult, first_line: int, lookup_table: RiskLookupTable = DEFAULT_LOOKUP_TABLE) -> bytes:
+    """Encode the NDJSON records of a scored chunk whose first line is first_line."""
+    _, line_numbers, indexes, errors = result
+    profiles = _profile_lines(lookup_table)
+    records = [f'{{"line": {line_number}, "profile": {profiles[index]}}}\n'
+               for line_number, index in zip((line_numbers + first_line).tolist(), indexes.tolist())]
+    if errors:
+        records = [record for _, record in sorted(itertools.chain(
+            zip(line_numbers.tolist(), records),
+            ((line_number, f'{{"line": {first_line + line_number}, "detail": {detail}}}\n')
+             for line_number, detail in errors),
+        ))]
+    return "".join(records).encode()
+
+
+def plan_chunks(path: str, file_format: str, chunk_bytes: int) -> List[tuple]:
+    """Return the score_chunk arguments of every chunk of the file, in input order."""
+    if file_format == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet input requires pyarrow, install it with `pip install pyarrow`")
+        return [(path, file_format, row_group, row_group, None)
+                for row_group in range(pq.ParquetFile(path).metadata.num_row_groups)]
+
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            header = None
+            start = 0
+            if file_format == "csv":
+                start = buffer.find(b"\n") + 1 or len(buffer)
+                header = next(csv.reader([buffer[:start].decode().strip()]))
+                missing = set(SUBJECT_COLUMNS) - set(header)
+                if missing:
+                    raise ValueError(f"CSV header is missing the columns: {', '.join(sorted(missing))}")
+            ranges = split_byte_ranges(buffer, start, chunk_bytes)
+    return [(path, file_format, range_start, range_end, header) for range_start, range_end in ranges]
+
+
+def score_file(path: str, output, file_format: Optional[str] = None, workers: Optional[int] = None,
+               chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> dict:
+    """Score every subject of a CSV, NDJSON or Parquet file, writing NDJSON records in input order.
+
+    The file is split into chunks scored in parallel by a pool of processes. At most two chunks
+    per worker are in flight, so memory stays bounded when the output is slower than the workers.
+    Chunks are numbered, encoded and written in input order as soon as they and every chunk before
+    them are done.
+    """
+    file_format = file_format or detect_format(path)
+    workers = workers or os.cpu_count() or 1
+    stats = {"rows": 0, "parse": 0.0, "score": 0.0, "encode": 0.0, "write": 0.0}
+
+    started = time.perf_counter()
+    # Looked up here, so that importing the module does not import multiprocessing
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = plan_chunks(path, file_format, chunk_bytes)
+        stats["split"] = time.perf_counter() - started
+
+        first_line = 2 if file_format == "csv" else 1
+        remaining = iter(chunks)
+        in_flight = collections.deque(
+            executor.submit(score_chunk, *chunk) for chunk in itertools.islice(remaining, 2 * workers)
+        )
+        while in_flight:
+            result, (rows, parse, score) = in_flight.popleft().result()
+            chunk = next(remaining, None)
+            if chunk is not None:
+                in_flight.append(executor.submit(score_chunk, *chunk))
+
+            encode_started = time.perf_counter()
+            data = encode_chunk(result, first_line)
+            first_line += result[0]
+            write_started = time.perf_counter()
+            output.write(data)
+            stats["encode"] += write_started - encode_started
+            stats["write"] += time.perf_counter() - write_started
+            stats["rows"] += rows
+            stats["parse"] += parse
+            stats["score"] += score
+    stats["total"] = time.perf_counter() - started
+    stats["chunks"] = len(chunks)
+    stats["workers"] = workers
+    return stats
+
+
+def format_stats(stats: dict) -> str:
+    return "\n".join([
+        f"rows:      {stats['rows']}",
+        f"chunks:    {stats['chunks']} on {stats['workers']} workers",
+        f"rows/sec:  {stats['rows'] / stats['total']:.0f}" if stats["total"] else "rows/sec:  -",
+        f"split:     {stats['split']:.3f} s",
+        # Parsing and scoring run in the workers, their times are summed over all chunks
+        f"parse:     {stats['parse']:.3f} s (cpu, all workers)",
+        f"score:     {stats['score']:.3f} s (cpu, all workers)",
+        f"encode:    {stats['encode']:.3f} s",
+        f"write:     {stats['write']:.3f} s",
+        f"total:     {stats['total']:.3f} s",
+    ])
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Score a CSV, NDJSON or Parquet file of subjects.")
+    parser.add_argument("input", help="file of subjects, its format is detected from the extension")
+    parser.add_argument("-o", "--output", help="NDJSON file of risk profiles, standard output by default")
+    parser.add_argument("--format", choices=FILE_FORMATS, help="input format, overriding the file extension")
+    parser.add_argument("--workers", type=int, help="number of scoring processes, one per core by default")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_BYTES // 1024,
+                        help="size in KiB of the byte ranges scored by each task")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.output:
+            with open(args.output, "wb") as output:
+                stats = score_file(args.input, output, args.format, args.workers, args.chunk_size * 1024)
+        else:
+            stats = score_file(args.input, sys.stdout.buffer, args.format, args.workers, args.chunk_size * 1024)
+            sys.stdout.buffer.flush()
+    except ValueError as error:
+        parser.error(str(error))
+    print(format_stats(stats), file=sys.stderr)
@@ -0,0 +1,190 @@
+import itertools
+import types
+from bisect import bisect_right
+from typing import List, Mapping, Sequence, Tuple
+
+import numpy as np
+
+from .schemas.personal_information_schema import PersonalInformationSchema, HouseSchema, VehicleSchema, \
+    MaritalStatusEnum, OwnershipStatusEnum
+from .schemas.risk_score import INSURANCE_LINES, RISK_SCORE_CODES, RiskScoreEnum
+from .schemas.rule_schema import RuleFeatureEnum, RuleOperatorEnum, RuleSetSchema
+from .risk_rule_engine import RuleEngine
+from .risk_analysis_clock import current_year
+
+# Features whose value is compared against thresholds, bucketed by the cut points of the rule set
+NUMERIC_FEATURES = [
+    RuleFeatureEnum.age,
+    RuleFeatureEnum.dependents,
+    RuleFeatureEnum.income,
+    RuleFeatureEnum.vehicle_age,
+]
+RISK_ANSWERS_EDGES = [1, 2, 3]
+MARITAL_STATUS_CODES = {status: code for code, status in enumerate(MaritalStatusEnum)}
+HOUSE_STATUS_CODES = {status: code for code, status in enumerate(OwnershipStatusEnum, start=1)}
+# Integer codes of the columnar representation for subjects without a house or a vehicle
+HOUSE_NONE = 0
+NO_VEHICLE = 0
+
+
+def feature_edges(rule_set: RuleSetSchema, feature: RuleFeatureEnum) -> List[int]:
+    """Return the sorted cut points of a numeric feature.
+
+    Values between two consecutive cut points satisfy exactly the same conditions of the
+    rule set, so the subject outcome only depends on the bucket the value falls into.
+    """
+    edges = set()
+    for rule in rule_set.rules:
+        for condition in rule.conditions:
+            if condition.feature != feature:
+                continue
+            if condition.operator in (RuleOperatorEnum.lt, RuleOperatorEnum.ge):
+                edges.add(condition.value)
+            elif condition.operator in (RuleOperatorEnum.le, RuleOperatorEnum.gt):
+                edges.add(condition.value + 1)
+            else:
+                edges.update((condition.value, condition.value + 1))
+    return sorted(edges)
+
+
+def bucket_representatives(edges: List[int]) -> List[int]:
+    """Return the lowest value of every bucket, the first bucket being represented by the value below its cut point."""
+    if not edges:
+        return [0]
+    return [edges[0] - 1] + edges
+
+
+class RiskLookupTable:
+    """Scores subjects by indexing a table precomputed over the whole bucketed feature space.
+
+    The table is enumerated once from a RuleEngine: every combination of feature buckets is
+    scored through a representative subject, so a request only costs its bucketing and one index.
+    """
+    rule_engine: RuleEngine
+    version: str
+
+    def __init__(self, rule_engine: RuleEngine) -> None:
+        self.rule_engine = rule_engine
+        self.version = rule_engine.version
+        self.edges = {feature: feature_edges(rule_engine.rule_set, feature) for feature in NUMERIC_FEATURES}
+
+        age_values = bucket_representatives(self.edges[RuleFeatureEnum.age])
+        dependents_values = bucket_representatives(self.edges[RuleFeatureEnum.dependents])
+        income_values = bucket_representatives(self.edges[RuleFeatureEnum.income])
+        # The first vehicle bucket stands for subjects without a vehicle
+        vehicle_age_values = [None] + bucket_representatives(self.edges[RuleFeatureEnum.vehicle_age])
+        marital_status_values = list(MARITAL_STATUS_CODES)
+        house_status_values = [None] + list(HOUSE_STATUS_CODES)
+        risk_answers_values = [0] + RISK_ANSWERS_EDGES
+
+        self.shape = (
+            len(age_values),
+            len(dependents_values),
+            len(income_values),
+            len(vehicle_age_values),
+            len(marital_status_values),
+            len(house_status_values),
+            len(risk_answers_values),
+        )
+        year = current_year()
+        representatives = [
+            self._representative_subject(year, *values)
+            for values in itertools.product(
+                age_values,
+                dependents_values,
+                income_values,
+                vehicle_age_values,
+                marital_status_values,
+                house_status_values,
+                risk_answers_values,
+            )
+        ]
+        # Cells are shared by every subject of the bucket, so they are read-only views
+        self.table: List[Mapping[str, RiskScoreEnum]] = [
+            types.MappingProxyType(rule_engine.calculate_subject_score(subject)) for subject in representatives
+        ]
+        self.fired_rules: List[Tuple[str, ...]] = [
+            tuple(rule_engine.fired_rules(subject)) for subject in representatives
+        ]
+        self.score_codes = np.array(
+            [[RISK_SCORE_CODES.index(profile[line]) for line in INSURANCE_LINES] for profile in self.table],
+            dtype=np.int8,
+        )
+
+        _, dependents_size, income_size, vehicle_size, marital_size, house_size, risk_size = self.shape
+        house_stride = risk_size
+        marital_stride = house_size * house_stride
+        vehicle_stride = marital_size * marital_stride
+        income_stride = vehicle_size * vehicle_stride
+        dependents_stride = income_size * income_stride
+        age_stride = dependents_size * dependents_stride
+        self.strides = (age_stride, dependents_stride, income_stride, vehicle_stride, marital_stride, house_stride, 1)
+        self.calculate_subject_score = self._compile(self.table)
+        self.calculate_subject_index = self._compile(range(len(self.table)))
+
+    @staticmethod
+    def _representative_subject(year, age, dependents, income, vehicle_age, marital_status, house_status,
+                                risk_answers) -> PersonalInformationSchema:
+        # Representatives are built without validation: bucket bounds may sit outside the accepted range
+        return PersonalInformationSchema.construct(
+            age=age,
+            dependents=dependents,
+            house=HouseSchema.construct(ownership_status=house_status) if house_status is not None else None,
+            income=income,
+            marital_status=marital_status,
+            risk_questions=[True] * risk_answers + [False] * (3 - risk_answers),
+            vehicle=VehicleSchema.construct(year=year - vehicle_age) if vehicle_age is not None else None,
+        )
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def _compile(self, cells: Sequence):
+        """Return a function bucketing one subject and reading its cell out of cells."""
+        age_edges = self.edges[RuleFeatureEnum.age]
+        dependents_edges = self.edges[RuleFeatureEnum.dependents]
+        income_edges = self.edges[RuleFeatureEnum.income]
+        vehicle_age_edges = self.edges[RuleFeatureEnum.vehicle_age]
+        age_stride, dependents_stride, income_stride, vehicle_stride, marital_stride, house_stride, _ = self.strides
+
+        def lookup(subject: PersonalInformationSchema):
+            house = subject.house
+            vehicle = subject.vehicle
+            index = (
+                bisect_right(age_edges, subject.age) * age_stride
+                + bisect_right(dependents_edges, subject.dependents) * dependents_stride
+                + bisect_right(income_edges, subject.income) * income_stride
+                + MARITAL_STATUS_CODES[subject.marital_status] * marital_stride
+                + bisect_right(RISK_ANSWERS_EDGES, sum(subject.risk_questions))
+            )
+            if house is not None:
+                index += HOUSE_STATUS_CODES[house.ownership_status] * house_stride
+            if vehicle is not None and vehicle.year is not None:
+                index += (1 + bisect_right(vehicle_age_edges, current_year() - vehicle.year)) * vehicle_stride
+            return cells[index]
+
+        return lookup
+
+    def calculate_indexes(self, age: np.ndarray, dependents: np.ndarray, income: np.ndarray, house: np.ndarray,
+                          married: np.ndarray, vehicle_year: np.ndarray, risk_answers: np.ndarray) -> np.ndarray:
+        """Return the table cell of every subject of a columnar batch.
+
+        Columns use the codes of HOUSE_STATUS_CODES (HOUSE_NONE without a house) and NO_VEHICLE as vehicle year
+        without a vehicle. The buckets are found with np.searchsorted, mirroring bisect_right on a single subject.
+        """
+        age_stride, dependents_stride, income_stride, vehicle_stride, marital_stride, house_stride, _ = self.strides
+        vehicle_age = current_year() - vehicle_year
+        vehicle_bucket = np.where(
+            vehicle_year == NO_VEHICLE,
+            0,
+            1 + np.searchsorted(self.edges[RuleFeatureEnum.vehicle_age], vehicle_age, side="right"),
+        )
+        return (
+            np.searchsorted(self.edges[RuleFeatureEnum.age], age, side="right") * age_stride
+            + np.searchsorted(self.edges[RuleFeatureEnum.dependents], dependents, side="right") * dependents_stride
+            + np.searchsorted(self.edges[RuleFeatureEnum.income], income, side="right") * income_stride
+            + vehicle_bucket * vehicle_stride
+            + married.astype(np.intp) * MARITAL_STATUS_CODES[MaritalStatusEnum.married] * marital_stride
+            + house.astype(np.intp) * house_stride
+            + np.searchsorted(RISK_ANSWERS_EDGES, risk_answers, side="right")
+        )
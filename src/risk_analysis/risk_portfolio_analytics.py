@@ -0,0 +1,262 @@
+import argparse
+import concurrent.futures
+import json
+import os
+import sys
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import ValidationError
+
+from .schemas.personal_information_schema import PersonalInformationSchema
+from .schemas.risk_score import INSURANCE_LINES, RISK_SCORE_CODES
+from .risk_batch_calculator import BatchRiskCalculator, subject_columns
+from .risk_lookup_table import RiskLookupTable, HOUSE_NONE, HOUSE_STATUS_CODES, NO_VEHICLE
+from .risk_analysis_constants import MAX_AGE_LIMIT, MIN_AGE_LIMIT, MIN_INCOME, MIN_INCOME_THRESHOLD
+from .risk_analysis_fast_codec import VEHICLE_YEAR_MAX, VEHICLE_YEAR_MIN
+from .risk_file_scoring import DEFAULT_CHUNK_BYTES, FILE_FORMATS, SUBJECT_COLUMNS, detect_format, plan_chunks, \
+    read_chunk_columns, subject_from_columns
+from .risk_analysys_service import DEFAULT_LOOKUP_TABLE
+
+# Lowest value of every band but the first, the rule thresholds being band boundaries
+DEFAULT_AGE_BAND_EDGES = (MIN_AGE_LIMIT, 40, 50, MAX_AGE_LIMIT + 1)
+DEFAULT_INCOME_BAND_EDGES = (MIN_INCOME + 1, 50000, 100000, MIN_INCOME_THRESHOLD)
+GROUP_BY_FIELDS = ("age_band", "income_band", "marital_status")
+MARITAL_STATUSES = ("single", "married")
+# Codes of the plain values of the string columns, a missing house being null or ""
+MARITAL_STATUS_CODES = {status: code for code, status in enumerate(MARITAL_STATUSES)}
+HOUSE_CODES = {None: HOUSE_NONE, "": HOUSE_NONE, **{status.value: code for status, code in HOUSE_STATUS_CODES.items()}}
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+
+def band_labels(edges: Sequence[int]) -> List[str]:
+    """Labels of the bands split by edges, from 0: "0-29", "30-39", ..., "61+"."""
+    bounds = [0, *edges]
+    labels = [str(low) if low == high - 1 else f"{low}-{high - 1}" for low, high in zip(bounds, bounds[1:])]
+    return labels + [f"{bounds[-1]}+"]
+
+
+class PortfolioAnalytics:
+    """Distribution of the risk scores of a population, per insurance line and group of subjects.
+
+    Subjects are added in chunks of batch columns. A chunk is scored with the lookup table and its subjects are
+    counted per age band, income band, marital status and table cell with a single np.bincount, so the state is a
+    fixed array of counts whatever the number of subjects. The score histograms are read from the cell counts
+    when the report is built.
+    """
+    lookup_table: RiskLookupTable
+    age_edges: np.ndarray
+    income_edges: np.ndarray
+
+    def __init__(self, lookup_table: RiskLookupTable = DEFAULT_LOOKUP_TABLE,
+                 age_edges: Sequence[int] = DEFAULT_AGE_BAND_EDGES,
+                 income_edges: Sequence[int] = DEFAULT_INCOME_BAND_EDGES) -> None:
+        self.lookup_table = lookup_table
+        self.age_edges = np.asarray(age_edges, dtype=np.int64)
+        self.income_edges = np.asarray(income_edges, dtype=np.int64)
+        self.shape = (len(age_edges) + 1, len(income_edges) + 1, len(MARITAL_STATUSES), len(lookup_table))
+        self.counts = np.zeros(self.shape, dtype=np.int64)
+        self.rejected = 0
+
+    def add(self, calculator: BatchRiskCalculator) -> None:
+        """Count the subjects of a chunk of batch columns."""
+        _, income_size, marital_size, cells_size = self.shape
+        group = (
+            np.searchsorted(self.age_edges, calculator.age, side="right") * income_size
+            + np.searchsorted(self.income_edges, calculator.income, side="right")
+        ) * marital_size + calculator.married
+        keys = group * cells_size + calculator.calculate_indexes(self.lookup_table)
+        self.counts += np.bincount(keys, minlength=self.counts.size).reshape(self.shape)
+
+    def merge(self, counts: np.ndarray, rejected: int = 0) -> None:
+        """Add the counts of another PortfolioAnalytics with the same table and bands, e.g. of another process."""
+        self.counts += counts
+        self.rejected += rejected
+
+    def histograms(self, group_by: Sequence[str] = GROUP_BY_FIELDS) -> dict:
+        """Score counts per line, in total and per group of the group_by fields, skipping empty groups."""
+        unknown = set(group_by) - set(GROUP_BY_FIELDS)
+        if unknown:
+            raise ValueError(f"unknown group_by fields: {', '.join(sorted(unknown))}")
+        group_by = [field for field in GROUP_BY_FIELDS if field in group_by]
+        score_codes = self.lookup_table.score_codes
+        # One-hot encoding of the score of every cell and line
+        scores = np.zeros((len(self.lookup_table), len(INSURANCE_LINES), len(RISK_SCORE_CODES)), dtype=np.int64)
+        scores[np.arange(len(score_codes))[:, None], np.arange(len(INSURANCE_LINES)), score_codes] = 1
+        rows = self.counts.sum(axis=3)
+        histograms = np.tensordot(self.counts, scores, axes=([3], [0]))
+
+        dropped = tuple(axis for axis, field in enumerate(GROUP_BY_FIELDS) if field not in group_by)
+        rows = rows.sum(axis=dropped)
+        histograms = histograms.sum(axis=dropped)
+        labels = {
+            "age_band": band_labels(self.age_edges.tolist()),
+            "income_band": band_labels(self.income_edges.tolist()),
+            "marital_status": list(MARITAL_STATUSES),
+        }
+        groups = []
+        for group in zip(*np.nonzero(rows)) if group_by else []:
+            group_histograms = histograms[group]
+            groups.append({
+                **{field: labels[field][bucket] for field, bucket in zip(group_by, group)},
+                "rows": int(rows[group]),
+                "lines": line_histograms(group_histograms),
+            })
+        totals = histograms.reshape(-1, len(INSURANCE_LINES), len(RISK_SCORE_CODES)).sum(axis=0)
+        return {
+            "rows": int(self.counts.sum()),
+            "rejected": self.rejected,
+            "group_by": group_by,
+            "lines": line_histograms(totals),
+            "groups": groups,
+        }
+
+
+def line_histograms(counts: np.ndarray) -> Dict[str, Dict[str, int]]:
+    return {
+        line: {score.value: int(count) for score, count in zip(RISK_SCORE_CODES, line_counts)}
+        for line, line_counts in zip(INSURANCE_LINES, counts.tolist())
+    }
+
+
+def _json_integers(values: list) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Return the values of a JSON integer column with nulls as -1 and its non-null mask.
+
+    None when the column holds any other type, its rows are then left to the schema.
+    """
+    if None in values:
+        valid = np.fromiter((value is not None for value in values), dtype=bool, count=len(values))
+        values = [-1 if value is None else value for value in values]
+    else:
+        valid = np.ones(len(values), dtype=bool)
+    try:
+        array = np.array(values)
+    except ValueError:
+        return None  # Nested arrays of different lengths
+    if array.ndim == 1 and array.dtype.kind in "uO" and all(isinstance(value, int) for value in values):
+        # Integers beyond int64 are clipped, they stay in the bucket of their value, see clip_columns
+        info = np.iinfo(np.int64)
+        array = np.array([min(max(value, info.min), info.max) for value in values], dtype=np.int64)
+    if array.ndim != 1 or array.dtype.kind not in "iub":
+        return None
+    return array.astype(np.int64), valid
+
+
+def _json_codes(values: list, codes: Mapping[Optional[str], int]) -> Optional[np.ndarray]:
+    """Return the codes of the values of a JSON string column, -1 for any other value, None when one is a container."""
+    try:
+        return np.fromiter((codes.get(value, -1) for value in values), dtype=np.int8, count=len(values))
+    except TypeError:
+        return None
+
+
+def json_columns(columns: Mapping[str, list], start: int, end: int) -> Tuple[np.ndarray, BatchRiskCalculator]:
+    """Read the batch columns of the rows [start, end) of a columnar JSON dataset holding plain valid values.
+
+    Returns the mask of those rows and their BatchRiskCalculator. The other rows are left to
+    PersonalInformationSchema.
+    """
+    size = end - start
+    none = np.zeros(size, dtype=bool), BatchRiskCalculator([], [], [], [], [], [], [])
+    integers = {name: _json_integers(columns[name][start:end])
+                for name in ("age", "dependents", "income", "vehicle_year", "risk_1", "risk_2", "risk_3")}
+    marital_status = _json_codes(columns["marital_status"][start:end], MARITAL_STATUS_CODES)
+    house = _json_codes(columns["house"][start:end], HOUSE_CODES)
+    if marital_status is None or house is None or any(column is None for column in integers.values()):
+        return none
+    married = marital_status == 1
+    plain = (marital_status >= 0) & (house >= 0)
+    for name in ("age", "dependents", "income"):
+        values, valid = integers[name]
+        plain &= valid & (values >= 0)
+    vehicle_year, has_vehicle = integers["vehicle_year"]
+    plain &= ~has_vehicle | ((vehicle_year >= VEHICLE_YEAR_MIN) & (vehicle_year < VEHICLE_YEAR_MAX))
+    risk_answers = np.zeros(size, dtype=np.int64)
+    for name in ("risk_1", "risk_2", "risk_3"):
+        values, valid = integers[name]
+        plain &= valid & ((values == 0) | (values == 1))
+        risk_answers += values
+
+    return plain, BatchRiskCalculator(
+        integers["age"][0][plain],
+        integers["dependents"][0][plain],
+        integers["income"][0][plain],
+        house[plain],
+        married[plain],
+        np.where(has_vehicle, vehicle_year, NO_VEHICLE)[plain],
+        risk_answers[plain],
+    )
+
+
+def analyze_columns(analytics: PortfolioAnalytics, columns: Mapping[str, list],
+                    chunk_rows: int = DEFAULT_CHUNK_ROWS) -> None:
+    """Add the rows of a columnar JSON dataset to analytics, chunk_rows at a time."""
+    size = len(columns[SUBJECT_COLUMNS[0]]) if columns else 0
+    for start in range(0, size, chunk_rows):
+        end = min(start + chunk_rows, size)
+        plain, calculator = json_columns(columns, start, end)
+        analytics.add(calculator)
+        other_rows = []
+        for row in np.flatnonzero(~plain).tolist():
+            try:
+                subject = PersonalInformationSchema.parse_obj(
+                    subject_from_columns({name: columns[name][start + row] for name in SUBJECT_COLUMNS})
+                )
+            except ValidationError:
+                analytics.rejected += 1
+                continue
+            other_rows.append(subject_columns(subject))
+        analytics.add(BatchRiskCalculator.from_rows(other_rows, len(other_rows)))
+
+
+def analyze_chunk(path: str, file_format: str, start: int, end: int, header: Optional[List[str]],
+                  age_edges: Sequence[int], income_edges: Sequence[int]) -> Tuple[np.ndarray, int]:
+    """Counts and rejected rows of one chunk of a file, see read_chunk_columns."""
+    analytics = PortfolioAnalytics(DEFAULT_LOOKUP_TABLE, age_edges, income_edges)
+    _, parts, errors = read_chunk_columns(path, file_format, start, end, header)
+    for _, calculator in parts:
+        analytics.add(calculator)
+    return analytics.counts, len(errors)
+
+
+def analyze_file(path: str, file_format: Optional[str] = None, workers: Optional[int] = None,
+                 chunk_bytes: int = DEFAULT_CHUNK_BYTES, age_edges: Sequence[int] = DEFAULT_AGE_BAND_EDGES,
+                 income_edges: Sequence[int] = DEFAULT_INCOME_BAND_EDGES) -> PortfolioAnalytics:
+    """Count the subjects of a CSV, NDJSON or Parquet file, split in the chunks of the file scoring.
+
+    Chunks are counted in parallel by a pool of processes, each returning its fixed array of counts, so memory
+    is bounded by the chunk size and the number of workers whatever the size of the file.
+    """
+    file_format = file_format or detect_format(path)
+    workers = workers or os.cpu_count() or 1
+    analytics = PortfolioAnalytics(DEFAULT_LOOKUP_TABLE, age_edges, income_edges)
+    chunks = plan_chunks(path, file_format, chunk_bytes)
+    # Looked up here, so that importing the module does not import multiprocessing
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        for counts, rejected in executor.map(
+                analyze_chunk, *zip(*chunks), [age_edges] * len(chunks), [income_edges] * len(chunks)):
+            analytics.merge(counts, rejected)
+    return analytics
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Report the risk scores of a CSV, NDJSON or Parquet file per group.")
+    parser.add_argument("input", help="file of subjects, its format is detected from the extension")
+    parser.add_argument("--format", choices=FILE_FORMATS, help="input format, overriding the file extension")
+    parser.add_argument("--group-by", nargs="*", choices=GROUP_BY_FIELDS, default=list(GROUP_BY_FIELDS))
+    parser.add_argument("--age-bands", type=int, nargs="+", default=list(DEFAULT_AGE_BAND_EDGES),
+                        help="lowest age of every band but the first")
+    parser.add_argument("--income-bands", type=int, nargs="+", default=list(DEFAULT_INCOME_BAND_EDGES),
+                        help="lowest income of every band but the first")
+    parser.add_argument("--workers", type=int, help="number of processes, one per core by default")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_BYTES // 1024,
+                        help="size in KiB of the byte ranges counted by each task")
+    args = parser.parse_args(argv)
+
+    try:
+        analytics = analyze_file(args.input, args.format, args.workers, args.chunk_size * 1024,
+                                 sorted(args.age_bands), sorted(args.income_bands))
+    except ValueError as error:
+        parser.error(str(error))
+    json.dump(analytics.histograms(args.group_by), sys.stdout, indent=2)
+    print()
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import os
+from typing import Optional, Tuple
+
+from .schemas.rule_schema import RuleSetSchema
+from .risk_rule_engine import RuleEngine
+from .risk_lookup_table import RiskLookupTable
+from .risk_analysys_service import RiskAnalysisService
+
+logger = logging.getLogger(__name__)
+
+# Modification time and size of a file, None while it does not exist
+FileSignature = Optional[Tuple[int, int]]
+
+
+def file_signature(path: str) -> FileSignature:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_lookup_table(path: str) -> RiskLookupTable:
+    """Validate the JSON rule set of a file and compile it into its lookup table.
+
+    Raises ValidationError when the file is not a valid RuleSetSchema.
+    """
+    return RiskLookupTable(RuleEngine(RuleSetSchema.parse_file(path)))
+
+
+class RuleSetReloader:
+    """Replaces the rule set of a service whenever its file changes, without stopping the requests.
+
+    A background task polls the modification time and size of the file every interval seconds. A changed file
+    is validated and its lookup table built on an executor thread, so the event loop keeps answering with the
+    current rule set meanwhile, then the table is swapped on the event loop. A rule set that fails to load, or
+    that keeps the version already served, is logged and counted as failed and the current one stays in place.
+    Rule set files should be replaced atomically, e.g. written next to their path then renamed over it.
+    """
+    path: str
+    interval: float
+
+    def __init__(self, service: RiskAnalysisService, path: str, interval: float = 1.0) -> None:
+        self.service = service
+        self.path = path
+        self.interval = interval
+        self.signature = file_signature(path)
+        self.task: Optional[asyncio.Task] = None
+        self.reloads = 0
+        self.failures = 0
+
+    async def start(self) -> None:
+        self.task = asyncio.create_task(self._watch())
+
+    async def close(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+    async def check(self) -> bool:
+        """Load the file when it changed since the last check, returning whether its rule set was swapped in"""
+        signature = file_signature(self.path)
+        if signature is None or signature == self.signature:
+            return False
+        self.signature = signature
+        try:
+            lookup_table = await asyncio.get_running_loop().run_in_executor(None, load_lookup_table, self.path)
+        except Exception:
+            self.failures += 1
+            logger.exception("Rule set %s could not be loaded, keeping version %s", self.path,
+                             self.service.lookup_table.version)
+            return False
+
+        previous = self.service.lookup_table.version
+        if lookup_table.version == previous:
+            self.failures += 1
+            logger.error("Rule set %s changed but kept version %s, ignored", self.path, previous)
+            return False
+        self.service.swap_lookup_table(lookup_table)
+        self.reloads += 1
+        logger.info("Rule set version %s replaced version %s", lookup_table.version, previous)
+        return True
@@ -0,0 +1,11 @@
+from pydantic import BaseModel, Field
+
+
+class BatcherStatsSchema(BaseModel):
+    enabled: bool = Field(title="Whether concurrent requests are scored in micro-batches")
+    window_ms: float = Field(default=0, title="The longest time a request waits for its batch to fill")
+    max_size: int = Field(default=0, title="The number of requests that fills a batch")
+    pending: int = Field(default=0, title="The number of requests waiting for their batch")
+    batches: int = Field(default=0, title="The number of batches scored")
+    subjects: int = Field(default=0, title="The number of requests scored in batches")
+    full_batches: int = Field(default=0, title="The number of batches scored because they were full")
@@ -0,0 +1,12 @@
+from pydantic import BaseModel, Field
+
+
+class CacheStatsSchema(BaseModel):
+    enabled: bool = Field(title="Whether the risk analysis cache is enabled")
+    size: int = Field(default=0, title="The number of cached risk profiles")
+    max_size: int = Field(default=0, title="The maximum number of cached risk profiles")
+    ttl_seconds: float = Field(default=0, title="The time to live of a cached risk profile")
+    hits: int = Field(default=0, title="The number of requests answered from the cache")
+    misses: int = Field(default=0, title="The number of requests that had to be scored")
+    evictions: int = Field(default=0, title="The number of least recently used profiles evicted")
+    expirations: int = Field(default=0, title="The number of profiles dropped after their time to live")
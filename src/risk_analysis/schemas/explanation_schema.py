@@ -0,0 +1,25 @@
+from typing import Dict, List
+
+from pydantic import BaseModel, Field
+
+from .risk_score import InsuranceLineEnum, RiskProfile, RiskScoreEnum
+
+
+class RuleContributionSchema(BaseModel):
+    name: str = Field(title="The rule that fired")
+    delta: int = Field(title="The risk points the rule added to the line")
+    ineligible: bool = Field(title="Whether the rule made the subject ineligible to the line")
+
+
+class LineExplanationSchema(BaseModel):
+    base_score: int = Field(title="The risk points of the line before the rules, the number of positive risk answers")
+    rules: List[RuleContributionSchema] = Field(title="The fired rules that changed the line, in evaluation order")
+    score: int = Field(title="The risk points of the line after the rules")
+    risk_score: RiskScoreEnum = Field(title="The risk score the points map to, ineligible when a rule says so")
+
+
+class ExplanationSchema(BaseModel):
+    risk_profile: RiskProfile = Field(title="The risk profile of the subject")
+    version: str = Field(title="The version of the rule set that scored the subject")
+    fired_rules: List[str] = Field(title="The rules that fired, in evaluation order")
+    lines: Dict[InsuranceLineEnum, LineExplanationSchema] = Field(title="The explanation of each insurance line")
@@ -0,0 +1,15 @@
+from pydantic import BaseModel, Field
+
+
+class IdempotencyStatsSchema(BaseModel):
+    enabled: bool = Field(title="Whether the retries with an Idempotency-Key are answered from the shared cache")
+    slots: int = Field(default=0, title="The number of responses the shared table holds")
+    value_size: int = Field(default=0, title="The largest stored response, headers included, in bytes")
+    ttl_seconds: float = Field(default=0, title="The time to live of a stored response")
+    hits: int = Field(default=0, title="The number of retries answered from the cache by this worker")
+    misses: int = Field(default=0, title="The number of requests with a key this worker had to score")
+    stores: int = Field(default=0, title="The number of responses stored by this worker")
+    replaced: int = Field(default=0, title="The number of live responses replaced because their slots were full")
+    mismatches: int = Field(default=0, title="The number of keys reused with another request body")
+    too_large: int = Field(default=0, title="The number of responses too large to be stored")
+    lock_timeouts: int = Field(default=0, title="The number of lookups or stores skipped on a busy stripe")
@@ -0,0 +1,33 @@
+from typing import Dict, List, Optional
+from enum import Enum
+
+from pydantic import BaseModel, Field
+
+from .personal_information_schema import MaritalStatusEnum
+from .risk_score import InsuranceLineEnum, RiskScoreEnum
+
+
+class GroupByEnum(str, Enum):
+    age_band = "age_band"
+    income_band = "income_band"
+    marital_status = "marital_status"
+
+
+class PortfolioGroupSchema(BaseModel):
+    age_band: Optional[str] = Field(title="The age band of the group, e.g. 30-39")
+    income_band: Optional[str] = Field(title="The income band of the group, e.g. 200000+")
+    marital_status: Optional[MaritalStatusEnum] = Field(title="The marital status of the group")
+    rows: int = Field(title="The number of subjects of the group")
+    lines: Dict[InsuranceLineEnum, Dict[RiskScoreEnum, int]] = Field(
+        title="The number of subjects of the group per risk score, for each insurance line",
+    )
+
+
+class PortfolioAnalyticsSchema(BaseModel):
+    rows: int = Field(title="The number of subjects scored")
+    rejected: int = Field(title="The number of rows that are not valid subjects")
+    group_by: List[GroupByEnum] = Field(title="The fields the subjects are grouped by")
+    lines: Dict[InsuranceLineEnum, Dict[RiskScoreEnum, int]] = Field(
+        title="The number of subjects per risk score, for each insurance line",
+    )
+    groups: List[PortfolioGroupSchema] = Field(title="The score counts of every group holding subjects")
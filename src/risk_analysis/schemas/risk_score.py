@@ -10,6 +10,18 @@ class RiskScoreEnum(str, Enum):
     ineligible = "ineligible"
 
 
+class InsuranceLineEnum(str, Enum):
+    auto = "auto"
+    disability = "disability"
+    home = "home"
+    life = "life"
+
+
+# Insurance lines in RiskProfile field order, and risk scores in the order of their integer codes
+INSURANCE_LINES = tuple(line.value for line in InsuranceLineEnum)
+RISK_SCORE_CODES = tuple(RiskScoreEnum)
+
+
 class RiskProfile(BaseModel):
     auto: RiskScoreEnum = Field(title="The subject eligibility to vehicle insurance")
     disability: RiskScoreEnum = Field(title="The subject eligibility to disability insurance")
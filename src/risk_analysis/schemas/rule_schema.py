@@ -0,0 +1,63 @@
+from pydantic import BaseModel, Field, root_validator
+from typing import Dict, List, Union
+from enum import Enum
+
+from .personal_information_schema import MaritalStatusEnum, OwnershipStatusEnum
+from .risk_score import InsuranceLineEnum
+
+
+class RuleFeatureEnum(str, Enum):
+    age = "age"
+    dependents = "dependents"
+    income = "income"
+    marital_status = "marital_status"
+    house_status = "house_status"
+    vehicle_age = "vehicle_age"
+    risk_answers = "risk_answers"
+
+
+class RuleOperatorEnum(str, Enum):
+    lt = "lt"
+    le = "le"
+    gt = "gt"
+    ge = "ge"
+    eq = "eq"
+    ne = "ne"
+
+
+CATEGORICAL_FEATURES = {
+    RuleFeatureEnum.marital_status: {status.value for status in MaritalStatusEnum},
+    RuleFeatureEnum.house_status: {status.value for status in OwnershipStatusEnum},
+}
+
+
+class RuleConditionSchema(BaseModel):
+    feature: RuleFeatureEnum = Field(title="The subject feature the condition is evaluated on")
+    operator: RuleOperatorEnum = Field(title="The comparison applied to the feature")
+    value: Union[int, str] = Field(title="The value the feature is compared with")
+
+    @root_validator(skip_on_failure=True)
+    def check_value_matches_feature(cls, values):
+        feature, operator, value = values["feature"], values["operator"], values["value"]
+        allowed_values = CATEGORICAL_FEATURES.get(feature)
+        if allowed_values is None:
+            if not isinstance(value, int):
+                raise ValueError(f"{feature.value} must be compared with an integer")
+        elif operator not in (RuleOperatorEnum.eq, RuleOperatorEnum.ne):
+            raise ValueError(f"{feature.value} only supports the eq and ne operators")
+        elif value not in allowed_values:
+            raise ValueError(f"{feature.value} must be one of {', '.join(sorted(allowed_values))}")
+        return values
+
+
+class RuleSchema(BaseModel):
+    name: str = Field(title="The rule identifier", regex=r"^[a-z][a-z0-9_]*$")
+    conditions: List[RuleConditionSchema] = Field(title="The conditions that must all hold for the rule to fire",
+                                                  min_items=1)
+    deltas: Dict[InsuranceLineEnum, int] = Field(default={}, title="The risk points added to each insurance line")
+    ineligible: List[InsuranceLineEnum] = Field(default=[], title="The insurance lines the subject is ineligible to")
+
+
+class RuleSetSchema(BaseModel):
+    version: str = Field(title="The rule set version")
+    rules: List[RuleSchema] = Field(title="The rules, applied in order")
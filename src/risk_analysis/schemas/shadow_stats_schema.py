@@ -0,0 +1,33 @@
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from .personal_information_schema import PersonalInformationSchema
+from .risk_score import InsuranceLineEnum, RiskProfile, RiskScoreEnum
+
+
+class ShadowExampleSchema(BaseModel):
+    subject: PersonalInformationSchema = Field(title="A subject the candidate rule set scored differently")
+    active_version: str = Field(title="The version of the rule set that answered the request")
+    active: RiskProfile = Field(title="The risk profile answered to the request")
+    candidate: RiskProfile = Field(title="The risk profile of the candidate rule set")
+
+
+class LineDivergenceSchema(BaseModel):
+    divergent: int = Field(title="The number of subjects the candidate scored differently on the line")
+    transitions: Dict[RiskScoreEnum, Dict[RiskScoreEnum, int]] = Field(
+        title="The number of divergent subjects per active score, then per candidate score",
+    )
+    examples: List[ShadowExampleSchema] = Field(title="A uniform sample of the divergent subjects")
+
+
+class ShadowStatsSchema(BaseModel):
+    enabled: bool = Field(title="Whether the requests are scored again with a candidate rule set")
+    candidate_version: Optional[str] = Field(default=None, title="The version of the candidate rule set")
+    pending: int = Field(default=0, title="The number of subjects waiting to be compared")
+    max_pending: int = Field(default=0, title="The maximum number of subjects waiting to be compared")
+    compared: int = Field(default=0, title="The number of subjects scored with both rule sets")
+    divergent: int = Field(default=0, title="The number of subjects scored differently on at least one line")
+    dropped: int = Field(default=0, title="The number of subjects not compared because the queue was full")
+    failed: int = Field(default=0, title="The number of subjects lost to failed comparisons")
+    lines: Dict[InsuranceLineEnum, LineDivergenceSchema] = Field(default={}, title="The divergences per line")
@@ -0,0 +1,14 @@
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class StoreStatsSchema(BaseModel):
+    enabled: bool = Field(title="Whether the scoring decisions are persisted")
+    pending: int = Field(default=0, title="The number of records waiting to be written")
+    max_pending: int = Field(default=0, title="The maximum number of records waiting to be written")
+    written: int = Field(default=0, title="The number of records written to the database")
+    batches: int = Field(default=0, title="The number of transactions the records were written in")
+    rejected: int = Field(default=0, title="The number of records refused because the queue was full")
+    failed: int = Field(default=0, title="The number of records lost to failed writes")
+    last_error: Optional[str] = Field(default=None, title="The error of the last failed write")
@@ -0,0 +1,22 @@
+from typing import List, Union
+
+from pydantic import BaseModel, Field
+
+from .risk_score import InsuranceLineEnum, RiskProfile
+
+
+class PerturbationSchema(BaseModel):
+    field: str = Field(title="The changed field of the subject, nested fields joined with a dot")
+    value: Union[int, str, None] = Field(
+        title="The new value of the field, the number of positive answers for risk_questions",
+    )
+    risk_profile: RiskProfile = Field(title="The risk profile of the changed subject")
+    changed_lines: List[InsuranceLineEnum] = Field(title="The insurance lines scored differently than the subject")
+
+
+class WhatIfSchema(BaseModel):
+    risk_profile: RiskProfile = Field(title="The risk profile of the subject")
+    perturbations: List[PerturbationSchema] = Field(
+        title="The profiles of the subject with one field changed, for every change that moves it to another "
+              "bucket of the rule set",
+    )
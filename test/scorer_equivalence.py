@@ -0,0 +1,348 @@
+"""Equivalence of every scoring implementation with the reference RiskCalculator.
+
+The exhaustive mode scores the whole bucketed domain of PersonalInformationSchema, every boundary of the risk rules
+crossed with every other, with each registered scorer. The fuzz mode scores random subjects drawn over the whole
+accepted range of every field instead. The subjects are split into chunks checked by a pool of processes, and
+every mismatch is shrunk to the subject closest to BASELINE that still disagrees, so that the mismatches sharing a
+cause are reported once. Run from the repository root:
+    $ PYTHONPATH=.:src python -m test.scorer_equivalence --workers 4
+    $ PYTHONPATH=.:src python -m test.scorer_equivalence --fuzz 1000000 --seed 7
+"""
+import argparse
+import collections
+import concurrent.futures
+import itertools
+import math
+import os
+import random
+import sys
+from typing import Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import msgpack
+import numpy as np
+import orjson
+
+from src.risk_analysis.schemas.personal_information_schema import PersonalInformationSchema
+from src.risk_analysis.risk_analysis_cache import RiskAnalysisCache
+from src.risk_analysis.risk_analysis_clock import current_year
+from src.risk_analysis.risk_analysis_constants import MAX_AGE_LIMIT, MIN_AGE_LIMIT, MIN_INCOME_THRESHOLD
+from src.risk_analysis.risk_analysis_explain import RiskExplainer
+from src.risk_analysis.risk_analysis_fast_codec import subject_from_json
+from src.risk_analysis.risk_analysis_msgpack import decode_subject as decode_msgpack_subject
+from src.risk_analysis.risk_analysys_service import DEFAULT_LOOKUP_TABLE, DEFAULT_RULE_ENGINE, RiskAnalysisService
+from src.risk_analysis.risk_batch_calculator import BatchRiskCalculator
+from src.risk_analysis.risk_calculator import RiskCalculator
+from src.risk_analysis.risk_arrow_scoring import record_batch_columns
+from src.risk_analysis.risk_file_scoring import arrow_columns
+from src.risk_analysis.risk_portfolio_analytics import json_columns
+
+# Subject fields in the order of FIELDS: age, dependents, income, marital status, house ownership status or None,
+# age of the vehicle or None, and the three risk answers
+Fields = Tuple[int, int, int, str, Optional[str], Optional[int], Tuple[int, int, int]]
+FIELDS = ("age", "dependents", "income", "marital_status", "house", "vehicle_age", "risk_questions")
+
+# Every bucket of the rules, with the values on both sides of each cut point
+DOMAIN = (
+    [0, MIN_AGE_LIMIT - 1, MIN_AGE_LIMIT, MIN_AGE_LIMIT + 1, MAX_AGE_LIMIT - 1, MAX_AGE_LIMIT, MAX_AGE_LIMIT + 1, 120],
+    [0, 1, 4],
+    [0, 1, MIN_INCOME_THRESHOLD - 1, MIN_INCOME_THRESHOLD, MIN_INCOME_THRESHOLD + 1, 10 ** 9],
+    ["single", "married"],
+    [None, "owned", "mortgaged"],
+    [None, 1, 4, 5, 6, 30],
+    list(itertools.product((0, 1), repeat=3)),
+)
+# Mismatches are shrunk towards this subject, which fires no rule but the age and income ones
+BASELINE: Fields = (40, 0, 100000, "single", None, None, (0, 0, 0))
+
+Profile = Mapping[str, object]
+Scorer = Callable[[Sequence[PersonalInformationSchema]], List[Optional[Profile]]]
+
+
+class Mismatch(NamedTuple):
+    scorer: str
+    subject: Fields
+    expected: Profile
+    actual: Optional[Profile]
+    # Mismatching subjects of the scorer shrunk to this one
+    occurrences: int
+
+    def describe(self) -> str:
+        changed = ", ".join(f"{name}={value!r}" for name, value, baseline in zip(FIELDS, self.subject, BASELINE)
+                            if value != baseline) or "baseline subject"
+        actual = {line: score.value for line, score in self.actual.items()} if self.actual is not None else None
+        return (f"{self.scorer}: {changed} ({self.occurrences} subjects)\n"
+                f"    expected {({line: score.value for line, score in self.expected.items()})}\n"
+                f"    actual   {actual}")
+
+
+def build_subject(fields: Fields) -> PersonalInformationSchema:
+    age, dependents, income, marital_status, house, vehicle_age, risk_questions = fields
+    return PersonalInformationSchema(
+        age=age,
+        dependents=dependents,
+        house={"ownership_status": house} if house is not None else None,
+        income=income,
+        marital_status=marital_status,
+        risk_questions=list(risk_questions),
+        vehicle={"year": current_year() - vehicle_age} if vehicle_age is not None else None,
+    )
+
+
+def _json_subjects(subjects: Sequence[PersonalInformationSchema]) -> List[dict]:
+    return [orjson.loads(subject.json()) for subject in subjects]
+
+
+def _columns(subjects: Sequence[PersonalInformationSchema]) -> Dict[str, list]:
+    """Columnar dataset of subjects, in the columns of the file scoring and the portfolio analytics"""
+    return {
+        "age": [subject.age for subject in subjects],
+        "dependents": [subject.dependents for subject in subjects],
+        "income": [subject.income for subject in subjects],
+        "marital_status": [subject.marital_status.value for subject in subjects],
+        "house": [subject.house.ownership_status.value if subject.house else None for subject in subjects],
+        "vehicle_year": [subject.vehicle.year if subject.vehicle else None for subject in subjects],
+        **{f"risk_{answer + 1}": [int(subject.risk_questions[answer]) for subject in subjects]
+           for answer in range(3)},
+    }
+
+
+def _plain_rows(plain: np.ndarray, calculator: BatchRiskCalculator) -> List[Optional[Profile]]:
+    """Profiles of the rows of a columnar reader, None for the rows it left to the schema"""
+    profiles = iter(calculator.calculate_subject_scores(DEFAULT_LOOKUP_TABLE))
+    return [next(profiles) if row else None for row in plain.tolist()]
+
+
+def _score_arrow(subjects: Sequence[PersonalInformationSchema]) -> List[Optional[Profile]]:
+    import pyarrow as pa
+
+    return _plain_rows(*arrow_columns(pa.table(_columns(subjects))))
+
+
+def _score_nested_arrow(subjects: Sequence[PersonalInformationSchema]) -> List[Optional[Profile]]:
+    import pyarrow as pa
+
+    return _plain_rows(*record_batch_columns(pa.RecordBatch.from_pylist(_json_subjects(subjects))))
+
+
+def _score_explained(subjects: Sequence[PersonalInformationSchema]) -> List[Profile]:
+    explainer = RiskExplainer(DEFAULT_LOOKUP_TABLE)
+    return [explainer.explain(subject)["risk_profile"] for subject in subjects]
+
+
+def _score_cached(subjects: Sequence[PersonalInformationSchema]) -> List[Profile]:
+    # Each subject scored twice, the second time from the cache, which holds the whole chunk
+    service = RiskAnalysisService(cache=RiskAnalysisCache(2 * len(subjects) + 1, 3600))
+    for subject in subjects:
+        service.run_risk_analysis(subject)
+    return [service.run_risk_analysis(subject) for subject in subjects]
+
+
+# Scorers checked against RiskCalculator, each scoring a list of subjects. A new scoring path is registered here
+SCORERS: Dict[str, Scorer] = {
+    "rule_engine": lambda subjects: [DEFAULT_RULE_ENGINE.calculate_subject_score(subject) for subject in subjects],
+    "lookup_table": lambda subjects: [DEFAULT_LOOKUP_TABLE.calculate_subject_score(subject) for subject in subjects],
+    "batch": lambda subjects: BatchRiskCalculator.from_subjects(subjects).calculate_subject_scores(DEFAULT_LOOKUP_TABLE),
+    "coalesced": lambda subjects: RiskAnalysisService().run_coalesced_risk_analysis(subjects),
+    "cached": _score_cached,
+    "explain": _score_explained,
+    "fast_codec": lambda subjects: [DEFAULT_LOOKUP_TABLE.calculate_subject_score(subject_from_json(value))
+                                    for value in _json_subjects(subjects)],
+    "msgpack": lambda subjects: [DEFAULT_LOOKUP_TABLE.calculate_subject_score(
+        decode_msgpack_subject(msgpack.packb(value))) for value in _json_subjects(subjects)],
+    "columnar_json": lambda subjects: _plain_rows(*json_columns(_columns(subjects), 0, len(subjects))),
+}
+try:
+    import pyarrow  # noqa: F401
+    SCORERS["arrow"] = _score_arrow
+    SCORERS["nested_arrow"] = _score_nested_arrow
+except ImportError:
+    pass
+
+
+def domain_size() -> int:
+    return math.prod(len(values) for values in DOMAIN)
+
+
+def domain_fields(start: int = 0, end: Optional[int] = None) -> Iterable[Fields]:
+    """Fields of the subjects [start, end) of the exhaustive domain"""
+    return itertools.islice(itertools.product(*DOMAIN), start, end)
+
+
+def fuzz_fields(size: int, seed: int) -> List[Fields]:
+    """Random fields over the accepted range of each field, half of the numbers drawn near a cut point"""
+    rng = random.Random(seed)
+    max_vehicle_age = current_year() - 1886
+
+    def near(values: Sequence[int], low: int, high: int) -> int:
+        if rng.random() < 0.5:
+            return rng.randint(low, high)
+        return min(max(rng.choice(values) + rng.randint(-2, 2), low), high)
+    return [
+        (
+            near([MIN_AGE_LIMIT, MAX_AGE_LIMIT], 0, 150),
+            near([0, 1], 0, 20),
+            near([0, MIN_INCOME_THRESHOLD], 0, 10 ** 7),
+            rng.choice(DOMAIN[3]),
+            rng.choice(DOMAIN[4]),
+            rng.choice([None, near([5], 1, max_vehicle_age)]),
+            rng.choice(DOMAIN[6]),
+        )
+        for _ in range(size)
+    ]
+
+
+def mismatches(names: Sequence[str], fields: Sequence[Fields]) -> List[Tuple[str, Fields, Profile, Optional[Profile]]]:
+    """Score the subjects with the reference and every named scorer, returning the subjects they disagree on"""
+    subjects = [build_subject(values) for values in fields]
+    expected = [RiskCalculator(subject).calculate_subject_score() for subject in subjects]
+    found = []
+    for name in names:
+        actual = SCORERS[name](subjects)
+        for values, reference, profile in zip(fields, expected, actual):
+            # Plain dicts, the table cells are read-only views which do not pickle back from the workers
+            profile = dict(profile) if profile is not None else None
+            if profile != reference:
+                found.append((name, values, reference, profile))
+    return found
+
+
+def _check_domain_chunk(names: Sequence[str], start: int, end: int) -> list:
+    return mismatches(names, list(domain_fields(start, end)))
+
+
+def _check_fuzz_chunk(names: Sequence[str], size: int, seed: int) -> list:
+    return mismatches(names, fuzz_fields(size, seed))
+
+
+def _field_complexity(position: int, value) -> Tuple[int, int]:
+    if value == BASELINE[position]:
+        return 0, 0
+    values = DOMAIN[position]
+    return 1, values.index(value) + 1 if value in values else len(values) + 1
+
+
+def complexity(fields: Fields) -> Tuple[int, int]:
+    """Number of fields off BASELINE, then how far they are, by the position of their values in DOMAIN"""
+    costs = [_field_complexity(position, value) for position, value in enumerate(fields)]
+    return sum(off for off, _ in costs), sum(distance for _, distance in costs)
+
+
+def _simpler_moves(fields: Fields, pairs: bool) -> Iterable[Tuple[Tuple[int, int], Fields]]:
+    """Simpler subjects with one field, or two, changed to BASELINE or to a value of DOMAIN, with their complexity"""
+    off, distance = complexity(fields)
+    # Complexity change of setting each field to each of its values
+    changes = []
+    for position, (baseline, values) in enumerate(zip(BASELINE, DOMAIN)):
+        current_off, current_distance = _field_complexity(position, fields[position])
+        changes.append([(value, *(new - old for new, old in zip(_field_complexity(position, value),
+                                                                (current_off, current_distance))))
+                        for value in dict.fromkeys([baseline, *values]) if value != fields[position]])
+    for position, choices in enumerate(changes):
+        for value, off_change, distance_change in choices:
+            moved = fields[:position] + (value,) + fields[position + 1:]
+            if not pairs:
+                if (off + off_change, distance + distance_change) < (off, distance):
+                    yield (off + off_change, distance + distance_change), moved
+                continue
+            # Pairs, e.g. an income moved to the baseline along with more risk answers to keep the score
+            for other in range(position + 1, len(fields)):
+                for other_value, other_off_change, other_distance_change in changes[other]:
+                    moved_complexity = (off + off_change + other_off_change,
+                                        distance + distance_change + other_distance_change)
+                    if moved_complexity < (off, distance):
+                        yield moved_complexity, moved[:other] + (other_value,) + moved[other + 1:]
+
+
+def shrink(name: str, fields: Fields, verdicts: Dict[Fields, Optional[tuple]],
+           shrunk: Dict[Fields, Fields]) -> Tuple[Fields, Profile, Optional[Profile]]:
+    """Move a mismatching subject to the least complex subject the scorer still disagrees on.
+
+    Each step scores every simpler subject one field away, then two fields away when none of them mismatches, and
+    moves to the simplest mismatching one. verdicts memoizes the scored subjects, the expected and actual profiles
+    of a mismatch or None, and shrunk the subject each visited subject ends at, so that shrinking many mismatches
+    of a cause costs little more than one.
+    """
+    def mismatching(candidates: List[Tuple[Tuple[int, int], Fields]]) -> List[Tuple[Tuple[int, int], Fields]]:
+        unknown = list(dict.fromkeys(candidate for _, candidate in candidates if candidate not in verdicts))
+        for candidate in unknown:
+            verdicts[candidate] = None
+        for _, candidate, expected, actual in mismatches([name], unknown):
+            verdicts[candidate] = expected, actual
+        return [(moved_complexity, candidate) for moved_complexity, candidate in candidates
+                if verdicts[candidate] is not None]
+
+    mismatching([((0, 0), fields)])
+    path = []
+    while fields not in shrunk:
+        path.append(fields)
+        for pairs in (False, True):
+            found = mismatching(list(_simpler_moves(fields, pairs)))
+            if found:
+                fields = min(found, key=lambda move: (move[0], str(move[1])))[1]
+                break
+        else:
+            shrunk[fields] = fields
+    minimal = shrunk[fields]
+    for visited in path:
+        shrunk[visited] = minimal
+    expected, actual = verdicts[minimal]
+    return minimal, expected, actual
+
+
+def report(found: Iterable[Tuple[str, Fields, Profile, Optional[Profile]]]) -> List[Mismatch]:
+    """Shrink every mismatch and group those shrunk to the same subject of the same scorer"""
+    groups: Dict[Tuple[str, Fields], list] = collections.OrderedDict()
+    verdicts: Dict[str, Dict[Fields, Optional[tuple]]] = collections.defaultdict(dict)
+    shrunk: Dict[str, Dict[Fields, Fields]] = collections.defaultdict(dict)
+    for name, fields, _, _ in found:
+        minimal, expected, actual = shrink(name, fields, verdicts[name], shrunk[name])
+        group = groups.setdefault((name, minimal), [expected, actual, 0])
+        group[2] += 1
+    return [Mismatch(name, minimal, expected, actual, occurrences)
+            for (name, minimal), (expected, actual, occurrences) in groups.items()]
+
+
+def check(names: Optional[Sequence[str]] = None, workers: Optional[int] = 1, fuzz: int = 0, seed: int = 0,
+          chunk_size: int = 2000) -> List[Mismatch]:
+    """Check the scorers against the reference over the exhaustive domain, or over fuzz random subjects.
+
+    The chunks are checked by a pool of `workers` processes, one per core when None, or in this process for 1.
+    """
+    names = list(names or SCORERS)
+    if fuzz:
+        tasks = [(_check_fuzz_chunk, names, min(chunk_size, fuzz - start), seed * 1_000_003 + start)
+                 for start in range(0, fuzz, chunk_size)]
+    else:
+        size = domain_size()
+        tasks = [(_check_domain_chunk, names, start, min(start + chunk_size, size))
+                 for start in range(0, size, chunk_size)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = [function(*arguments) for function, *arguments in tasks]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(function, *arguments) for function, *arguments in tasks]
+            results = [future.result() for future in futures]
+    return report(mismatch for result in results for mismatch in result)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scorer", action="append", choices=list(SCORERS), help="scorer to check, all by default")
+    parser.add_argument("--workers", type=int, help="number of checking processes, one per core by default")
+    parser.add_argument("--fuzz", type=int, default=0, help="random subjects to check instead of the domain")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    names = args.scorer or list(SCORERS)
+    found = check(names, args.workers, args.fuzz, args.seed)
+    checked = args.fuzz or domain_size()
+    print(f"{checked} subjects, {len(names)} scorers: {', '.join(names)}")
+    for mismatch in found:
+        print(mismatch.describe())
+    print(f"{len(found)} minimal mismatches" if found else "no mismatch")
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+import datetime
+import itertools
+
+from src.risk_analysis.schemas.personal_information_schema import PersonalInformationSchema
+
+CURRENT_YEAR = datetime.date.today().year
+
+
+def build_subjects():
+    """Subjects covering every branch of the risk rules, including the boundaries of each threshold."""
+    subjects = []
+    for age, income, house, dependents, marital_status, vehicle_year, risk_questions in itertools.product(
+            [0, 29, 30, 45, 60, 61],
+            [0, 1, 199999, 200000, 250000],
+            [None, "owned", "mortgaged"],
+            [0, 2],
+            ["single", "married"],
+            [None, CURRENT_YEAR - 1, CURRENT_YEAR - 5, CURRENT_YEAR - 6],
+            [[0, 0, 0], [1, 0, 0], [1, 1, 0], [1, 1, 1]],
+    ):
+        subjects.append(PersonalInformationSchema(
+            age=age,
+            dependents=dependents,
+            house={"ownership_status": house} if house is not None else None,
+            income=income,
+            marital_status=marital_status,
+            risk_questions=risk_questions,
+            vehicle={"year": vehicle_year} if vehicle_year is not None else None,
+        ))
+    return subjects
@@ -0,0 +1,137 @@
+import unittest
+
+import numpy as np
+
+from src.risk_analysis.schemas.personal_information_schema import PersonalInformationSchema
+from src.risk_analysis.risk_calculator import RiskCalculator
+from src.risk_analysis.risk_batch_calculator import BatchRiskCalculator, HOUSE_MORTGAGED, HOUSE_NONE, \
+    HOUSE_OWNED, NO_VEHICLE
+from src.risk_analysis.risk_rule_engine import RuleEngine
+from src.risk_analysis.risk_lookup_table import RiskLookupTable
+from src.risk_analysis.risk_analysis_rules import DEFAULT_RULE_SET
+from src.risk_analysis.schemas.risk_score import RISK_SCORE_CODES, RiskScoreEnum
+from src.risk_analysis.schemas.rule_schema import RuleSetSchema
+from test.subject_factory import CURRENT_YEAR, build_subjects
+
+
+class TestBatchRiskCalculator(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.lookup_table = RiskLookupTable(RuleEngine(DEFAULT_RULE_SET))
+
+    def test_from_subjects_builds_columns(self):
+        subjects = [
+            PersonalInformationSchema(
+                age=35,
+                dependents=2,
+                house={"ownership_status": "mortgaged"},
+                income=100000,
+                marital_status="married",
+                risk_questions=[0, 1, 1],
+                vehicle={"year": 2018},
+            ),
+            PersonalInformationSchema(
+                age=20,
+                dependents=0,
+                house={"ownership_status": "owned"},
+                income=0,
+                marital_status="single",
+                risk_questions=[0, 0, 0],
+            ),
+            PersonalInformationSchema(
+                age=70,
+                dependents=0,
+                income=0,
+                marital_status="single",
+                risk_questions=[1, 1, 1],
+            ),
+        ]
+
+        calculator = BatchRiskCalculator.from_subjects(subjects)
+        self.assertEqual(len(calculator), 3)
+        self.assertEqual(calculator.house.tolist(), [HOUSE_MORTGAGED, HOUSE_OWNED, HOUSE_NONE])
+        self.assertEqual(calculator.married.tolist(), [True, False, False])
+        self.assertEqual(calculator.vehicle_year.tolist(), [2018, NO_VEHICLE, NO_VEHICLE])
+        self.assertEqual(calculator.risk_answers.tolist(), [2, 0, 3])
+
+    def test_calculate_scores_no_income_is_ineligible(self):
+        calculator = BatchRiskCalculator(
+            age=[35], dependents=[0], income=[0], house=[HOUSE_NONE], married=[False],
+            vehicle_year=[NO_VEHICLE], risk_answers=[3],
+        )
+
+        self.assertTrue(np.all(calculator.calculate_scores(self.lookup_table) == RISK_SCORE_CODES.index(RiskScoreEnum.ineligible)))
+
+    def test_calculate_subject_scores_empty(self):
+        self.assertEqual(BatchRiskCalculator.from_subjects([]).calculate_subject_scores(self.lookup_table), [])
+
+    def test_calculate_subject_scores_over_max_age(self):
+        calculator = BatchRiskCalculator(
+            age=[65], dependents=[0], income=[100000], house=[HOUSE_OWNED], married=[False],
+            vehicle_year=[NO_VEHICLE], risk_answers=[0],
+        )
+
+        self.assertEqual(
+            calculator.calculate_subject_scores(self.lookup_table),
+            [{
+                "auto": RiskScoreEnum.economic,
+                "disability": RiskScoreEnum.ineligible,
+                "home": RiskScoreEnum.economic,
+                "life": RiskScoreEnum.ineligible,
+            }]
+        )
+
+    def test_calculate_subject_scores_matches_risk_calculator(self):
+        subjects = build_subjects()
+
+        results = BatchRiskCalculator.from_subjects(subjects).calculate_subject_scores(self.lookup_table)
+
+        for subject, result in zip(subjects, results):
+            self.assertEqual(result, dict(RiskCalculator(subject).calculate_subject_score()), subject)
+
+
+    def test_calculate_subject_scores_follows_rule_set(self):
+        engine = RuleEngine(RuleSetSchema.parse_obj({
+            "version": "test",
+            "rules": [
+                {
+                    "name": "young",
+                    "conditions": [{"feature": "age", "operator": "lt", "value": 45}],
+                    "deltas": {"home": 2, "life": -1},
+                },
+                {
+                    "name": "owned_house",
+                    "conditions": [{"feature": "house_status", "operator": "eq", "value": "owned"}],
+                    "ineligible": ["auto"],
+                },
+                {
+                    "name": "old_vehicle",
+                    "conditions": [{"feature": "vehicle_age", "operator": "ge", "value": 3}],
+                    "deltas": {"auto": 3},
+                },
+                {
+                    "name": "married_with_income",
+                    "conditions": [
+                        {"feature": "marital_status", "operator": "eq", "value": "married"},
+                        {"feature": "income", "operator": "gt", "value": 100000},
+                    ],
+                    "deltas": {"disability": 2},
+                },
+            ],
+        }))
+        subjects = build_subjects() + [
+            PersonalInformationSchema(
+                age=44, dependents=0, income=100001, marital_status="married", risk_questions=[0, 0, 0],
+                vehicle={"year": CURRENT_YEAR - 3},
+            ),
+        ]
+
+        results = BatchRiskCalculator.from_subjects(subjects).calculate_subject_scores(RiskLookupTable(engine))
+
+        for subject, result in zip(subjects, results):
+            self.assertEqual(result, engine.calculate_subject_score(subject), subject)
+
+
+if __name__ == '__main__':
+    unittest.main()
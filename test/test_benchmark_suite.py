@@ -0,0 +1,27 @@
+import unittest
+
+from benchmarks.subjects import random_subjects, uncovered_branches
+from benchmarks.suite import compare_results, run_suite
+
+
+class TestBenchmarkSuite(unittest.TestCase):
+
+    def test_random_subjects_cover_every_rule_branch(self):
+        self.assertEqual(uncovered_branches(random_subjects(500)), [])
+
+    def test_random_subjects_are_reproducible(self):
+        self.assertEqual(random_subjects(20, seed=3), random_subjects(20, seed=3))
+
+    def test_run_suite(self):
+        results = run_suite(["calculator", "service"], size=500, rounds=2)
+        self.assertEqual(set(results["benchmarks"]), {"calculator", "service"})
+        self.assertGreater(results["benchmarks"]["service"]["median_ns"], 0)
+
+    def test_compare_results(self):
+        baseline = {"benchmarks": {"calculator": {"median_ns": 100.0}, "http": {"median_ns": 50.0}}}
+        results = {"benchmarks": {"calculator": {"median_ns": 125.0}, "service": {"median_ns": 10.0}}}
+        self.assertEqual(compare_results(results, baseline), {"calculator": 0.25})
+
+
+if __name__ == '__main__':
+    unittest.main()
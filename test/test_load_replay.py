@@ -0,0 +1,133 @@
+import asyncio
+import os
+import signal
+import tempfile
+import unittest
+
+from src.risk_analysis.schemas.personal_information_schema import PersonalInformationSchema
+from benchmarks.bench_server import free_port, start_server
+from benchmarks.load_replay import main, read_log, record, replay, summarize
+from benchmarks.population import DEFAULT_POPULATION, generate_population, parse_distribution, population_config
+
+
+def uniform_log(size, rps):
+    return [{"at": index / rps, "method": "GET", "path": "/health"} for index in range(size)]
+
+
+async def stalling_server(stall):
+    """Server answering every request at once, but the first one after stall seconds"""
+    answered = 0
+
+    async def handle(reader, writer):
+        nonlocal answered
+        while True:
+            try:
+                await reader.readuntil(b"\r\n\r\n")
+            except asyncio.IncompleteReadError:
+                break
+            answered += 1
+            if answered == 1:
+                await asyncio.sleep(stall)
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n{}")
+        writer.close()
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+class TestPopulation(unittest.TestCase):
+
+    def test_population_is_seeded_and_valid(self):
+        subjects = generate_population(500, seed=3)
+
+        self.assertEqual(subjects, generate_population(500, seed=3))
+        self.assertNotEqual(subjects, generate_population(500, seed=4))
+        for subject in subjects:
+            PersonalInformationSchema.parse_obj(subject)
+        self.assertEqual({subject["marital_status"] for subject in subjects}, {"single", "married"})
+        self.assertIn(None, [subject["vehicle"] for subject in subjects])
+
+    def test_configured_distributions(self):
+        config = population_config(age="uniform:30:30", marital_status="choice:married", vehicle="choice:none",
+                                   income="normal:-50:1")
+
+        subjects = generate_population(100, config)
+
+        self.assertEqual({subject["age"] for subject in subjects}, {30})
+        self.assertEqual({subject["marital_status"] for subject in subjects}, {"married"})
+        self.assertEqual({subject["vehicle"] for subject in subjects}, {None})
+        self.assertEqual({subject["income"] for subject in subjects}, {0})
+        self.assertEqual(config.house, DEFAULT_POPULATION.house)
+
+    def test_invalid_distributions(self):
+        for text in ("gamma:1:2", "normal:1", "uniform:a:b", "choice:", "choice:single=-1"):
+            with self.assertRaises(ValueError):
+                parse_distribution(text)
+        with self.assertRaises(ValueError):
+            population_config(house="choice:rented")
+        with self.assertRaises(ValueError):
+            population_config(height="uniform:1:2")
+        self.assertEqual(str(parse_distribution("lognormal:11:0.9:0:2000000")), "lognormal:11:0.9:0:2000000")
+
+
+class TestLoadReplay(unittest.TestCase):
+
+    def test_record_is_seeded(self):
+        log = record(400, 200, DEFAULT_POPULATION, health_share=0.25, seed=5)
+
+        self.assertEqual(log, record(400, 200, DEFAULT_POPULATION, health_share=0.25, seed=5))
+        self.assertEqual(len(log), 400)
+        self.assertEqual([entry["at"] for entry in log], sorted(entry["at"] for entry in log))
+        self.assertLess(abs(log[-1]["at"] - 2), 0.5)
+        health = [entry for entry in log if entry["path"] == "/health"]
+        self.assertLess(abs(len(health) - 100), 40)
+        self.assertTrue(all("body" in entry for entry in log if entry["path"] == "/risk-analysis"))
+
+    def test_latency_is_measured_from_the_scheduled_time(self):
+        async def run():
+            server = await stalling_server(0.3)
+            async with server:
+                return await replay(uniform_log(40, 100), "127.0.0.1", server.sockets[0].getsockname()[1],
+                                    max_connections=1)
+        results = asyncio.run(run())
+
+        summary = summarize(results)["/health"]
+        self.assertEqual((summary["requests"], summary["errors"]), (40, 0))
+        # The requests scheduled during the stall wait for the single connection, without being sent
+        self.assertGreater(summary["latency"]["p50"], 0.05)
+        self.assertLess(summary["service_time"]["p50"], 0.02)
+        self.assertGreater(summary["max_send_delay"], 0.25)
+
+    def test_replay_rescales_the_log_to_the_target_rate(self):
+        async def run():
+            server = await stalling_server(0)
+            async with server:
+                return await replay(uniform_log(20, 10), "127.0.0.1", server.sockets[0].getsockname()[1], rps=200)
+        results = asyncio.run(run())
+
+        # 20 requests at 200 requests per second, the last one scheduled after 0.1 s instead of 1.9 s
+        self.assertAlmostEqual(results[-1].scheduled, 0.1)
+        self.assertLess(results[-1].done, 0.5)
+
+    def test_record_and_replay_against_the_server(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "requests.ndjson")
+            main(["record", "--rps", "200", "--duration", "0.5", "--health-share", "0.2", "--age", "uniform:18:30",
+                  "--output", path])
+            with open(path) as file:
+                log = read_log(file)
+        port = free_port()
+        server = start_server(port, 1)
+        try:
+            summary = summarize(asyncio.run(replay(log, "127.0.0.1", port)))
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(30)
+
+        self.assertEqual(summary["all"]["requests"], 100)
+        self.assertEqual(summary["all"]["errors"], 0)
+        self.assertEqual(summary["/risk-analysis"]["requests"] + summary["/health"]["requests"], 100)
+        self.assertGreater(summary["/health"]["throughput"], 0)
+        self.assertTrue(all(entry["body"]["age"] <= 30 for entry in log if "body" in entry))
+
+
+if __name__ == '__main__':
+    unittest.main()
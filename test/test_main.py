@@ -1,12 +1,52 @@
+import json
+import os
+import tempfile
+
 from fastapi.testclient import TestClient
 
-from src.main import app
+from src import main
+from src.main import app, health_check
+from src.risk_analysis import risk_analysis_startup
 
 client = TestClient(app)
 
 
 def test_read_main():
-    response = client.get("/health")
+    with TestClient(app) as started_client:
+        response = started_client.get("/health")
     assert response.status_code == 200
-    assert response.json() == {"status": "ok", "info": {}, "error": {}, "details": {}}
+    assert response.json() == {
+        "status": "ok",
+        "info": {"liveness": {"status": "up"}, "readiness": {"status": "up"}},
+        "error": {},
+        "details": {"liveness": {"status": "up"}, "readiness": {"status": "up"}},
+    }
+
+
+def test_readiness_is_reported_separately_from_liveness():
+    # Without the context manager the startup handlers do not run, as before the server is ready
+    assert not health_check.ready
+    assert client.get("/health/live").json() == {"status": "up"}
+    assert client.get("/health/ready").status_code == 503
+    response = client.get("/health")
+    assert response.status_code == 503
+    assert response.json()["error"] == {"readiness": {"status": "down"}}
+
+    with TestClient(app) as started_client:
+        assert started_client.get("/health/ready").json() == {"status": "up"}
+    assert not health_check.ready
+
+
+def test_static_openapi_document_is_served(monkeypatch):
+    generated = json.loads(json.dumps(app.openapi()))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "openapi.json")
+        risk_analysis_startup.write_openapi(app, path)
+        assert risk_analysis_startup.read_openapi(path) == generated
 
+        built = {**generated, "info": {**generated["info"], "title": "Built"}}
+        with open(path, "w") as file:
+            json.dump(built, file)
+        monkeypatch.setattr(main, "OPENAPI_PATH", path)
+        monkeypatch.setattr(app, "openapi_schema", None)
+        assert client.get("/openapi.json").json() == built
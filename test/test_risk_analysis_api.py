@@ -1,9 +1,17 @@
+import json
+
 from src.risk_analysis import __version__
 
 from fastapi.testclient import TestClient
 
 from src.main import app
 from src.risk_analysis.schemas.risk_score import RiskScoreEnum
+from src.risk_analysis.schemas.rule_schema import RuleSetSchema
+from src.risk_analysis.risk_rule_engine import RuleEngine
+from src.risk_analysis.risk_lookup_table import RiskLookupTable
+from risk_analysis.risk_analysis_controller import get_risk_analysis_service
+from risk_analysis.risk_analysys_service import RiskAnalysisService
+from test.subject_factory import build_subjects
 
 client = TestClient(app)
 
@@ -205,4 +213,202 @@ def test_run_risk_analysis_age_in_range_and_married_with_dependents_no_house_no_
         'disability': RiskScoreEnum.regular,
         'home': RiskScoreEnum.responsible,
         'life': RiskScoreEnum.responsible
-    }
\ No newline at end of file
+    }
+
+
+def test_run_fast_risk_analysis_matches_risk_analysis():
+    for subject in build_subjects()[::5]:
+        body_data = subject.json()
+        response = client.post("/risk-analysis", data=body_data)
+        fast_response = client.post("/risk-analysis/fast", data=body_data)
+        assert fast_response.status_code == 200
+        assert fast_response.headers["content-type"] == "application/json"
+        assert fast_response.json() == response.json()
+
+
+def test_run_fast_risk_analysis_errors_match_risk_analysis():
+    requests = [
+        {"data": ""},
+        {"data": "null"},
+        {"data": "not json"},
+        {"data": '{"age": 35'},
+        {"data": b"\xff\xfe{"},
+        {"data": '{"age": 35}', "headers": {"content-type": "text/plain"}},
+        {"json": []},
+        {"json": {"age": -1, "dependents": "two", "income": 0, "marital_status": "widowed",
+                  "risk_questions": [0, 1], "house": {"ownership_status": "rented"}, "vehicle": {"year": 1800}}},
+        # Values the fast decoder leaves to the schema, which coerces them
+        {"json": {"age": "35", "dependents": 1.0, "income": True, "marital_status": "single",
+                  "risk_questions": ["yes", 0, True], "vehicle": {"year": "2018"}}},
+        {"data": '{"age": NaN, "dependents": 1, "income": 0, "marital_status": "single", "risk_questions": [0, 1, 0]}'},
+    ]
+    for request in requests:
+        response = client.post("/risk-analysis", **request)
+        fast_response = client.post("/risk-analysis/fast", **request)
+        assert fast_response.status_code == response.status_code, request
+        assert fast_response.json() == response.json(), request
+
+
+def test_run_batch_risk_analysis():
+    body_data = '[ \
+            { \
+                "age": 35, \
+                "dependents": 2, \
+                "house": {"ownership_status": "owned"}, \
+                "income": 0, \
+                "marital_status": "married", \
+                "risk_questions": [0, 1, 0], \
+                "vehicle": {"year": 2018} \
+            }, \
+            { \
+                "age": 35, \
+                "dependents": 3, \
+                "house": {"ownership_status": "mortgaged"}, \
+                "income": 100000, \
+                "marital_status": "single", \
+                "risk_questions": [1, 1, 1] \
+            } \
+        ]'
+    response = client.post("/risk-analysis/batch", data=body_data)
+    assert response.status_code == 200
+    assert response.json() == [
+        {
+            'auto': RiskScoreEnum.ineligible,
+            'disability': RiskScoreEnum.ineligible,
+            'home': RiskScoreEnum.ineligible,
+            'life': RiskScoreEnum.ineligible
+        },
+        {
+            'auto': RiskScoreEnum.regular,
+            'disability': RiskScoreEnum.regular,
+            'home': RiskScoreEnum.responsible,
+            'life': RiskScoreEnum.regular
+        },
+    ]
+
+
+def test_run_batch_risk_analysis_invalid_subject():
+    body_data = '[{"age": -1}]'
+    response = client.post("/risk-analysis/batch", data=body_data)
+    assert response.status_code == 422
+
+
+def test_run_batch_risk_analysis_errors():
+    assert client.post("/risk-analysis/batch", data="{}").json() == {
+        "detail": [{"loc": ["body"], "msg": "value is not a valid list", "type": "type_error.list"}],
+    }
+    assert client.post("/risk-analysis/batch", data="[1]").json() == {
+        "detail": [{"loc": ["body", 0], "msg": "value is not a valid dict", "type": "type_error.dict"}],
+    }
+    assert client.post("/risk-analysis/batch", data="null").status_code == 422
+
+
+def test_run_batch_risk_analysis_coerces_items_like_the_schema():
+    subject = {"age": 35, "dependents": 0, "income": 0, "marital_status": "single", "risk_questions": [0, 0, 0]}
+    coerced_subject = {**subject, "age": "35", "risk_questions": ["1", 0, 0]}
+    response = client.post("/risk-analysis/batch", json=[subject, coerced_subject])
+
+    assert response.status_code == 200
+    assert response.json() == [client.post("/risk-analysis", json=subject).json()] * 2
+
+
+def test_run_batch_risk_analysis_integers_beyond_int64():
+    subject = {"age": 35, "dependents": 0, "income": 0, "marital_status": "single", "risk_questions": [0, 0, 0]}
+    oversized_subjects = [
+        {**subject, "income": 2 ** 63}, {**subject, "dependents": 10 ** 30}, {**subject, "age": 2 ** 64},
+    ]
+    response = client.post("/risk-analysis/batch", json=[subject, *oversized_subjects])
+
+    assert response.status_code == 200
+    assert response.json() == [client.post("/risk-analysis", json=body).json()
+                               for body in (subject, *oversized_subjects)]
+
+
+def test_run_batch_risk_analysis_matches_single_subject_with_custom_rule_set():
+    lookup_table = RiskLookupTable(RuleEngine(RuleSetSchema.parse_obj({
+        "version": "test",
+        "rules": [
+            {
+                "name": "has_dependents",
+                "conditions": [{"feature": "dependents", "operator": "ge", "value": 1}],
+                "deltas": {"life": 3, "auto": -1},
+            },
+            {
+                "name": "senior",
+                "conditions": [{"feature": "age", "operator": "ge", "value": 45}],
+                "ineligible": ["home"],
+            },
+        ],
+    })))
+    subjects = [json.loads(subject.json()) for subject in build_subjects()[::7]]
+
+    app.dependency_overrides[get_risk_analysis_service] = lambda: RiskAnalysisService(lookup_table)
+    try:
+        batch_response = client.post("/risk-analysis/batch", json=subjects)
+        single_responses = [client.post("/risk-analysis", json=subject).json() for subject in subjects]
+    finally:
+        app.dependency_overrides.clear()
+
+    assert batch_response.status_code == 200
+    assert batch_response.json() == single_responses
+    assert any(profile["home"] == RiskScoreEnum.ineligible for profile in single_responses)
+
+
+def test_get_cache_stats_disabled():
+    response = client.get("/risk-analysis/cache")
+    assert response.status_code == 200
+    assert response.json()["enabled"] is False
+
+
+def test_run_stream_risk_analysis():
+    body_data = (
+        '{"age": 35, "dependents": 2, "income": 0, "marital_status": "married", "risk_questions": [0, 1, 0]}\n'
+        '{"age": -1, "dependents": 2, "income": 0, "marital_status": "married", "risk_questions": [0, 1, 0]}\n'
+        'not json\n'
+        '\n'
+        '{"age": 35, "dependents": 0, "income": 100000, "marital_status": "single", "risk_questions": [1, 1, 1]}\n'
+    )
+    response = client.post("/risk-analysis/stream", data=body_data)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 4
+    assert lines[0] == {
+        'line': 1,
+        'profile': {
+            'auto': RiskScoreEnum.ineligible,
+            'disability': RiskScoreEnum.ineligible,
+            'home': RiskScoreEnum.ineligible,
+            'life': RiskScoreEnum.ineligible
+        }
+    }
+    assert lines[1]["line"] == 2
+    assert lines[1]["detail"][0]["loc"] == ["body", "age"]
+    assert lines[1]["detail"][0]["type"] == "value_error.number.not_ge"
+    assert lines[2]["line"] == 3
+    assert lines[3] == {
+        'line': 5,
+        'profile': {
+            'auto': RiskScoreEnum.regular,
+            'disability': RiskScoreEnum.regular,
+            'home': RiskScoreEnum.regular,
+            'life': RiskScoreEnum.regular
+        }
+    }
+
+
+def test_run_stream_risk_analysis_multiple_chunks():
+    subject = b'{"age": 35, "dependents": 0, "income": 100000, "marital_status": "single", "risk_questions": [1, 1, 1]}'
+
+    def body_chunks():
+        body_data = b"\n".join([subject] * 1000) + b"\n"
+        for start in range(0, len(body_data), 1000):
+            yield body_data[start:start + 1000]
+
+    response = client.post("/risk-analysis/stream", data=body_chunks())
+    assert response.status_code == 200
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["line"] for line in lines] == list(range(1, 1001))
+    assert all(line["profile"]["auto"] == RiskScoreEnum.regular for line in lines)
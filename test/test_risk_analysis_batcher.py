@@ -0,0 +1,130 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from src.main import app
+# The app imports the package as `risk_analysis`, the controller of that copy serves the requests
+from risk_analysis import risk_analysis_controller
+from risk_analysis.risk_analysis_batcher import RiskAnalysisBatcher
+from risk_analysis.risk_batch_calculator import BatchRiskCalculator
+from risk_analysis.risk_analysis_controller import get_risk_analysis_service
+from risk_analysis.risk_analysys_service import RiskAnalysisService
+from risk_analysis.risk_analysis_store import StoreUnavailableError
+from test.subject_factory import build_subjects
+
+SUBJECTS = build_subjects()[::37]
+
+
+class RecordingStore:
+    """Store double keeping the recorded subjects, or failing like a full queue"""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.subjects = []
+
+    def record_many(self, subjects, risk_profiles, version):
+        if self.fail:
+            raise StoreUnavailableError("queue full")
+        self.subjects.extend(subjects)
+
+
+def score_concurrently(batcher, subjects):
+    async def run():
+        lookup_table = batcher.service.lookup_table
+        return await asyncio.gather(*(batcher.run_risk_analysis(subject, lookup_table) for subject in subjects),
+                                    return_exceptions=True)
+    return asyncio.run(run())
+
+
+class TestRiskAnalysisBatcher(unittest.TestCase):
+
+    def test_concurrent_requests_are_scored_in_one_batch(self):
+        service = RiskAnalysisService()
+        batcher = RiskAnalysisBatcher(service, window=0.001, max_size=10000)
+
+        risk_profiles = score_concurrently(batcher, SUBJECTS)
+
+        self.assertEqual(risk_profiles, [service.run_risk_analysis(subject) for subject in SUBJECTS])
+        self.assertEqual(batcher.stats(), {"enabled": True, "window_ms": 1, "max_size": 10000, "pending": 0,
+                                           "batches": 1, "subjects": len(SUBJECTS), "full_batches": 0})
+
+    def test_full_batch_is_scored_without_waiting_for_the_window(self):
+        batcher = RiskAnalysisBatcher(RiskAnalysisService(), window=60, max_size=8)
+
+        start = time.monotonic()
+        score_concurrently(batcher, SUBJECTS[:16])
+
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual((batcher.batches, batcher.full_batches), (2, 2))
+
+    def test_identical_subjects_are_scored_once_and_recorded_each(self):
+        store = RecordingStore()
+        subjects = SUBJECTS[:3] * 4
+
+        with mock.patch.object(BatchRiskCalculator, "from_subjects", wraps=BatchRiskCalculator.from_subjects) as spy:
+            risk_profiles = RiskAnalysisService(store=store).run_coalesced_risk_analysis(subjects)
+
+        self.assertEqual(risk_profiles, [RiskAnalysisService().run_risk_analysis(subject) for subject in subjects])
+        self.assertEqual(spy.call_args.args[0], SUBJECTS[:3])
+        self.assertEqual(store.subjects, subjects)
+
+    def test_scoring_error_fails_every_request_of_the_batch(self):
+        batcher = RiskAnalysisBatcher(RiskAnalysisService(store=RecordingStore(fail=True)), window=0.001,
+                                      max_size=100)
+
+        results = score_concurrently(batcher, SUBJECTS[:5])
+
+        self.assertTrue(all(isinstance(result, StoreUnavailableError) for result in results))
+
+    def test_failing_subject_only_fails_its_own_request(self):
+        service = RiskAnalysisService()
+        batcher = RiskAnalysisBatcher(service, window=0.001, max_size=100)
+        failing = SUBJECTS[2]
+        from_subjects = BatchRiskCalculator.from_subjects
+
+        def from_subjects_failing(subjects):
+            if failing in subjects:
+                raise ValueError("unscorable subject")
+            return from_subjects(subjects)
+
+        with mock.patch.object(BatchRiskCalculator, "from_subjects", side_effect=from_subjects_failing):
+            results = score_concurrently(batcher, SUBJECTS[:5])
+
+        self.assertIsInstance(results[2], ValueError)
+        self.assertEqual(results[:2] + results[3:], [service.run_risk_analysis(subject)
+                                                     for subject in SUBJECTS[:2] + SUBJECTS[3:5]])
+
+    def test_oversized_subject_is_scored_with_its_batch(self):
+        service = RiskAnalysisService()
+        batcher = RiskAnalysisBatcher(service, window=0.001, max_size=100)
+        subjects = [*SUBJECTS[:3], SUBJECTS[3].copy(update={"age": 10 ** 20})]
+
+        results = score_concurrently(batcher, subjects)
+
+        self.assertEqual(results, [service.run_risk_analysis(subject) for subject in subjects])
+        self.assertEqual(batcher.batches, 1)
+
+
+def test_requests_go_through_the_batcher_when_enabled(monkeypatch):
+    client = TestClient(app)
+    service = RiskAnalysisService()
+    batcher = RiskAnalysisBatcher(service, window=0.001, max_size=256)
+    subject = SUBJECTS[0].dict()
+    expected = client.post("/risk-analysis", json=subject).json()
+    assert client.get("/risk-analysis/batcher").json() == {
+        "enabled": False, "window_ms": 0, "max_size": 0, "pending": 0, "batches": 0, "subjects": 0, "full_batches": 0,
+    }
+
+    monkeypatch.setattr(risk_analysis_controller, "risk_analysis_batcher", batcher)
+    app.dependency_overrides[get_risk_analysis_service] = lambda: service
+    try:
+        assert client.post("/risk-analysis", json=subject).json() == expected
+        assert client.post("/risk-analysis/fast", json=subject).json() == expected
+        assert client.get("/risk-analysis/batcher").json()["batches"] == 2
+        oversized_subject = {**subject, "age": 10 ** 20}
+        assert client.post("/risk-analysis", json=oversized_subject).status_code == 200
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,120 @@
+import datetime
+import unittest
+
+from src.risk_analysis.schemas.personal_information_schema import PersonalInformationSchema
+from src.risk_analysis.risk_analysis_cache import RiskAnalysisCache, subject_cache_key
+from src.risk_analysis.risk_analysis_metrics import RiskAnalysisMetrics
+from src.risk_analysis.risk_analysys_service import RiskAnalysisService
+
+
+class FakeClock:
+
+    def __init__(self, now: datetime.datetime) -> None:
+        self.now = now.timestamp()
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestRiskAnalysisCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock(datetime.datetime(2022, 6, 1))
+
+    def test_subject_cache_key_ignores_risk_answers_order(self):
+        subject = PersonalInformationSchema(
+            age=35, dependents=2, income=100000, marital_status="married", risk_questions=[0, 1, 0],
+        )
+        same_score_subject = PersonalInformationSchema(
+            age=35, dependents=2, income=100000, marital_status="married", risk_questions=[1, 0, 0],
+        )
+
+        self.assertEqual(subject_cache_key(subject), subject_cache_key(same_score_subject))
+
+    def test_get_miss_and_hit(self):
+        cache = RiskAnalysisCache(max_size=2, ttl_seconds=60, clock=self.clock)
+
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_put_evicts_least_recently_used(self):
+        cache = RiskAnalysisCache(max_size=2, ttl_seconds=60, clock=self.clock)
+
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_get_expires_after_ttl(self):
+        cache = RiskAnalysisCache(max_size=2, ttl_seconds=60, clock=self.clock)
+
+        cache.put("a", 1)
+        self.clock.now += 61
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_get_expires_at_year_boundary(self):
+        self.clock.now = datetime.datetime(2022, 12, 31, 23, 59, 30).timestamp()
+        cache = RiskAnalysisCache(max_size=2, ttl_seconds=3600, clock=self.clock)
+
+        cache.put("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+        self.clock.now += 60
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+    def test_invalid_max_size(self):
+        with self.assertRaises(ValueError):
+            RiskAnalysisCache(max_size=0, ttl_seconds=60)
+
+    def test_service_uses_cache(self):
+        cache = RiskAnalysisCache(max_size=10, ttl_seconds=60, clock=self.clock)
+        service = RiskAnalysisService(cache=cache)
+        subject = PersonalInformationSchema(
+            age=35, dependents=2, income=100000, marital_status="married", risk_questions=[0, 1, 0],
+        )
+
+        first = service.run_risk_analysis(subject)
+        second = service.run_risk_analysis(subject)
+
+        self.assertEqual(first, second)
+        self.assertEqual(service.cache_stats()["hits"], 1)
+        self.assertEqual(service.cache_stats()["misses"], 1)
+
+    def test_service_uses_cache_with_metrics(self):
+        cache = RiskAnalysisCache(max_size=10, ttl_seconds=60, clock=self.clock)
+        metrics = RiskAnalysisMetrics()
+        service = RiskAnalysisService(cache=cache, metrics=metrics)
+        subject = PersonalInformationSchema(
+            age=35, dependents=2, income=100000, marital_status="married", risk_questions=[0, 1, 0],
+        )
+        uncached_metrics = RiskAnalysisMetrics()
+        RiskAnalysisService(metrics=uncached_metrics).run_risk_analysis(subject)
+
+        first = service.run_risk_analysis(subject)
+        second = service.run_risk_analysis(subject)
+
+        self.assertEqual(first, RiskAnalysisService().run_risk_analysis(subject))
+        self.assertEqual(second, first)
+        self.assertEqual((service.cache_stats()["hits"], service.cache_stats()["misses"]), (1, 1))
+        # The rules fired by a cache hit are counted like the ones of the first request
+        self.assertEqual(metrics.rule_fired.values, {
+            labels: 2 * count for labels, count in uncached_metrics.rule_fired.values.items()
+        })
+
+    def test_service_without_cache(self):
+        self.assertEqual(RiskAnalysisService().cache_stats(), {"enabled": False})
+
+
+if __name__ == '__main__':
+    unittest.main()
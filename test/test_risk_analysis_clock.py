@@ -0,0 +1,49 @@
+import datetime
+import unittest
+
+from src.risk_analysis.risk_analysis_clock import DailyClock, next_day_boundary
+
+
+class FakeClock:
+
+    def __init__(self, now: datetime.datetime) -> None:
+        self.now = now.timestamp()
+        self.calls = 0
+
+    def __call__(self) -> float:
+        self.calls += 1
+        return self.now
+
+
+class TestDailyClock(unittest.TestCase):
+
+    def test_next_day_boundary(self):
+        self.assertEqual(
+            next_day_boundary(datetime.datetime(2022, 12, 31, 15, 30).timestamp()),
+            datetime.datetime(2023, 1, 1).timestamp(),
+        )
+
+    def test_current_year_is_refreshed_after_midnight(self):
+        clock = FakeClock(datetime.datetime(2022, 12, 31, 23, 59, 59))
+        daily_clock = DailyClock(clock)
+        self.assertEqual(daily_clock.current_year(), 2022)
+        self.assertEqual(daily_clock.today(), datetime.date(2022, 12, 31))
+
+        clock.now = datetime.datetime(2023, 1, 1).timestamp()
+        self.assertEqual(daily_clock.current_year(), 2023)
+        self.assertEqual(daily_clock.today(), datetime.date(2023, 1, 1))
+
+    def test_date_is_computed_once_a_day(self):
+        clock = FakeClock(datetime.datetime(2022, 6, 1, 8))
+        daily_clock = DailyClock(clock)
+        first = daily_clock.today()
+
+        clock.now = datetime.datetime(2022, 6, 1, 20).timestamp()
+        self.assertIs(daily_clock.today(), first)
+
+        clock.now = datetime.datetime(2022, 6, 2, 0, 0, 1).timestamp()
+        self.assertIsNot(daily_clock.today(), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
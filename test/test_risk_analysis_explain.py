@@ -0,0 +1,69 @@
+import unittest
+
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.risk_analysis.schemas.explanation_schema import ExplanationSchema
+from src.risk_analysis.schemas.personal_information_schema import PersonalInformationSchema
+from src.risk_analysis.schemas.risk_score import INSURANCE_LINES, RiskScoreEnum
+from src.risk_analysis.risk_calculator import RiskCalculator
+from src.risk_analysis.risk_analysis_explain import RiskExplainer
+from src.risk_analysis.risk_analysys_service import DEFAULT_LOOKUP_TABLE, DEFAULT_RULE_ENGINE
+from test.subject_factory import build_subjects
+
+SUBJECT = {"age": 62, "dependents": 2, "house": {"ownership_status": "mortgaged"}, "income": 150000,
+           "marital_status": "married", "risk_questions": [0, 1, 0], "vehicle": {"year": 2018}}
+
+
+class TestRiskExplainer(unittest.TestCase):
+
+    def test_explanation_adds_up_to_the_profile(self):
+        explainer = RiskExplainer(DEFAULT_LOOKUP_TABLE)
+
+        for subject in build_subjects():
+            explanation = explainer.explain(subject)
+            self.assertEqual(explanation["risk_profile"], DEFAULT_LOOKUP_TABLE.calculate_subject_score(subject))
+            self.assertEqual(explanation["fired_rules"], DEFAULT_RULE_ENGINE.fired_rules(subject))
+            for line in INSURANCE_LINES:
+                line_explanation = explanation["lines"][line]
+                rules = line_explanation["rules"]
+                self.assertEqual(line_explanation["base_score"], RiskCalculator(subject).subject_risk_answers())
+                self.assertEqual(line_explanation["score"],
+                                 line_explanation["base_score"] + sum(rule["delta"] for rule in rules))
+                expected = RiskScoreEnum.ineligible if any(rule["ineligible"] for rule in rules) \
+                    else RiskCalculator.get_risk_score(line_explanation["score"])
+                self.assertEqual(line_explanation["risk_score"], expected)
+
+    def test_explanation_lists_only_the_rules_of_its_line(self):
+        explanation = RiskExplainer(DEFAULT_LOOKUP_TABLE).explain(PersonalInformationSchema.parse_obj(SUBJECT))
+
+        self.assertEqual(explanation["lines"]["auto"]["rules"],
+                         [{"name": "income_under_threshold", "delta": -1, "ineligible": False}])
+        self.assertEqual(explanation["lines"]["life"]["rules"][-1],
+                         {"name": "over_max_age", "delta": 0, "ineligible": True})
+
+    def test_cell_explanation_is_built_once(self):
+        explainer = RiskExplainer(DEFAULT_LOOKUP_TABLE)
+        subject = build_subjects()[0]
+        same_cell_subject = subject.copy(update={"risk_questions": list(reversed(subject.risk_questions))})
+
+        self.assertIs(explainer.explain(subject), explainer.explain(same_cell_subject))
+        self.assertEqual(sum(explanation is not None for explanation in explainer.explanations), 1)
+
+
+def test_explain_query_parameter():
+    client = TestClient(app)
+
+    explained = client.post("/risk-analysis?explain=true", json=SUBJECT)
+    default = client.post("/risk-analysis", json=SUBJECT)
+    not_explained = client.post("/risk-analysis?explain=false", json=SUBJECT)
+    invalid = client.post("/risk-analysis?explain=maybe", json=SUBJECT)
+
+    assert explained.status_code == 200
+    assert ExplanationSchema.parse_obj(explained.json()).risk_profile.dict() == default.json()
+    assert explained.headers["X-Rule-Set-Version"] == explained.json()["version"]
+    assert not_explained.json() == default.json()
+    assert invalid.status_code == 422
+    assert invalid.json() == {"detail": [{
+        "loc": ["query", "explain"], "msg": "value could not be parsed to a boolean", "type": "type_error.bool",
+    }]}
@@ -0,0 +1,138 @@
+import multiprocessing
+import sys
+import unittest
+
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.risk_analysis.risk_analysis_idempotency import IdempotencyKeyReusedError, IdempotencyMiddleware, \
+    SharedResponseCache, decode_response, encode_response, key_digest
+from src.risk_analysis.risk_analysis_controller import IDEMPOTENT_PATHS, RULE_SET_VERSION_HEADER
+
+SUBJECT = {"age": 35, "dependents": 2, "house": {"ownership_status": "owned"}, "income": 0,
+           "marital_status": "married", "risk_questions": [0, 1, 0], "vehicle": {"year": 2018}}
+FINGERPRINT = key_digest(b"body")
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def store_in_child(cache):
+    cache.put(key_digest(b"child"), FINGERPRINT, b"from the child")
+
+
+class TestSharedResponseCache(unittest.TestCase):
+
+    def test_put_and_get(self):
+        cache = SharedResponseCache(slots=64, value_size=32, ttl_seconds=10)
+
+        self.assertTrue(cache.put(key_digest(b"a"), FINGERPRINT, b"profile"))
+
+        self.assertEqual(cache.get(key_digest(b"a"), FINGERPRINT), b"profile")
+        self.assertIsNone(cache.get(key_digest(b"b"), FINGERPRINT))
+        self.assertEqual((cache.hits, cache.misses, cache.stores), (1, 1, 1))
+
+    def test_key_reused_with_another_body(self):
+        cache = SharedResponseCache(slots=64, value_size=32, ttl_seconds=10)
+        cache.put(key_digest(b"a"), FINGERPRINT, b"profile")
+
+        with self.assertRaises(IdempotencyKeyReusedError):
+            cache.get(key_digest(b"a"), key_digest(b"another body"))
+
+    def test_entries_expire_and_their_slots_are_reused(self):
+        clock = FakeClock()
+        cache = SharedResponseCache(slots=4, value_size=32, ttl_seconds=10, stripes=1, clock=clock)
+        for name in [b"a", b"b", b"c", b"d"]:
+            cache.put(key_digest(name), FINGERPRINT, name)
+
+        clock.now += 10
+        self.assertIsNone(cache.get(key_digest(b"a"), FINGERPRINT))
+        cache.put(key_digest(b"e"), FINGERPRINT, b"e")
+
+        self.assertEqual(cache.get(key_digest(b"e"), FINGERPRINT), b"e")
+        self.assertEqual(cache.replaced, 0)
+
+    def test_full_probe_window_replaces_the_entry_expiring_first(self):
+        clock = FakeClock()
+        cache = SharedResponseCache(slots=4, value_size=32, ttl_seconds=10, stripes=1, clock=clock)
+        for name in [b"a", b"b", b"c", b"d", b"e"]:
+            cache.put(key_digest(name), FINGERPRINT, name)
+            clock.now += 1
+
+        self.assertIsNone(cache.get(key_digest(b"a"), FINGERPRINT))
+        self.assertEqual([cache.get(key_digest(name), FINGERPRINT) for name in [b"b", b"c", b"d", b"e"]],
+                         [b"b", b"c", b"d", b"e"])
+        self.assertEqual(cache.replaced, 1)
+
+    def test_value_too_large(self):
+        cache = SharedResponseCache(slots=64, value_size=4, ttl_seconds=10)
+
+        self.assertFalse(cache.put(key_digest(b"a"), FINGERPRINT, b"profile"))
+        self.assertEqual(cache.too_large, 1)
+
+    @unittest.skipIf(sys.platform == "win32", "workers are forked")
+    def test_table_is_shared_with_forked_processes(self):
+        cache = SharedResponseCache(slots=64, value_size=32, ttl_seconds=10)
+        child = multiprocessing.get_context("fork").Process(target=store_in_child, args=(cache,))
+        child.start()
+        child.join()
+
+        self.assertEqual(cache.get(key_digest(b"child"), FINGERPRINT), b"from the child")
+
+    def test_response_encoding(self):
+        headers = [(b"content-type", b"application/json"), (b"x-rule-set-version", b"2022.1")]
+
+        self.assertEqual(decode_response(encode_response(headers, b'{"auto": "regular"}')),
+                         (headers, b'{"auto": "regular"}'))
+
+
+class CountingApp:
+    def __init__(self, asgi_app):
+        self.app = asgi_app
+        self.calls = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            self.calls += 1
+        await self.app(scope, receive, send)
+
+
+def test_retries_are_answered_without_calling_the_app():
+    counting_app = CountingApp(app)
+    cache = SharedResponseCache(slots=64, value_size=256, ttl_seconds=10)
+    client = TestClient(IdempotencyMiddleware(counting_app, cache, IDEMPOTENT_PATHS, [RULE_SET_VERSION_HEADER]))
+
+    first = client.post("/risk-analysis", json=SUBJECT, headers={"Idempotency-Key": "1"})
+    retry = client.post("/risk-analysis", json=SUBJECT, headers={"Idempotency-Key": "1"})
+
+    assert counting_app.calls == 1
+    assert retry.content == first.content
+    assert retry.headers["content-type"] == first.headers["content-type"]
+    assert retry.headers[RULE_SET_VERSION_HEADER] == first.headers[RULE_SET_VERSION_HEADER]
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+
+    other_route = client.post("/risk-analysis/fast", json=SUBJECT, headers={"Idempotency-Key": "1"})
+    reused = client.post("/risk-analysis", json={**SUBJECT, "age": 36}, headers={"Idempotency-Key": "1"})
+    assert other_route.json() == first.json() and counting_app.calls == 2
+    assert reused.status_code == 422 and counting_app.calls == 2
+
+
+def test_only_successful_responses_are_stored():
+    counting_app = CountingApp(app)
+    cache = SharedResponseCache(slots=64, value_size=256, ttl_seconds=10)
+    client = TestClient(IdempotencyMiddleware(counting_app, cache, IDEMPOTENT_PATHS))
+
+    for _ in range(2):
+        assert client.post("/risk-analysis", json={**SUBJECT, "age": -1}, headers={"Idempotency-Key": "2"}) \
+                   .status_code == 422
+    for _ in range(2):
+        assert client.post("/risk-analysis", json=SUBJECT).status_code == 200
+
+    assert counting_app.calls == 4
+    assert cache.stores == 0
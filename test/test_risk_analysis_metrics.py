@@ -0,0 +1,160 @@
+import unittest
+
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.risk_analysis.schemas.personal_information_schema import PersonalInformationSchema
+from src.risk_analysis.risk_analysis_metrics import (
+    Counter, Histogram, RiskAnalysisMetrics, instrumented_route_class,
+)
+from src.risk_analysis.risk_analysys_service import RiskAnalysisService, DEFAULT_LOOKUP_TABLE, DEFAULT_RULE_ENGINE
+from src.risk_analysis.risk_batch_calculator import BatchRiskCalculator
+from test.subject_factory import CURRENT_YEAR, build_subjects
+
+
+def build_instrumented_app(metrics, service):
+    router = APIRouter(route_class=instrumented_route_class(metrics))
+
+    @router.post("/score")
+    async def score(subject: PersonalInformationSchema):
+        return service.run_risk_analysis(subject)
+
+    instrumented_app = FastAPI()
+    instrumented_app.include_router(router)
+    return instrumented_app
+
+
+class TestRiskAnalysisMetrics(unittest.TestCase):
+
+    def test_counter_render(self):
+        counter = Counter("rule_fired_total", "Rule hits.", ["rule"])
+
+        counter.inc(2, "married")
+        counter.inc(1, "married")
+        counter.inc(1, "no_income")
+
+        self.assertEqual(counter.render(), [
+            "# HELP rule_fired_total Rule hits.",
+            "# TYPE rule_fired_total counter",
+            'rule_fired_total{rule="married"} 3',
+            'rule_fired_total{rule="no_income"} 1',
+        ])
+
+    def test_histogram_render_is_cumulative(self):
+        histogram = Histogram("seconds", "Latency.", ["stage"], buckets=(0.1, 1.0))
+
+        histogram.observe(0.05, "score")
+        histogram.observe(0.5, "score")
+        histogram.observe(2.0, "score")
+
+        self.assertEqual(histogram.render(), [
+            "# HELP seconds Latency.",
+            "# TYPE seconds histogram",
+            'seconds_bucket{stage="score",le="0.1"} 1',
+            'seconds_bucket{stage="score",le="1.0"} 2',
+            'seconds_bucket{stage="score",le="+Inf"} 3',
+            'seconds_sum{stage="score"} 2.55',
+            'seconds_count{stage="score"} 3',
+        ])
+
+    def test_fired_rules_of_ineligible_subject(self):
+        subject = PersonalInformationSchema(
+            age=35, dependents=2, income=0, marital_status="married", risk_questions=[0, 1, 0],
+            house={"ownership_status": "mortgaged"}, vehicle={"year": CURRENT_YEAR - 1},
+        )
+
+        self.assertEqual(DEFAULT_RULE_ENGINE.fired_rules(subject), ["no_income"])
+
+    def test_lookup_table_fired_rules_match_rule_engine(self):
+        for subject in build_subjects():
+            index = DEFAULT_LOOKUP_TABLE.calculate_subject_index(subject)
+            self.assertEqual(list(DEFAULT_LOOKUP_TABLE.fired_rules[index]), DEFAULT_RULE_ENGINE.fired_rules(subject))
+
+    def test_batch_counts_match_single_counts(self):
+        subjects = build_subjects()
+        single_metrics = RiskAnalysisMetrics()
+        batch_metrics = RiskAnalysisMetrics()
+
+        for subject in subjects:
+            RiskAnalysisService(metrics=single_metrics).run_risk_analysis(subject)
+        RiskAnalysisService(metrics=batch_metrics).run_batch_risk_analysis(subjects)
+
+        self.assertEqual(batch_metrics.subjects_scored.values, {(): len(subjects)})
+        self.assertEqual(batch_metrics.rule_fired.values, single_metrics.rule_fired.values)
+
+    def test_service_buckets_subject_once(self):
+        metrics = RiskAnalysisMetrics()
+        service = RiskAnalysisService(metrics=metrics)
+        calls = []
+        lookup_table = DEFAULT_LOOKUP_TABLE
+
+        class CountingLookupTable:
+            table = lookup_table.table
+            fired_rules = lookup_table.fired_rules
+            version = lookup_table.version
+
+            def calculate_subject_index(self, subject):
+                calls.append("index")
+                return lookup_table.calculate_subject_index(subject)
+
+            def calculate_subject_score(self, subject):
+                calls.append("score")
+                return lookup_table.calculate_subject_score(subject)
+
+        service.lookup_table = CountingLookupTable()
+        for subject in build_subjects()[:10]:
+            self.assertEqual(service.run_risk_analysis(subject), lookup_table.calculate_subject_score(subject))
+
+        self.assertEqual(calls, ["index"] * 10)
+
+    def test_count_cells(self):
+        subjects = build_subjects()[:50]
+        metrics = RiskAnalysisMetrics()
+
+        metrics.count_cells(
+            DEFAULT_LOOKUP_TABLE, BatchRiskCalculator.from_subjects(subjects).calculate_indexes(DEFAULT_LOOKUP_TABLE),
+        )
+
+        self.assertEqual(sum(metrics.subjects_scored.values.values()), 50)
+
+    def test_instrumented_route_records_stages(self):
+        metrics = RiskAnalysisMetrics()
+        client = TestClient(build_instrumented_app(metrics, RiskAnalysisService(metrics=metrics)))
+
+        response = client.post("/score", json={
+            "age": 35, "dependents": 2, "income": 0, "marital_status": "married", "risk_questions": [0, 1, 0],
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(metrics.stage_seconds.series),
+            [("/score", "parse"), ("/score", "score"), ("/score", "serialize"), ("/score", "validate")],
+        )
+        self.assertEqual(sum(metrics.request_seconds.series[("/score",)][0]), 1)
+        self.assertEqual(metrics.rule_fired.values, {("no_income",): 1})
+        self.assertIn('risk_analysis_rule_fired_total{rule="no_income"} 1', metrics.render())
+
+    def test_instrumented_route_records_invalid_request(self):
+        metrics = RiskAnalysisMetrics()
+        client = TestClient(build_instrumented_app(metrics, RiskAnalysisService(metrics=metrics)))
+
+        response = client.post("/score", json={"age": -1})
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(sorted(metrics.stage_seconds.series), [("/score", "parse"), ("/score", "validate")])
+        self.assertEqual(metrics.rule_fired.values, {})
+
+    def test_disabled_metrics_use_plain_route(self):
+        metrics = RiskAnalysisMetrics(enabled=False)
+
+        self.assertEqual(instrumented_route_class(metrics).__name__, "APIRoute")
+        self.assertEqual(metrics.render(), "")
+
+
+def test_metrics_route_disabled_by_default():
+    response = TestClient(app).get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.text == ""
@@ -0,0 +1,114 @@
+import asyncio
+import unittest
+
+import msgpack
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.risk_analysis.risk_analysis_msgpack import MSGPACK_MEDIA_TYPE, INVALID_STREAM_ERROR, ITEM_TOO_LONG_ERROR, \
+    stream_msgpack_risk_analysis
+from src.risk_analysis.risk_analysys_service import RiskAnalysisService
+from test.subject_factory import build_subjects
+
+client = TestClient(app)
+HEADERS = {"content-type": MSGPACK_MEDIA_TYPE}
+SUBJECT = {"age": 35, "dependents": 2, "house": {"ownership_status": "owned"}, "income": 0,
+           "marital_status": "married", "risk_questions": [0, 1, 0], "vehicle": {"year": 2018}}
+# A sample of the subjects of the factory, each one is also posted to POST /risk-analysis
+SUBJECTS = build_subjects()[::97]
+
+
+async def chunked(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def unpack_all(data):
+    unpacker = msgpack.Unpacker()
+    unpacker.feed(data)
+    return list(unpacker)
+
+
+def collect_answers(*chunks, max_item_bytes=1024):
+    async def collect():
+        service = RiskAnalysisService()
+        return [part async for part in stream_msgpack_risk_analysis(chunked(*chunks), service,
+                                                                    max_item_bytes=max_item_bytes)]
+    return unpack_all(b"".join(asyncio.run(collect())))
+
+
+class TestStreamMsgpackRiskAnalysis(unittest.TestCase):
+
+    def test_subjects_split_across_chunks(self):
+        body = b"".join(msgpack.packb(subject.dict()) for subject in SUBJECTS)
+        expected = [client.post("/risk-analysis", json=subject.dict()).json() for subject in SUBJECTS]
+
+        answers = collect_answers(body[:10], body[10:57], body[57:])
+
+        self.assertEqual(answers, [{"index": index, "profile": profile} for index, profile in enumerate(expected)])
+
+    def test_invalid_subject_does_not_stop_the_stream(self):
+        body = msgpack.packb({**SUBJECT, "age": -1}) + msgpack.packb(SUBJECT)
+
+        answers = collect_answers(body)
+
+        self.assertEqual(answers[0], {"index": 0, "detail": client.post(
+            "/risk-analysis", json={**SUBJECT, "age": -1}).json()["detail"]})
+        self.assertEqual(answers[1], {"index": 1, "profile": client.post("/risk-analysis", json=SUBJECT).json()})
+
+    def test_invalid_or_truncated_data_ends_the_stream(self):
+        subject = msgpack.packb(SUBJECT)
+
+        invalid = collect_answers(subject + b"\xc1" + subject)
+        truncated = collect_answers(subject, subject[:-3])
+
+        self.assertEqual(invalid[1:], [{"index": 1, "detail": [INVALID_STREAM_ERROR]}])
+        self.assertEqual(truncated[1:], [{"index": 1, "detail": [INVALID_STREAM_ERROR]}])
+
+    def test_item_too_long(self):
+        body = msgpack.packb(SUBJECT) + msgpack.packb({**SUBJECT, "padding": "x" * 100}) + msgpack.packb(SUBJECT)
+
+        answers = collect_answers(body, max_item_bytes=128)
+
+        self.assertEqual(answers, [{"index": 0, "profile": answers[0]["profile"]},
+                                   {"index": 1, "detail": [ITEM_TOO_LONG_ERROR]}])
+
+
+def test_run_msgpack_risk_analysis():
+    for subject in SUBJECTS:
+        response = client.post("/risk-analysis/msgpack", data=msgpack.packb(subject.dict()), headers=HEADERS)
+        expected = client.post("/risk-analysis", json=subject.dict())
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == MSGPACK_MEDIA_TYPE
+        assert response.headers["X-Rule-Set-Version"] == expected.headers["X-Rule-Set-Version"]
+        assert msgpack.unpackb(response.content) == expected.json()
+
+
+def test_run_msgpack_risk_analysis_coerces_like_the_schema():
+    response = client.post("/risk-analysis/msgpack", data=msgpack.packb({**SUBJECT, "age": "35"}), headers=HEADERS)
+
+    assert msgpack.unpackb(response.content) == client.post("/risk-analysis", json=SUBJECT).json()
+
+
+def test_run_msgpack_risk_analysis_errors():
+    for body in [{**SUBJECT, "age": -1}, {**SUBJECT, "age": "old"}, {"age": 35}, [SUBJECT]]:
+        response = client.post("/risk-analysis/msgpack", data=msgpack.packb(body), headers=HEADERS)
+        expected = client.post("/risk-analysis", json=body)
+        assert (response.status_code, response.json()) == (expected.status_code, expected.json())
+
+    assert client.post("/risk-analysis/msgpack", data=b"\xc1", headers=HEADERS).status_code == 400
+    assert client.post("/risk-analysis/msgpack", data=b"", headers=HEADERS).status_code == 422
+
+
+def test_run_msgpack_stream_risk_analysis():
+    def body_chunks():
+        for subject in SUBJECTS:
+            yield msgpack.packb(subject.dict())
+
+    response = client.post("/risk-analysis/msgpack/stream", data=body_chunks(), headers=HEADERS)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == MSGPACK_MEDIA_TYPE
+    assert [answer["profile"] for answer in unpack_all(response.content)] == \
+           [client.post("/risk-analysis", json=subject.dict()).json() for subject in SUBJECTS]
@@ -0,0 +1,119 @@
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.risk_analysis.risk_analysis_rate_limit import RateLimitMiddleware, TokenBucketLimiter, client_key
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def build_limited_app(limiter, key_header=None):
+    limited_app = FastAPI()
+
+    @limited_app.get("/risk-analysis/cache")
+    async def limited():
+        return {}
+
+    @limited_app.get("/health")
+    async def health():
+        return {}
+
+    limited_app.add_middleware(RateLimitMiddleware, limiter=limiter, path_prefix="/risk-analysis",
+                               key_header=key_header)
+    return limited_app
+
+
+class TestTokenBucketLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_burst_then_limited(self):
+        limiter = TokenBucketLimiter(rate=2, burst=3, clock=self.clock)
+
+        self.assertEqual([limiter.acquire("a") for _ in range(3)], [0, 0, 0])
+        self.assertEqual(limiter.acquire("a"), 0.5)
+        self.assertEqual(limiter.acquire("b"), 0)
+        self.assertEqual(limiter.limited, 1)
+
+    def test_tokens_refill_lazily_up_to_burst(self):
+        limiter = TokenBucketLimiter(rate=2, burst=3, clock=self.clock)
+        for _ in range(3):
+            limiter.acquire("a")
+
+        self.clock.now = 0.5
+        self.assertEqual(limiter.acquire("a"), 0)
+        self.assertGreater(limiter.acquire("a"), 0)
+        self.clock.now = 100
+        self.assertEqual([limiter.acquire("a") for _ in range(3)], [0, 0, 0])
+        self.assertGreater(limiter.acquire("a"), 0)
+
+    def test_idle_buckets_are_evicted(self):
+        limiter = TokenBucketLimiter(rate=1, burst=2, shards=1, clock=self.clock)
+        for key in range(100):
+            limiter.acquire(str(key))
+
+        self.clock.now = 2
+        for key in range(100, 150):
+            limiter.acquire(str(key))
+
+        self.assertEqual(len(limiter), 50)
+        self.assertEqual(limiter.evictions, 100)
+
+    def test_store_is_bounded(self):
+        limiter = TokenBucketLimiter(rate=1, burst=2, max_keys=64, shards=4, clock=self.clock)
+
+        for key in range(10000):
+            limiter.acquire(str(key))
+
+        self.assertLessEqual(len(limiter), 64)
+
+    def test_invalid_configuration(self):
+        with self.assertRaises(ValueError):
+            TokenBucketLimiter(rate=0, burst=1)
+        with self.assertRaises(ValueError):
+            TokenBucketLimiter(rate=1, burst=1, shards=3)
+
+    def test_client_key(self):
+        scope = {"headers": [(b"x-forwarded-for", b"10.0.0.1, 10.0.0.2")], "client": ("127.0.0.1", 5000)}
+
+        self.assertEqual(client_key(scope), "127.0.0.1")
+        self.assertEqual(client_key(scope, b"x-forwarded-for"), "10.0.0.1")
+        self.assertEqual(client_key({"headers": [], "client": None}), "")
+
+
+class TestRateLimitMiddleware(unittest.TestCase):
+
+    def test_limited_requests_answer_too_many_requests(self):
+        client = TestClient(build_limited_app(TokenBucketLimiter(rate=0.5, burst=2)))
+
+        statuses = [client.get("/risk-analysis/cache").status_code for _ in range(3)]
+        response = client.get("/risk-analysis/cache")
+
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["retry-after"], "2")
+        self.assertEqual(response.json(), {"detail": "Too Many Requests"})
+
+    def test_other_routes_are_not_limited(self):
+        client = TestClient(build_limited_app(TokenBucketLimiter(rate=0.5, burst=1)))
+
+        self.assertEqual({client.get("/health").status_code for _ in range(5)}, {200})
+
+    def test_clients_are_limited_separately(self):
+        client = TestClient(build_limited_app(TokenBucketLimiter(rate=0.5, burst=1), key_header="X-Forwarded-For"))
+
+        first = [client.get("/risk-analysis/cache", headers={"X-Forwarded-For": "10.0.0.1"}).status_code
+                 for _ in range(2)]
+        second = client.get("/risk-analysis/cache", headers={"X-Forwarded-For": "10.0.0.2"}).status_code
+
+        self.assertEqual(first, [200, 429])
+        self.assertEqual(second, 200)
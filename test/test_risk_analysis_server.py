@@ -0,0 +1,68 @@
+import gc
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+
+from src.main import app
+from src.risk_analysis import risk_analysis_controller, risk_analysis_startup
+from src.risk_analysis.risk_analysis_server import event_loop_and_parser, warm_up
+from benchmarks.bench_server import free_port, start_server
+
+SUBJECT = {
+    "age": 35, "dependents": 2, "house": {"ownership_status": "owned"}, "income": 0,
+    "marital_status": "married", "risk_questions": [0, 1, 0], "vehicle": {"year": 2018},
+}
+
+
+class TestRiskAnalysisServer(unittest.TestCase):
+
+    def test_event_loop_and_parser(self):
+        implementations = event_loop_and_parser()
+
+        self.assertIn(implementations["loop"], ("uvloop", "asyncio"))
+        self.assertIn(implementations["http"], ("httptools", "h11"))
+
+    def test_warm_up_freezes_heap(self):
+        try:
+            warm_up(app)
+            self.assertGreater(gc.get_freeze_count(), 0)
+            self.assertIsNotNone(app.openapi_schema)
+        finally:
+            gc.unfreeze()
+
+    def test_warm_up_uses_the_configured_service(self):
+        with mock.patch.object(risk_analysis_startup, "warm_up") as startup_warm_up:
+            try:
+                warm_up(app)
+            finally:
+                gc.unfreeze()
+
+        startup_warm_up.assert_called_once_with(app, risk_analysis_controller.risk_analysis_service)
+
+    @unittest.skipIf(sys.platform == "win32", "workers are forked")
+    def test_workers_write_store_on_graceful_shutdown(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "risk_analysis.db")
+            os.environ["RISK_ANALYSIS_STORE_DB_PATH"] = path
+            try:
+                port = free_port()
+                server = start_server(port, 2)
+            finally:
+                del os.environ["RISK_ANALYSIS_STORE_DB_PATH"]
+            try:
+                responses = [requests.post(f"http://127.0.0.1:{port}/risk-analysis", json=SUBJECT) for _ in range(10)]
+            finally:
+                server.send_signal(signal.SIGTERM)
+                returncode = server.wait(30)
+
+            self.assertEqual({response.status_code for response in responses}, {200})
+            self.assertEqual(returncode, 0)
+            with sqlite3.connect(path) as connection:
+                self.assertEqual(connection.execute("SELECT COUNT(*) FROM risk_analysis").fetchone()[0], 10)
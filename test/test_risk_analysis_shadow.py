@@ -0,0 +1,110 @@
+import asyncio
+import unittest
+
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.risk_analysis.risk_analysis_rules import DEFAULT_RULE_SET
+from src.risk_analysis.risk_analysis_shadow import ShadowScorer
+from src.risk_analysis.risk_analysys_service import DEFAULT_LOOKUP_TABLE, RiskAnalysisService
+from src.risk_analysis.risk_lookup_table import RiskLookupTable
+from src.risk_analysis.risk_rule_engine import RuleEngine
+from src.risk_analysis.schemas.risk_score import INSURANCE_LINES
+from risk_analysis.risk_analysis_controller import get_risk_analysis_service
+from test.subject_factory import build_subjects
+
+# The default rule set with the income threshold lowered from 200000 to 100000
+LOWER_INCOME_THRESHOLD = DEFAULT_RULE_SET.copy(deep=True)
+LOWER_INCOME_THRESHOLD.version = "2"
+LOWER_INCOME_THRESHOLD.rules[1].conditions[0].value = 100000
+CANDIDATE = RiskLookupTable(RuleEngine(LOWER_INCOME_THRESHOLD))
+
+SUBJECTS = build_subjects()[::37]
+
+
+def divergences(subjects):
+    """Divergent subjects per line, scored one at a time"""
+    counts = dict.fromkeys(INSURANCE_LINES, 0)
+    for subject in subjects:
+        active = DEFAULT_LOOKUP_TABLE.calculate_subject_score(subject)
+        candidate = CANDIDATE.calculate_subject_score(subject)
+        for line in INSURANCE_LINES:
+            counts[line] += active[line] != candidate[line]
+    return counts
+
+
+def compare_all(shadow, service, subjects):
+    async def run():
+        await shadow.start()
+        for subject in subjects:
+            service.run_risk_analysis(subject)
+        await shadow.close()
+    asyncio.run(run())
+
+
+class TestShadowScorer(unittest.TestCase):
+
+    def test_counts_divergences_per_line(self):
+        shadow = ShadowScorer(CANDIDATE, batch_size=16, sample_size=3, seed=1)
+        compare_all(shadow, RiskAnalysisService(shadow=shadow), SUBJECTS)
+
+        stats = shadow.stats()
+        self.assertEqual(stats["compared"], len(SUBJECTS))
+        self.assertEqual({line: stats["lines"][line]["divergent"] for line in INSURANCE_LINES}, divergences(SUBJECTS))
+        self.assertGreater(stats["divergent"], 0)
+        for line in INSURANCE_LINES:
+            for example in stats["lines"][line]["examples"]:
+                self.assertEqual(example["active_version"], DEFAULT_LOOKUP_TABLE.version)
+                self.assertNotEqual(example["active"][line], example["candidate"][line])
+            self.assertEqual(len(stats["lines"][line]["examples"]), min(3, stats["lines"][line]["divergent"]))
+
+    def test_same_rule_set_never_diverges(self):
+        shadow = ShadowScorer(DEFAULT_LOOKUP_TABLE)
+        compare_all(shadow, RiskAnalysisService(shadow=shadow), SUBJECTS)
+
+        self.assertEqual(shadow.stats()["compared"], len(SUBJECTS))
+        self.assertEqual(shadow.stats()["divergent"], 0)
+        self.assertEqual(shadow.stats()["lines"]["auto"], {"divergent": 0, "transitions": {}, "examples": []})
+
+    def test_full_queue_drops_subjects(self):
+        shadow = ShadowScorer(CANDIDATE, max_pending=4)
+
+        async def run():
+            await shadow.start()
+            # The worker only runs once the event loop is given back
+            for subject in SUBJECTS[:6]:
+                shadow.submit(subject, DEFAULT_LOOKUP_TABLE)
+            shadow.submit_many(SUBJECTS[6:10], DEFAULT_LOOKUP_TABLE)
+            await shadow.close()
+        asyncio.run(run())
+
+        self.assertEqual((shadow.compared, shadow.dropped), (4, 6))
+
+    def test_subjects_are_dropped_while_stopped(self):
+        shadow = ShadowScorer(CANDIDATE)
+        RiskAnalysisService(shadow=shadow).run_batch_risk_analysis(SUBJECTS[:3])
+
+        self.assertEqual((shadow.compared, shadow.dropped), (0, 3))
+
+
+def test_shadow_stats_route():
+    shadow = ShadowScorer(CANDIDATE, sample_size=2, seed=1)
+    service = RiskAnalysisService(shadow=shadow)
+    compare_all(shadow, service, SUBJECTS)
+    app.dependency_overrides[get_risk_analysis_service] = lambda: service
+    try:
+        response = TestClient(app).get("/risk-analysis/shadow")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert response.json()["candidate_version"] == "2"
+    assert response.json()["lines"]["home"]["divergent"] == divergences(SUBJECTS)["home"]
+    assert response.json()["lines"]["home"]["transitions"]
+
+
+def test_shadow_stats_route_disabled():
+    response = TestClient(app).get("/risk-analysis/shadow")
+
+    assert response.json()["enabled"] is False
+    assert response.json()["lines"] == {}
@@ -0,0 +1,199 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from fastapi.testclient import TestClient
+
+from src.main import app
+# The app imports the package as `risk_analysis`, its exception handlers only catch the errors of that copy
+from risk_analysis.schemas.personal_information_schema import PersonalInformationSchema
+from risk_analysis.risk_analysis_controller import get_risk_analysis_service
+from risk_analysis.risk_analysys_service import RiskAnalysisService
+from risk_analysis.risk_analysis_store import RiskAnalysisStore, StoreBatchTooLargeError, StoreUnavailableError
+from test.subject_factory import build_subjects
+
+SUBJECT = PersonalInformationSchema(
+    age=35, dependents=2, income=0, marital_status="married", risk_questions=[0, 1, 1],
+    house={"ownership_status": "owned"}, vehicle={"year": 2018},
+)
+PROFILE = {"auto": "ineligible", "disability": "ineligible", "home": "ineligible", "life": "ineligible"}
+
+
+class TestRiskAnalysisStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "risk_analysis.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def rows(self):
+        with sqlite3.connect(self.path) as connection:
+            return connection.execute(
+                "SELECT scored_at, rule_set_version, age, dependents, income, marital_status, house_status, "
+                "vehicle_year, risk_answers, auto, disability, home, life FROM risk_analysis ORDER BY id"
+            ).fetchall()
+
+    def test_close_writes_queued_records(self):
+        store = RiskAnalysisStore(self.path, clock=lambda: 1654041600.0)
+
+        async def run():
+            await store.start()
+            store.record(SUBJECT, PROFILE, "1")
+            await store.close()
+        asyncio.run(run())
+
+        self.assertEqual(self.rows(), [(
+            1654041600.0, "1", 35, 2, 0, "married", "owned", 2018, "011",
+            "ineligible", "ineligible", "ineligible", "ineligible",
+        )])
+        self.assertEqual(store.stats()["written"], 1)
+
+    def test_database_uses_wal(self):
+        store = RiskAnalysisStore(self.path)
+
+        async def run():
+            await store.start()
+            await store.close()
+        asyncio.run(run())
+
+        with sqlite3.connect(self.path) as connection:
+            self.assertEqual(connection.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+    def test_records_are_written_in_batches(self):
+        store = RiskAnalysisStore(self.path, batch_size=10, flush_interval=0.01)
+
+        async def run():
+            await store.start()
+            store.record_many([SUBJECT] * 25, [PROFILE] * 25, "1")
+            await store.close()
+        asyncio.run(run())
+
+        self.assertEqual(len(self.rows()), 25)
+        self.assertEqual(store.stats()["batches"], 3)
+
+    def test_full_queue_rejects_records(self):
+        store = RiskAnalysisStore(self.path, max_pending=2, flush_interval=0.01)
+
+        async def run():
+            await store.start()
+            store.record(SUBJECT, PROFILE, "1")
+            with self.assertRaises(StoreUnavailableError):
+                store.record_many([SUBJECT] * 2, [PROFILE] * 2, "1")
+            await store.close()
+        asyncio.run(run())
+
+        self.assertEqual(len(self.rows()), 1)
+        self.assertEqual(store.stats()["rejected"], 2)
+
+    def test_close_does_not_wait_for_flush_interval(self):
+        store = RiskAnalysisStore(self.path, flush_interval=60)
+
+        async def run():
+            await store.start()
+            store.record(SUBJECT, PROFILE, "1")
+            await asyncio.sleep(0)
+            await asyncio.wait_for(store.close(), 5)
+        asyncio.run(run())
+
+        self.assertEqual(len(self.rows()), 1)
+
+    def test_full_batch_does_not_wait_for_flush_interval(self):
+        store = RiskAnalysisStore(self.path, batch_size=5, flush_interval=60)
+
+        async def run():
+            await store.start()
+            store.record(SUBJECT, PROFILE, "1")
+            await asyncio.sleep(0)
+            store.record_many([SUBJECT] * 4, [PROFILE] * 4, "1")
+            for _ in range(100):
+                if store.written:
+                    break
+                await asyncio.sleep(0.01)
+            written = store.written
+            await store.close()
+            return written
+        self.assertEqual(asyncio.run(run()), 5)
+
+    def test_failed_write_is_counted_and_writer_goes_on(self):
+        store = RiskAnalysisStore(self.path, flush_interval=0.01)
+        bad_profile = {**PROFILE, "life": object()}
+
+        async def run():
+            await store.start()
+            store.record(SUBJECT, bad_profile, "1")
+            await asyncio.sleep(0.1)
+            store.record(SUBJECT, PROFILE, "1")
+            await store.close()
+        with self.assertLogs("risk_analysis.risk_analysis_store", level="ERROR"):
+            asyncio.run(run())
+
+        self.assertEqual(len(self.rows()), 1)
+        self.assertEqual(store.stats()["failed"], 1)
+        self.assertIn("Error binding parameter", store.stats()["last_error"])
+
+    def test_batch_larger_than_queue_is_too_large(self):
+        store = RiskAnalysisStore(self.path, max_pending=2)
+
+        with self.assertRaises(StoreBatchTooLargeError):
+            store.record_many([SUBJECT] * 3, [PROFILE] * 3, "1")
+
+    def test_record_before_start_is_rejected(self):
+        store = RiskAnalysisStore(self.path)
+
+        with self.assertRaises(StoreUnavailableError):
+            store.record(SUBJECT, PROFILE, "1")
+
+    def test_service_records_batch_with_rule_set_version(self):
+        service = RiskAnalysisService(store=RiskAnalysisStore(self.path))
+        subjects = build_subjects()[:20]
+
+        async def run():
+            await service.store.start()
+            profiles = service.run_batch_risk_analysis(subjects)
+            await service.store.close()
+            return profiles
+        profiles = asyncio.run(run())
+
+        rows = self.rows()
+        self.assertEqual(len(rows), 20)
+        self.assertEqual({row[1] for row in rows}, {service.lookup_table.version})
+        self.assertEqual([row[9:] for row in rows], [tuple(profile.values()) for profile in profiles])
+
+
+def test_full_store_answers_service_unavailable():
+    directory = tempfile.TemporaryDirectory()
+    store = RiskAnalysisStore(os.path.join(directory.name, "risk_analysis.db"))
+    app.dependency_overrides[get_risk_analysis_service] = lambda: RiskAnalysisService(store=store)
+    try:
+        # The store is not started, so every record is refused
+        response = TestClient(app).post("/risk-analysis", json=SUBJECT.dict())
+    finally:
+        app.dependency_overrides.clear()
+        directory.cleanup()
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert response.json() == {"detail": "risk analysis store is not running"}
+
+
+def test_batch_larger_than_store_queue_answers_payload_too_large():
+    store = RiskAnalysisStore(":memory:", max_pending=1)
+    app.dependency_overrides[get_risk_analysis_service] = lambda: RiskAnalysisService(store=store)
+    try:
+        response = TestClient(app).post("/risk-analysis/batch", json=[SUBJECT.dict(), SUBJECT.dict()])
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 413
+    assert response.json() == {"detail": "batches are limited to 1 subjects while the decisions are persisted"}
+
+
+def test_get_store_stats_disabled():
+    response = TestClient(app).get("/risk-analysis/store")
+
+    assert response.status_code == 200
+    assert response.json()["enabled"] is False
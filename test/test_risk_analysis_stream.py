@@ -0,0 +1,40 @@
+import asyncio
+import unittest
+
+from src.risk_analysis.risk_analysis_stream import iter_ndjson_lines
+
+
+async def chunked(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def collect_lines(*chunks, max_line_bytes=64):
+    async def collect():
+        return [line async for line in iter_ndjson_lines(chunked(*chunks), max_line_bytes)]
+    return asyncio.run(collect())
+
+
+class TestIterNdjsonLines(unittest.TestCase):
+
+    def test_lines_split_across_chunks(self):
+        self.assertEqual(
+            collect_lines(b'{"a": 1}\n{"b"', b': 2}\n', b'{"c": 3}'),
+            [(1, b'{"a": 1}'), (2, b'{"b": 2}'), (3, b'{"c": 3}')],
+        )
+
+    def test_blank_lines_are_skipped(self):
+        self.assertEqual(collect_lines(b'\n{"a": 1}\n\n  \n{"b": 2}\n'), [(2, b'{"a": 1}'), (5, b'{"b": 2}')])
+
+    def test_line_too_long(self):
+        self.assertEqual(
+            collect_lines(b'{"a": 1}\n' + b"x" * 40, b"x" * 40 + b"\n", b'{"b": 2}\n', max_line_bytes=64),
+            [(1, b'{"a": 1}'), (2, None), (3, b'{"b": 2}')],
+        )
+
+    def test_last_line_too_long(self):
+        self.assertEqual(collect_lines(b"x" * 100, max_line_bytes=64), [(1, None)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.risk_analysis.risk_lookup_table import RiskLookupTable
+from src.risk_analysis.risk_analysys_service import DEFAULT_LOOKUP_TABLE, DEFAULT_RULE_ENGINE, RiskAnalysisService
+from src.risk_analysis.risk_analysis_what_if import WhatIfAnalysis, nearest_bucket_value
+from test.subject_factory import CURRENT_YEAR, build_subjects
+from benchmarks.subjects import perturb
+
+
+class TestWhatIfAnalysis(unittest.TestCase):
+
+    def test_nearest_bucket_value(self):
+        edges = [30, 61]
+
+        self.assertEqual(nearest_bucket_value(edges, 0, 1), 29)
+        self.assertEqual(nearest_bucket_value(edges, 2, 1), 61)
+        self.assertEqual(nearest_bucket_value(edges, 1, 0), 30)
+        self.assertEqual(nearest_bucket_value(edges, 1, 2), 60)
+
+    def test_perturbations_match_scoring_the_changed_subject(self):
+        what_if = WhatIfAnalysis(DEFAULT_LOOKUP_TABLE)
+
+        for subject in build_subjects():
+            analysis = what_if.analyze(subject)
+            index = DEFAULT_LOOKUP_TABLE.calculate_subject_index(subject)
+            self.assertEqual(analysis["risk_profile"], DEFAULT_LOOKUP_TABLE.calculate_subject_score(subject))
+            for perturbation in analysis["perturbations"]:
+                changed = perturb(subject, perturbation["field"], perturbation["value"])
+                self.assertNotEqual(DEFAULT_LOOKUP_TABLE.calculate_subject_index(changed), index)
+                self.assertEqual(perturbation["risk_profile"], DEFAULT_LOOKUP_TABLE.calculate_subject_score(changed))
+
+    def test_perturbations_cross_the_thresholds(self):
+        subject = build_subjects()[0].copy(update={"age": 45, "income": 150000})
+
+        values = {}
+        for perturbation in WhatIfAnalysis(DEFAULT_LOOKUP_TABLE).analyze(subject)["perturbations"]:
+            values.setdefault(perturbation["field"], []).append(perturbation["value"])
+
+        self.assertEqual(values["age"], [29, 61])
+        self.assertEqual(values["income"], [0, 200000])
+        self.assertEqual(values["vehicle.year"], [CURRENT_YEAR - 5, CURRENT_YEAR - 6])
+        self.assertEqual(values["house.ownership_status"], ["owned", "mortgaged"])
+        self.assertEqual(values["marital_status"], ["married"])
+
+    def test_changed_lines(self):
+        subject = build_subjects()[0].copy(update={"age": 45, "income": 150000})
+
+        analysis = WhatIfAnalysis(DEFAULT_LOOKUP_TABLE).analyze(subject)
+
+        for perturbation in analysis["perturbations"]:
+            self.assertEqual(perturbation["changed_lines"], [
+                line for line, score in perturbation["risk_profile"].items() if score != analysis["risk_profile"][line]
+            ])
+
+    def test_service_builds_analysis_once_per_lookup_table(self):
+        service = RiskAnalysisService()
+        subject = build_subjects()[0]
+
+        service.run_what_if_analysis(subject)
+        what_if = service.what_if
+        service.run_what_if_analysis(subject)
+        self.assertIs(service.what_if, what_if)
+
+        service.lookup_table = RiskLookupTable(DEFAULT_RULE_ENGINE)
+        service.run_what_if_analysis(subject)
+        self.assertIs(service.what_if.lookup_table, service.lookup_table)
+
+
+def test_run_what_if_analysis():
+    subject = {
+        "age": 45, "dependents": 0, "income": 150000, "marital_status": "single", "risk_questions": [1, 0, 0],
+        "house": {"ownership_status": "owned"}, "vehicle": {"year": CURRENT_YEAR - 10},
+    }
+
+    response = TestClient(app).post("/risk-analysis/what-if", json=subject)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["risk_profile"] == TestClient(app).post("/risk-analysis", json=subject).json()
+    assert {"field": "age", "value": 61, "changed_lines": ["disability", "life"],
+            "risk_profile": {"auto": "economic", "disability": "ineligible", "home": "economic",
+                             "life": "ineligible"}} in body["perturbations"]
+
+
+def test_run_what_if_analysis_invalid_subject():
+    response = TestClient(app).post("/risk-analysis/what-if", json={"age": -1})
+
+    assert response.status_code == 422
+    assert response.json() == TestClient(app).post("/risk-analysis", json={"age": -1}).json()
@@ -0,0 +1,128 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.risk_analysis.risk_arrow_scoring import PROFILE_COLUMNS, record_batch_columns, score_parquet_file, \
+    score_record_batch
+from src.risk_analysis.risk_file_scoring import score_file
+from test.subject_factory import build_subjects
+from test.test_risk_file_scoring import expected_record
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+SUBJECTS = [json.loads(subject.json()) for subject in build_subjects()[::7]]
+
+
+def integer_answers(subjects):
+    return [{**subject, "risk_questions": [int(answer) for answer in subject["risk_questions"]]}
+            for subject in subjects]
+
+
+# Rows coerced or rejected by the schema rather than read as plain values, with the risk answers as 0/1 integers
+INTEGER_ANSWERS = integer_answers(SUBJECTS[:1])[0]
+OTHER_ROWS = [
+    {**INTEGER_ANSWERS, "age": -1},
+    {**INTEGER_ANSWERS, "marital_status": "widowed"},
+    {**INTEGER_ANSWERS, "house": {"ownership_status": "rented"}},
+    {**INTEGER_ANSWERS, "house": {"ownership_status": None}},
+    {**INTEGER_ANSWERS, "vehicle": {"year": 1800}},
+    {**INTEGER_ANSWERS, "vehicle": {"year": None}},
+    {**INTEGER_ANSWERS, "risk_questions": [1, 0]},
+    {**INTEGER_ANSWERS, "risk_questions": [1, 2, 0]},
+    {**INTEGER_ANSWERS, "risk_questions": None},
+    {**INTEGER_ANSWERS, "income": None},
+]
+
+
+
+def records(profiles):
+    """The file scoring records of a scored batch, numbered from 1"""
+    return [
+        {"line": line_number, "detail": json.loads(row["detail"])} if row["detail"] is not None
+        else {"line": line_number, "profile": {line: row[line] for line in PROFILE_COLUMNS[:-1]}}
+        for line_number, row in enumerate(profiles.to_pylist(), start=1)
+    ]
+
+
+@unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+class TestRiskArrowScoring(unittest.TestCase):
+
+    def test_record_batch_matches_risk_calculator(self):
+        batch = pyarrow.RecordBatch.from_pylist(SUBJECTS)
+
+        profiles = score_record_batch(batch)
+
+        self.assertEqual(profiles.schema.names, list(PROFILE_COLUMNS))
+        self.assertTrue(pyarrow.types.is_dictionary(profiles.schema.field("auto").type))
+        self.assertEqual(profiles.column("detail").null_count, len(SUBJECTS))
+        self.assertEqual(records(profiles), [
+            expected_record(line_number, subject) for line_number, subject in enumerate(SUBJECTS, start=1)
+        ])
+
+    def test_rows_outside_the_plain_values_are_validated_by_the_schema(self):
+        rows = [*integer_answers(SUBJECTS[1:2]), *OTHER_ROWS, *integer_answers(SUBJECTS[2:3])]
+        batch = pyarrow.RecordBatch.from_pylist(rows)
+
+        plain, _ = record_batch_columns(batch)
+        profiles = score_record_batch(batch)
+
+        self.assertEqual(plain.tolist(), [True, *[False] * len(OTHER_ROWS), True])
+        self.assertEqual(records(profiles), [
+            expected_record(line_number, row) for line_number, row in enumerate(rows, start=1)
+        ])
+
+    def test_plain_columns_are_read_without_a_copy(self):
+        batch = pyarrow.RecordBatch.from_pylist(SUBJECTS)
+
+        plain, calculator = record_batch_columns(batch)
+
+        self.assertTrue(plain.all())
+        self.assertTrue(np.shares_memory(calculator.age, batch.column("age").to_numpy()))
+        self.assertTrue(np.shares_memory(calculator.income, batch.column("income").to_numpy()))
+
+    def test_dictionaries_fixed_size_lists_and_slices(self):
+        table = pyarrow.Table.from_pylist(SUBJECTS)
+        table = table.set_column(
+            table.schema.get_field_index("marital_status"), "marital_status",
+            table.column("marital_status").dictionary_encode(),
+        ).set_column(
+            table.schema.get_field_index("risk_questions"), "risk_questions",
+            table.column("risk_questions").cast(pyarrow.list_(pyarrow.bool_(), 3)),
+        )
+        batch = table.combine_chunks().to_batches()[0].slice(5, 200)
+
+        profiles = score_record_batch(batch)
+
+        self.assertEqual(records(profiles), [
+            expected_record(line_number, subject) for line_number, subject in enumerate(SUBJECTS[5:205], start=1)
+        ])
+
+    def test_parquet_files(self):
+        rows = [*integer_answers(SUBJECTS), *OTHER_ROWS]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "subjects.parquet")
+            output_path = os.path.join(directory, "profiles.parquet")
+            pyarrow.parquet.write_table(pyarrow.Table.from_pylist(rows), path, row_group_size=300)
+
+            stats = score_parquet_file(path, output_path, batch_rows=200)
+            profiles = pyarrow.parquet.read_table(output_path)
+            output = io.BytesIO()
+            score_file(path, output, workers=1)
+
+        expected = [expected_record(line_number, row) for line_number, row in enumerate(rows, start=1)]
+        self.assertEqual((stats["rows"], stats["rejected"]), (len(rows), len(OTHER_ROWS)))
+        self.assertTrue(pyarrow.types.is_dictionary(profiles.schema.field("home").type))
+        self.assertEqual(records(profiles.combine_chunks().to_batches()[0]), expected)
+        self.assertEqual([json.loads(line) for line in output.getvalue().decode().splitlines()], expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
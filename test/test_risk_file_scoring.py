@@ -0,0 +1,197 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from pydantic import ValidationError
+
+from src.risk_analysis.schemas.personal_information_schema import PersonalInformationSchema
+from src.risk_analysis.risk_calculator import RiskCalculator
+from src.risk_analysis.risk_file_scoring import SUBJECT_COLUMNS, score_file, split_byte_ranges, \
+    subject_from_columns
+from test.subject_factory import CURRENT_YEAR, build_subjects
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+def expected_record(line_number, subject):
+    """The record of the API for one subject: its risk profile or its validation errors."""
+    try:
+        if isinstance(subject, str):
+            subject = PersonalInformationSchema.parse_raw(subject)
+        else:
+            subject = PersonalInformationSchema.parse_obj(subject)
+    except ValidationError as error:
+        record = {"line": line_number, "detail": error.errors()}
+    else:
+        record = {"line": line_number, "profile": dict(RiskCalculator(subject).calculate_subject_score())}
+    return json.loads(json.dumps(record))
+
+
+def csv_row(subject):
+    return ",".join([
+        str(subject.age),
+        str(subject.dependents),
+        str(subject.income),
+        subject.marital_status.value,
+        subject.house.ownership_status.value if subject.house else "",
+        str(subject.vehicle.year) if subject.vehicle else "",
+        *[str(int(answer)) for answer in subject.risk_questions],
+    ])
+
+
+class TestRiskFileScoring(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def score(self, name, content, **kwargs):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w") as file:
+            file.write(content)
+        output = io.BytesIO()
+        stats = score_file(path, output, **kwargs)
+        return [json.loads(line) for line in output.getvalue().decode().splitlines()], stats
+
+    def test_split_byte_ranges(self):
+        buffer = b"aaaa\nbb\ncccccc\nd"
+        self.assertEqual(split_byte_ranges(buffer, 0, 3), [(0, 5), (5, 8), (8, 15), (15, 16)])
+        self.assertEqual(split_byte_ranges(buffer, 5, 100), [(5, 16)])
+
+    def test_csv_matches_risk_calculator_in_input_order(self):
+        subjects = build_subjects()
+        content = ",".join(SUBJECT_COLUMNS) + "\n" + "".join(csv_row(subject) + "\n" for subject in subjects)
+
+        records, stats = self.score("subjects.csv", content, workers=2, chunk_bytes=4096)
+
+        self.assertGreater(stats["chunks"], 2)
+        self.assertEqual(stats["rows"], len(subjects))
+        self.assertEqual(records, [
+            expected_record(line_number, subject.dict()) for line_number, subject in enumerate(subjects, start=2)
+        ])
+
+    def test_ndjson_matches_risk_calculator_in_input_order(self):
+        lines = [subject.json() for subject in build_subjects()]
+        lines[10:10] = ["", '{"age": -1}', "not json", "[]", '{"age": "35", "dependents": 1.0, "income": "0", '
+                        '"marital_status": "single", "risk_questions": ["yes", 0, true], "vehicle": {"year": 1885}}']
+
+        records, _ = self.score("subjects.ndjson", "\n".join(lines), workers=2, chunk_bytes=4096)
+
+        self.assertEqual(records, [
+            expected_record(line_number, line) for line_number, line in enumerate(lines, start=1) if line
+        ])
+
+    def test_csv_rows_outside_the_plain_values_are_validated_by_the_schema(self):
+        rows = [
+            ["35", "0", "0", "single", "", "", "0", "1", "0"],
+            [" 35", "1", "250000", "married", "owned", str(CURRENT_YEAR - 1), "true", "no", "1"],
+            ["-1", "0", "0", "single", "", "", "0", "0", "0"],
+            ["40", "0", "1", "widowed", "rented", str(CURRENT_YEAR), "0", "0", "2"],
+            ["40", "0", "1", "single"],
+            ["3²", "0", "0", "single", "", "", "0", "0", "0"],
+            ["35", "0", "0", "single", "", "²⁰²⁰", "0", "0", "0"],
+        ]
+        content = ",".join(SUBJECT_COLUMNS) + "\n" + "".join(",".join(row) + "\n" for row in rows)
+
+        records, _ = self.score("subjects.csv", content, workers=1)
+
+        self.assertEqual(records, [
+            expected_record(line_number, subject_from_columns(dict(zip(SUBJECT_COLUMNS, row))))
+            for line_number, row in enumerate(rows, start=2)
+        ])
+
+    def test_many_chunks_keep_line_numbers_in_input_order(self):
+        subjects = build_subjects()[:200]
+        content = ",".join(SUBJECT_COLUMNS) + "\n" + "".join(csv_row(subject) + "\n" for subject in subjects)
+
+        records, stats = self.score("subjects.csv", content, workers=2, chunk_bytes=256)
+
+        self.assertGreater(stats["chunks"], 4 * stats["workers"])
+        self.assertEqual(records, [
+            expected_record(line_number, subject) for line_number, subject in enumerate(subjects, start=2)
+        ])
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_parquet_matches_csv(self):
+        subjects = build_subjects()[::7]
+        rows = [dict(zip(SUBJECT_COLUMNS, csv_row(subject).split(","))) for subject in subjects]
+        table = pyarrow.table({
+            "age": [int(row["age"]) for row in rows],
+            "dependents": [int(row["dependents"]) for row in rows],
+            "income": [int(row["income"]) for row in rows],
+            "marital_status": [row["marital_status"] for row in rows],
+            "house": [row["house"] or None for row in rows],
+            "vehicle_year": [int(row["vehicle_year"]) if row["vehicle_year"] else None for row in rows],
+            **{f"risk_{answer}": [bool(int(row[f"risk_{answer}"])) for row in rows] for answer in (1, 2, 3)},
+        })
+        path = os.path.join(self.directory.name, "subjects.parquet")
+        pyarrow.parquet.write_table(table, path, row_group_size=100)
+        output = io.BytesIO()
+
+        stats = score_file(path, output, workers=2)
+
+        self.assertEqual(stats["chunks"], len(range(0, len(subjects), 100)))
+        self.assertEqual([json.loads(line) for line in output.getvalue().decode().splitlines()], [
+            expected_record(line_number, subject) for line_number, subject in enumerate(subjects, start=1)
+        ])
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_parquet_rows_outside_the_plain_values_are_validated_by_the_schema(self):
+        table = pyarrow.table({
+            "age": [35, -1, 35, 35],
+            "dependents": [0, 0, 0, 0],
+            "income": [0, 0, 0, 0],
+            "marital_status": ["single", "single", "widowed", "married"],
+            "house": [None, None, None, "mortgaged"],
+            "vehicle_year": [None, None, None, 2018],
+            "risk_1": [0, 0, 0, 1],
+            "risk_2": [0, 0, 0, 2],
+            "risk_3": [0, 0, 0, 0],
+        })
+        path = os.path.join(self.directory.name, "subjects.parquet")
+        pyarrow.parquet.write_table(table, path)
+        output = io.BytesIO()
+
+        score_file(path, output, workers=1)
+
+        self.assertEqual([json.loads(line) for line in output.getvalue().decode().splitlines()], [
+            expected_record(line_number, subject_from_columns(row))
+            for line_number, row in enumerate(table.to_pylist(), start=1)
+        ])
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_parquet_string_columns_are_validated_by_the_schema(self):
+        table = pyarrow.table({
+            **{name: ["0"] for name in SUBJECT_COLUMNS},
+            "marital_status": ["single"], "house": [None], "vehicle_year": ["2018"],
+        })
+        path = os.path.join(self.directory.name, "subjects.parquet")
+        pyarrow.parquet.write_table(table, path)
+        output = io.BytesIO()
+
+        score_file(path, output, workers=1)
+
+        self.assertEqual([json.loads(line) for line in output.getvalue().decode().splitlines()], [
+            expected_record(1, subject_from_columns(table.to_pylist()[0])),
+        ])
+
+    def test_csv_header_must_name_every_column(self):
+        with self.assertRaises(ValueError):
+            self.score("subjects.csv", "age,income\n35,0\n", workers=1)
+
+    def test_empty_file(self):
+        records, stats = self.score("subjects.ndjson", "", workers=1)
+        self.assertEqual(records, [])
+        self.assertEqual(stats["rows"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
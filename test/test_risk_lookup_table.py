@@ -0,0 +1,148 @@
+import itertools
+import random
+import unittest
+
+from src.risk_analysis.schemas.personal_information_schema import PersonalInformationSchema
+from src.risk_analysis.schemas.rule_schema import RuleSetSchema
+from src.risk_analysis.risk_calculator import RiskCalculator
+from src.risk_analysis.risk_rule_engine import RuleEngine
+from src.risk_analysis.risk_lookup_table import RiskLookupTable, bucket_representatives, feature_edges
+from src.risk_analysis.risk_batch_calculator import BatchRiskCalculator
+from src.risk_analysis.risk_analysis_rules import DEFAULT_RULE_SET
+from test.subject_factory import CURRENT_YEAR, build_subjects
+
+
+def random_subjects(size, seed=0):
+    rng = random.Random(seed)
+    return [
+        PersonalInformationSchema(
+            age=rng.randint(0, 120),
+            dependents=rng.choice([0, rng.randint(1, 10)]),
+            house=rng.choice([None, {"ownership_status": "owned"}, {"ownership_status": "mortgaged"}]),
+            income=rng.choice([0, rng.randint(1, 10 ** 7), rng.randint(199990, 200010)]),
+            marital_status=rng.choice(["single", "married"]),
+            risk_questions=[rng.random() < 0.5 for _ in range(3)],
+            vehicle=rng.choice([None, {"year": rng.randint(1886, CURRENT_YEAR - 1)}]),
+        )
+        for _ in range(size)
+    ]
+
+
+def edge_values(edges, minimum=0):
+    """Every bucket representative plus the values on both sides of each cut point."""
+    values = set(bucket_representatives(edges))
+    for edge in edges:
+        values.update((edge - 1, edge))
+    return sorted(value for value in values if value >= minimum)
+
+
+def domain_subjects(lookup_table):
+    """Valid subjects crossing every bucket of every feature of the table."""
+    edges = lookup_table.edges
+    subjects = []
+    for age, dependents, income, vehicle_age, marital_status, house, risk_questions in itertools.product(
+            edge_values(edges["age"]),
+            edge_values(edges["dependents"]),
+            edge_values(edges["income"]),
+            # A vehicle is at least one year old, its build year being before the current year
+            [None] + edge_values(edges["vehicle_age"], minimum=1),
+            ["single", "married"],
+            [None, "owned", "mortgaged"],
+            itertools.product([False, True], repeat=3),
+    ):
+        subjects.append(PersonalInformationSchema(
+            age=age,
+            dependents=dependents,
+            house={"ownership_status": house} if house is not None else None,
+            income=income,
+            marital_status=marital_status,
+            risk_questions=list(risk_questions),
+            vehicle={"year": CURRENT_YEAR - vehicle_age} if vehicle_age is not None else None,
+        ))
+    return subjects
+
+
+class TestRiskLookupTable(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.lookup_table = RiskLookupTable(RuleEngine(DEFAULT_RULE_SET))
+
+    def test_feature_edges(self):
+        self.assertEqual(feature_edges(DEFAULT_RULE_SET, "age"), [30, 61])
+        self.assertEqual(feature_edges(DEFAULT_RULE_SET, "income"), [1, 200000])
+        self.assertEqual(feature_edges(DEFAULT_RULE_SET, "dependents"), [1])
+        self.assertEqual(feature_edges(DEFAULT_RULE_SET, "vehicle_age"), [6])
+
+    def test_table_covers_bucketed_domain(self):
+        self.assertEqual(self.lookup_table.shape, (3, 2, 3, 3, 2, 3, 4))
+        self.assertEqual(len(self.lookup_table), 3 * 2 * 3 * 3 * 2 * 3 * 4)
+
+    def test_table_cells_are_read_only(self):
+        profile = self.lookup_table.calculate_subject_score(build_subjects()[0])
+        with self.assertRaises(TypeError):
+            profile["auto"] = "ineligible"
+
+    def test_matches_risk_calculator_on_boundaries(self):
+        for subject in build_subjects():
+            self.assertEqual(
+                self.lookup_table.calculate_subject_score(subject),
+                dict(RiskCalculator(subject).calculate_subject_score()),
+                subject,
+            )
+
+    def test_matches_risk_calculator_on_every_cell(self):
+        subjects = domain_subjects(self.lookup_table)
+        indexes = BatchRiskCalculator.from_subjects(subjects).calculate_indexes(self.lookup_table)
+        self.assertEqual(set(indexes.tolist()), set(range(len(self.lookup_table))))
+
+        for subject in subjects:
+            self.assertEqual(
+                self.lookup_table.calculate_subject_score(subject),
+                dict(RiskCalculator(subject).calculate_subject_score()),
+                subject,
+            )
+
+    def test_matches_risk_calculator_on_random_subjects(self):
+        for subject in random_subjects(5000):
+            self.assertEqual(
+                self.lookup_table.calculate_subject_score(subject),
+                dict(RiskCalculator(subject).calculate_subject_score()),
+                subject,
+            )
+
+    def test_matches_rule_engine_with_custom_rule_set(self):
+        engine = RuleEngine(RuleSetSchema.parse_obj({
+            "version": "test",
+            "rules": [
+                {
+                    "name": "many_dependents",
+                    "conditions": [{"feature": "dependents", "operator": "ge", "value": 3}],
+                    "deltas": {"life": 2},
+                },
+                {
+                    "name": "exact_income",
+                    "conditions": [{"feature": "income", "operator": "eq", "value": 50000}],
+                    "ineligible": ["auto"],
+                },
+                {
+                    "name": "old_vehicle",
+                    "conditions": [{"feature": "vehicle_age", "operator": "gt", "value": 20}],
+                    "deltas": {"auto": 3},
+                },
+            ],
+        }))
+        lookup_table = RiskLookupTable(engine)
+
+        subjects = random_subjects(2000, seed=1) + [
+            PersonalInformationSchema(
+                age=40, dependents=3, income=50000, marital_status="single", risk_questions=[0, 0, 0],
+                vehicle={"year": CURRENT_YEAR - 21},
+            ),
+        ]
+        for subject in subjects:
+            self.assertEqual(lookup_table.calculate_subject_score(subject), engine.calculate_subject_score(subject))
+
+
+if __name__ == '__main__':
+    unittest.main()
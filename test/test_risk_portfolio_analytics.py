@@ -0,0 +1,163 @@
+import collections
+import os
+import tempfile
+import unittest
+
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.risk_analysis.risk_calculator import RiskCalculator
+from src.risk_analysis.risk_file_scoring import SUBJECT_COLUMNS
+from src.risk_analysis.risk_portfolio_analytics import PortfolioAnalytics, analyze_columns, analyze_file, \
+    band_labels, json_columns
+from test.subject_factory import build_subjects
+from test.test_risk_file_scoring import csv_row
+from benchmarks.subjects import subject_columns_json
+
+
+def expected_counts(subjects):
+    """Score counts per (age band, income band, marital status, line), scoring every subject on its own."""
+    age_labels = band_labels([30, 40, 50, 61])
+    income_labels = band_labels([1, 50000, 100000, 200000])
+    counts = collections.Counter()
+    for subject in subjects:
+        age_band = age_labels[sum(subject.age >= edge for edge in [30, 40, 50, 61])]
+        income_band = income_labels[sum(subject.income >= edge for edge in [1, 50000, 100000, 200000])]
+        for line, score in RiskCalculator(subject).calculate_subject_score().items():
+            counts[age_band, income_band, subject.marital_status.value, line, score.value] += 1
+    return counts
+
+
+def report_counts(report):
+    counts = collections.Counter()
+    for group in report["groups"]:
+        for line, scores in group["lines"].items():
+            for score, count in scores.items():
+                if count:
+                    counts[group["age_band"], group["income_band"], group["marital_status"], line, score] += count
+    return counts
+
+
+class TestPortfolioAnalytics(unittest.TestCase):
+
+    def test_band_labels(self):
+        self.assertEqual(band_labels([30, 40, 50, 61]), ["0-29", "30-39", "40-49", "50-60", "61+"])
+        self.assertEqual(band_labels([1, 200000]), ["0", "1-199999", "200000+"])
+
+    def test_counts_match_risk_calculator(self):
+        subjects = build_subjects()
+        analytics = PortfolioAnalytics()
+
+        analyze_columns(analytics, subject_columns_json(subjects), chunk_rows=1000)
+        report = analytics.histograms()
+
+        self.assertEqual(report["rows"], len(subjects))
+        self.assertEqual(report["rejected"], 0)
+        self.assertEqual(report_counts(report), expected_counts(subjects))
+
+    def test_group_by_sums_the_dropped_fields(self):
+        analytics = PortfolioAnalytics()
+        analyze_columns(analytics, subject_columns_json(build_subjects()))
+
+        full = analytics.histograms()
+        by_marital_status = analytics.histograms(["marital_status"])
+        totals = analytics.histograms([])
+
+        self.assertEqual(totals["groups"], [])
+        self.assertEqual(totals["lines"], full["lines"])
+        for group in by_marital_status["groups"]:
+            self.assertEqual(set(group), {"marital_status", "rows", "lines"})
+            self.assertEqual(group["rows"], sum(
+                full_group["rows"] for full_group in full["groups"]
+                if full_group["marital_status"] == group["marital_status"]
+            ))
+        with self.assertRaises(ValueError):
+            analytics.histograms(["house"])
+
+    def test_rows_that_are_not_plain_go_through_the_schema(self):
+        columns = subject_columns_json(build_subjects()[:3])
+        columns["age"] = [35, "40", -1]
+
+        plain, calculator = json_columns(columns, 0, 3)
+        analytics = PortfolioAnalytics()
+        analyze_columns(analytics, columns)
+
+        self.assertEqual(plain.tolist(), [False, False, False])
+        self.assertEqual(analytics.histograms()["rows"], 2)
+        self.assertEqual(analytics.rejected, 1)
+
+    def test_integers_beyond_int64(self):
+        subjects = build_subjects()[:5]
+        subjects[0] = subjects[0].copy(update={"income": 2 ** 63})
+        subjects[1] = subjects[1].copy(update={"income": 10 ** 30})
+        subjects[2] = subjects[2].copy(update={"age": 10 ** 20})
+        columns = subject_columns_json(subjects)
+        # A string age leaves every row of the chunk to the schema, oversized ones included
+        schema_columns = {**columns, "age": [*columns["age"][:4], str(columns["age"][4])]}
+
+        plain, _ = json_columns(columns, 0, 5)
+        analytics = PortfolioAnalytics()
+        analyze_columns(analytics, columns)
+        schema_analytics = PortfolioAnalytics()
+        analyze_columns(schema_analytics, schema_columns)
+
+        self.assertEqual(plain.tolist(), [True] * 5)
+        self.assertEqual(json_columns(schema_columns, 0, 5)[0].tolist(), [False] * 5)
+        for result in (analytics, schema_analytics):
+            self.assertEqual(result.rejected, 0)
+            self.assertEqual(report_counts(result.histograms()), expected_counts(subjects))
+        response = TestClient(app).post("/risk-analysis/portfolio", json=columns)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["rows"], 5)
+
+    def test_plain_rows(self):
+        columns = subject_columns_json(build_subjects()[:4])
+        columns["marital_status"][1] = "divorced"
+        columns["house"][2] = "rented"
+        columns["vehicle_year"][3] = 1800
+
+        plain, calculator = json_columns(columns, 0, 4)
+
+        self.assertEqual(plain.tolist(), [True, False, False, False])
+        self.assertEqual(len(calculator.age), 1)
+
+    def test_file_counts_match_columns(self):
+        subjects = build_subjects()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "subjects.csv")
+            with open(path, "w") as file:
+                file.write(",".join(SUBJECT_COLUMNS) + "\n")
+                file.write("\n".join(map(csv_row, subjects)) + "\n")
+                file.write("-1,0,0,single,,,0,0,0\n")
+            analytics = analyze_file(path, workers=2, chunk_bytes=16 * 1024)
+
+        columns = PortfolioAnalytics()
+        analyze_columns(columns, subject_columns_json(subjects))
+        self.assertEqual(analytics.histograms(), {**columns.histograms(), "rejected": 1})
+
+
+def test_run_portfolio_analytics():
+    subjects = build_subjects()[:100]
+
+    response = TestClient(app).post("/risk-analysis/portfolio?group_by=age_band&group_by=marital_status",
+                                    json=subject_columns_json(subjects))
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["rows"] == 100
+    assert body["group_by"] == ["age_band", "marital_status"]
+    assert set(body["groups"][0]) == {"age_band", "marital_status", "rows", "lines"}
+    assert sum(group["rows"] for group in body["groups"]) == 100
+
+
+def test_run_portfolio_analytics_invalid_columns():
+    columns = subject_columns_json(build_subjects()[:2])
+    columns["income"] = columns["income"][:1]
+
+    response = TestClient(app).post("/risk-analysis/portfolio", json=columns)
+
+    assert response.status_code == 422
+    assert response.json() == {"detail": [{
+        "loc": ["body", "income"], "msg": "columns must have the same length, age has 2 values",
+        "type": "value_error",
+    }]}
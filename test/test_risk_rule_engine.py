@@ -0,0 +1,107 @@
+import unittest
+
+from pydantic import ValidationError
+
+from src.risk_analysis.schemas.personal_information_schema import PersonalInformationSchema
+from src.risk_analysis.schemas.rule_schema import RuleSetSchema
+from src.risk_analysis.schemas.risk_score import RiskScoreEnum
+from src.risk_analysis.risk_calculator import RiskCalculator
+from src.risk_analysis.risk_rule_engine import RuleEngine, generate_source
+from src.risk_analysis.risk_analysis_rules import DEFAULT_RULE_SET
+from test.subject_factory import build_subjects
+
+
+class TestRuleEngine(unittest.TestCase):
+
+    def test_default_rule_set_matches_risk_calculator(self):
+        engine = RuleEngine(DEFAULT_RULE_SET)
+
+        for subject in build_subjects():
+            self.assertEqual(
+                engine.calculate_subject_score(subject),
+                dict(RiskCalculator(subject).calculate_subject_score()),
+                subject,
+            )
+
+    def test_rule_set_from_json(self):
+        rule_set = RuleSetSchema.parse_raw('''{
+            "version": "test",
+            "rules": [
+                {
+                    "name": "has_dependents",
+                    "conditions": [{"feature": "dependents", "operator": "ge", "value": 1}],
+                    "deltas": {"life": 3}
+                },
+                {
+                    "name": "owned_house",
+                    "conditions": [{"feature": "house_status", "operator": "eq", "value": "owned"}],
+                    "ineligible": ["home"]
+                }
+            ]
+        }''')
+        subject = PersonalInformationSchema(
+            age=35,
+            dependents=2,
+            house={"ownership_status": "owned"},
+            income=0,
+            marital_status="married",
+            risk_questions=[0, 1, 0],
+        )
+
+        engine = RuleEngine(rule_set)
+        self.assertEqual(engine.version, "test")
+        self.assertEqual(engine.rule_names, ["has_dependents", "owned_house"])
+        self.assertEqual(
+            engine.calculate_subject_score(subject),
+            {
+                "auto": RiskScoreEnum.regular,
+                "disability": RiskScoreEnum.regular,
+                "home": RiskScoreEnum.ineligible,
+                "life": RiskScoreEnum.responsible,
+            }
+        )
+
+    def test_generate_source_skips_unused_features(self):
+        rule_set = RuleSetSchema.parse_obj({
+            "version": "test",
+            "rules": [{"name": "young", "conditions": [{"feature": "age", "operator": "lt", "value": 30}]}],
+        })
+
+        source = generate_source(rule_set)
+        self.assertIn("age = subject.age", source)
+        self.assertNotIn("subject.vehicle", source)
+        self.assertNotIn("_ineligible = False", source)
+
+    def test_rule_set_rejects_ordering_on_categorical_feature(self):
+        with self.assertRaises(ValidationError):
+            RuleSetSchema.parse_obj({
+                "version": "test",
+                "rules": [{
+                    "name": "married",
+                    "conditions": [{"feature": "marital_status", "operator": "lt", "value": "married"}],
+                }],
+            })
+
+    def test_rule_set_rejects_unknown_categorical_value(self):
+        with self.assertRaises(ValidationError):
+            RuleSetSchema.parse_obj({
+                "version": "test",
+                "rules": [{
+                    "name": "rented",
+                    "conditions": [{"feature": "house_status", "operator": "eq", "value": "rented"}],
+                }],
+            })
+
+    def test_rule_set_rejects_text_threshold(self):
+        with self.assertRaises(ValidationError):
+            RuleSetSchema.parse_obj({
+                "version": "test",
+                "rules": [{
+                    "name": "young",
+                    "conditions": [{"feature": "age", "operator": "lt", "value": "thirty"}],
+                }],
+            })
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.risk_analysis.risk_analysis_cache import RiskAnalysisCache
+from src.risk_analysis.risk_analysis_rules import DEFAULT_RULE_SET
+from src.risk_analysis.risk_analysys_service import DEFAULT_LOOKUP_TABLE, RiskAnalysisService
+from src.risk_analysis.risk_rule_set_reload import RuleSetReloader, load_lookup_table
+from risk_analysis.risk_analysis_controller import RULE_SET_VERSION_HEADER, get_risk_analysis_service
+from risk_analysis.risk_analysys_service import RiskAnalysisService as AppRiskAnalysisService
+from test.subject_factory import build_subjects
+
+# The default rule set with the income threshold lowered from 200000 to 100000
+LOWER_INCOME_THRESHOLD = DEFAULT_RULE_SET.copy(deep=True)
+LOWER_INCOME_THRESHOLD.version = "2"
+LOWER_INCOME_THRESHOLD.rules[1].conditions[0].value = 100000
+
+
+class TestRuleSetReloader(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "rule_set.json")
+        self.write(DEFAULT_RULE_SET.json())
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, content: str):
+        # Written next to the rule set then renamed over it, as a deployment would
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w") as file:
+            file.write(content)
+        os.replace(temporary_path, self.path)
+        # A distinct modification time even on file systems with a coarse clock
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    def test_changed_file_is_swapped_in(self):
+        service = RiskAnalysisService(load_lookup_table(self.path))
+        reloader = RuleSetReloader(service, self.path)
+        self.assertFalse(asyncio.run(reloader.check()))
+
+        self.write(LOWER_INCOME_THRESHOLD.json())
+        self.assertTrue(asyncio.run(reloader.check()))
+
+        self.assertEqual(service.lookup_table.version, "2")
+        self.assertEqual(service.lookup_table.edges, load_lookup_table(self.path).edges)
+        self.assertEqual(reloader.reloads, 1)
+
+    def test_invalid_or_unversioned_change_keeps_the_current_rule_set(self):
+        service = RiskAnalysisService(load_lookup_table(self.path))
+        lookup_table = service.lookup_table
+        reloader = RuleSetReloader(service, self.path)
+
+        self.write('{"version": "2", "rules": [{"name": "no_conditions", "conditions": []}]}')
+        self.assertFalse(asyncio.run(reloader.check()))
+        changed_rules = DEFAULT_RULE_SET.copy(deep=True)
+        changed_rules.rules.pop()
+        self.write(changed_rules.json())
+        self.assertFalse(asyncio.run(reloader.check()))
+
+        self.assertIs(service.lookup_table, lookup_table)
+        self.assertEqual(reloader.failures, 2)
+
+    def test_watcher_reloads_in_the_background(self):
+        service = RiskAnalysisService(load_lookup_table(self.path))
+        reloader = RuleSetReloader(service, self.path, interval=0.01)
+
+        async def run():
+            await reloader.start()
+            self.write(LOWER_INCOME_THRESHOLD.json())
+            while service.lookup_table.version != "2":
+                await asyncio.sleep(0.01)
+            await reloader.close()
+        asyncio.run(asyncio.wait_for(run(), 10))
+
+        self.assertIsNone(reloader.task)
+
+    def test_swap_only_invalidates_the_cache_of_the_old_version(self):
+        service = RiskAnalysisService(DEFAULT_LOOKUP_TABLE, cache=RiskAnalysisCache(100, 3600))
+        subjects = build_subjects()[:20]
+        for subject in subjects:
+            service.run_risk_analysis(subject)
+        new_lookup_table = load_lookup_table(self.path)
+        new_lookup_table.version = "2"
+        service.run_risk_analysis(subjects[0], new_lookup_table)
+
+        service.swap_lookup_table(new_lookup_table)
+
+        self.assertEqual([version for version, _ in service.cache.entries], ["2"])
+
+    def test_in_flight_request_keeps_its_rule_set(self):
+        service = RiskAnalysisService(DEFAULT_LOOKUP_TABLE, cache=RiskAnalysisCache(100, 3600))
+        old_lookup_table = service.lookup_table
+        self.write(LOWER_INCOME_THRESHOLD.json())
+        service.swap_lookup_table(load_lookup_table(self.path))
+
+        for subject in build_subjects():
+            self.assertEqual(service.run_risk_analysis(subject, old_lookup_table),
+                             old_lookup_table.calculate_subject_score(subject))
+            self.assertEqual(service.run_risk_analysis(subject),
+                             service.lookup_table.calculate_subject_score(subject))
+
+
+def test_responses_report_the_rule_set_version():
+    subject = {"age": 35, "dependents": 2, "house": {"ownership_status": "owned"}, "income": 150000,
+               "marital_status": "married", "risk_questions": [0, 1, 0], "vehicle": {"year": 2018}}
+    client = TestClient(app)
+    service = AppRiskAnalysisService()
+    app.dependency_overrides[get_risk_analysis_service] = lambda: service
+    try:
+        responses = [client.post(path, json=body) for path, body in (
+            ("/risk-analysis", subject), ("/risk-analysis/fast", subject), ("/risk-analysis/batch", [subject]),
+        )]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "rule_set.json")
+            with open(path, "w") as file:
+                json.dump(json.loads(LOWER_INCOME_THRESHOLD.json()), file)
+            service.swap_lookup_table(load_lookup_table(path))
+        reloaded_response = client.post("/risk-analysis", json=subject)
+    finally:
+        app.dependency_overrides.clear()
+
+    assert [response.headers[RULE_SET_VERSION_HEADER] for response in responses] == ["1", "1", "1"]
+    assert reloaded_response.headers[RULE_SET_VERSION_HEADER] == "2"
+    assert reloaded_response.json() != responses[0].json()
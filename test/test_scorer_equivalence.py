@@ -0,0 +1,53 @@
+import unittest
+from unittest import mock
+
+from src.risk_analysis.risk_analysis_rules import DEFAULT_RULE_SET
+from src.risk_analysis.risk_lookup_table import RiskLookupTable
+from src.risk_analysis.risk_rule_engine import RuleEngine
+from test.scorer_equivalence import DOMAIN, SCORERS, check, domain_fields, domain_size
+
+# The default rule set with the age range starting at 31 instead of 30
+LATE_AGE_RANGE = DEFAULT_RULE_SET.copy(deep=True)
+LATE_AGE_RANGE.version = "late-age-range"
+LATE_AGE_RANGE.rules[6].conditions[0].value = 31
+LATE_AGE_RANGE.rules[7].conditions[0].value = 31
+LATE_AGE_RANGE_TABLE = RiskLookupTable(RuleEngine(LATE_AGE_RANGE))
+
+
+def score_late_age_range(subjects):
+    return [LATE_AGE_RANGE_TABLE.calculate_subject_score(subject) for subject in subjects]
+
+
+class TestScorerEquivalence(unittest.TestCase):
+
+    def test_every_scorer_matches_the_reference_over_the_domain(self):
+        self.assertEqual(check(workers=None), [])
+
+    def test_domain_crosses_every_cut_point(self):
+        fields = list(domain_fields())
+
+        self.assertEqual(len(fields), domain_size())
+        self.assertEqual(len(set(fields)), len(fields))
+        for position, values in enumerate(DOMAIN):
+            self.assertEqual({subject[position] for subject in fields}, set(values))
+
+    @mock.patch.dict(SCORERS, {"late_age_range": score_late_age_range})
+    def test_mismatches_are_shrunk_to_minimal_subjects(self):
+        report = check(["late_age_range"], workers=1)
+
+        # Every mismatch comes down to the age of 30, made visible by the risk answers
+        self.assertEqual(len(report), 1)
+        self.assertGreater(report[0].occurrences, 1000)
+        self.assertEqual(report[0].subject, (30, 0, 100000, "single", None, None, (1, 1, 1)))
+        self.assertEqual(report[0].expected["auto"], "regular")
+        self.assertEqual(report[0].actual["auto"], "economic")
+        self.assertIn("late_age_range: age=30, risk_questions=(1, 1, 1)", report[0].describe())
+
+    @mock.patch.dict(SCORERS, {"late_age_range": score_late_age_range})
+    def test_fuzzing_in_parallel_finds_the_same_mismatches(self):
+        inline = check(["late_age_range", "lookup_table"], workers=1, fuzz=4000, seed=1, chunk_size=500)
+        parallel = check(["late_age_range", "lookup_table"], workers=2, fuzz=4000, seed=1, chunk_size=500)
+
+        self.assertTrue(inline)
+        self.assertEqual(parallel, inline)
+        self.assertEqual({mismatch.scorer for mismatch in inline}, {"late_age_range"})